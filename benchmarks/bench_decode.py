@@ -0,0 +1,260 @@
+"""Time the decoders on synthetic responses, give JSON results.
+
+Run from the repository root :
+python -m benchmarks.bench_decode --days 1 7 30 --step 60 900 3600
+python -m benchmarks.bench_decode --output new.json --baseline old.json
+"""
+import argparse
+import inspect
+import itertools
+import json
+import platform
+import sys
+import time
+
+from benchmarks.bench_memory import measure_retained_memory
+from pyworldtidesinfo._synthetic_response import (
+    SYNTHETIC_START_EPOCH,
+    give_synthetic_tide_response,
+)
+from pyworldtidesinfo.tide_decoder import (
+    give_info_from_raw_data,
+    give_info_from_raw_data_N_and_N_1,
+    give_info_from_raw_datums_data,
+)
+
+# each method is called for at least this duration (s), on varying epochs
+MIN_DURATION = 0.05
+MAX_CALLS = 2000
+VARIANT_SECTIONS = ("plot", "datums", "stations")
+
+
+def _give_variants():
+    """Give variant name : (plot, datums, stations), each on or off."""
+    variants = {}
+    for flags in itertools.product((True, False), repeat=len(VARIANT_SECTIONS)):
+        names = [name for name, flag in zip(VARIANT_SECTIONS, flags) if flag]
+        if len(names) == len(VARIANT_SECTIONS):
+            variants["full"] = flags
+        else:
+            variants["+".join(names) or "bare"] = flags
+    return variants
+
+
+VARIANTS = _give_variants()
+
+
+def _give_method_arguments(epoch, frame_duration):
+    """Give the arguments of the give_info_from_raw_data methods."""
+    return {
+        "give_tide_in_epoch": (epoch, True),
+        "give_next_tide_in_epoch": (epoch,),
+        "give_previous_tide_in_epoch": (epoch,),
+        "give_high_low_tide_in_UTC": (epoch, True),
+        "give_tide_extrema_within_time_frame": (epoch, epoch + frame_duration),
+        "give_next_high_low_tide_in_UTC": (epoch,),
+        "give_current_high_low_tide_in_UTC": (epoch,),
+        "give_current_height_in_UTC": (epoch,),
+        "give_tide_prediction_within_time_frame": (epoch, epoch + frame_duration),
+        "give_used_station_info_from_name": ("Synthetic station 2",),
+        "give_plot_picture_rendered": ("2,102,255", "255,255,255", epoch),
+    }
+
+
+def _give_method_names(decoder_class):
+    """Give the public give_* methods of a decoder class."""
+    return sorted(
+        name
+        for name, _ in inspect.getmembers(decoder_class, inspect.isfunction)
+        if name.startswith("give_")
+    )
+
+
+def time_call(call, arguments_list):
+    """Give the mean duration (s) of a call over varying arguments."""
+    calls = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < MIN_DURATION and calls < MAX_CALLS:
+        call(*arguments_list[calls % len(arguments_list)])
+        calls += 1
+        elapsed = time.perf_counter() - start
+    return elapsed / calls
+
+
+def time_first_query(decoder_class, decoder_arguments, epochs):
+    """Give the mean duration of a fresh decoder and its first query.
+
+    The timeline is compiled on the first query : this is the cost paid by
+    a decoder built for new data.
+    """
+
+    def build_and_query(epoch):
+        decoder_class(*decoder_arguments).give_next_tide_in_epoch(epoch)
+
+    return time_call(build_and_query, [(epoch,) for epoch in epochs])
+
+
+def time_methods(decoder, epochs, frame_duration):
+    """Give the mean duration of each give_* method of the decoder.
+
+    The memoized answers are forgotten before each call : the timings are
+    the ones of a query on the compiled timeline, not of a memo hit.
+    """
+    arguments_by_epoch = [
+        _give_method_arguments(epoch, frame_duration) for epoch in epochs
+    ]
+    timings = {}
+    memo = getattr(decoder, "_memo", {})
+    for name in _give_method_names(type(decoder)):
+        method = getattr(decoder, name)
+
+        def call(*arguments, method=method):
+            memo.clear()
+            return method(*arguments)
+
+        arguments_list = [arguments.get(name, ()) for arguments in arguments_by_epoch]
+        try:
+            timings[name] = time_call(call, arguments_list)
+        except (KeyError, IndexError, TypeError, ValueError) as err:
+            timings[name] = {"error": type(err).__name__}
+    return timings
+
+
+def run_scenario(days, step, variant):
+    """Give the results of one synthetic response."""
+    plot, datums, stations = VARIANTS[variant]
+    data = give_synthetic_tide_response(
+        days=days, step=step, plot=plot, datums=datums, stations=stations
+    )
+    previous_data = give_synthetic_tide_response(
+        days=days,
+        step=step,
+        start_epoch=SYNTHETIC_START_EPOCH - 24 * 3600,
+        plot=plot,
+        datums=datums,
+        stations=stations,
+    )
+    text = json.dumps(data)
+    # query epochs spread over the response (same ones for each method)
+    end_epoch = SYNTHETIC_START_EPOCH + days * 24 * 3600
+    epochs = list(
+        range(
+            SYNTHETIC_START_EPOCH,
+            end_epoch,
+            max(1, (end_epoch - SYNTHETIC_START_EPOCH) // 97),
+        )
+    )
+
+    result = {
+        "days": days,
+        "step": step,
+        "variant": variant,
+        "payload_bytes": len(text.encode("utf-8")),
+        "json_decode": time_call(json.loads, [(text,)]),
+        "memory_bytes": measure_retained_memory(lambda: json.loads(text)),
+        "give_info_from_raw_data_first_query": time_first_query(
+            give_info_from_raw_data, (data,), epochs
+        ),
+    }
+    result["give_info_from_raw_data"] = time_methods(
+        give_info_from_raw_data(data), epochs, 6 * 3600
+    )
+    result["give_info_from_raw_data_N_and_N_1_first_query"] = time_first_query(
+        give_info_from_raw_data_N_and_N_1, (data, previous_data), epochs
+    )
+    result["give_info_from_raw_data_N_and_N_1"] = time_methods(
+        give_info_from_raw_data_N_and_N_1(data, previous_data), epochs, 6 * 3600
+    )
+    if datums:
+        result["give_info_from_raw_datums_data"] = time_methods(
+            give_info_from_raw_datums_data(data["datums"]), epochs, 6 * 3600
+        )
+    return result
+
+
+def _give_timings(result, prefix=""):
+    """Give the flat timings (name : seconds) of a scenario result."""
+    timings = {}
+    for name, value in result.items():
+        if isinstance(value, dict):
+            timings.update(_give_timings(value, prefix + name + "."))
+        elif isinstance(value, float):
+            timings[prefix + name] = value
+    return timings
+
+
+def compare_results(results, baseline, tolerance):
+    """Give the timings slower than the baseline by more than tolerance."""
+    baseline_results = {
+        (result["days"], result["step"], result["variant"]): _give_timings(result)
+        for result in baseline["results"]
+    }
+    regressions = []
+    for result in results["results"]:
+        scenario = (result["days"], result["step"], result["variant"])
+        baseline_timings = baseline_results.get(scenario)
+        if baseline_timings is None:
+            continue
+        for name, duration in _give_timings(result).items():
+            baseline_duration = baseline_timings.get(name)
+            if baseline_duration and duration > baseline_duration * (1 + tolerance):
+                regressions.append(
+                    {
+                        "scenario": scenario,
+                        "name": name,
+                        "baseline": baseline_duration,
+                        "duration": duration,
+                    }
+                )
+    return regressions
+
+
+def main():
+    """Define the main function."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--days", type=int, nargs="+", default=[1, 7, 30], help="prediction days"
+    )
+    parser.add_argument(
+        "--step", type=int, nargs="+", default=[60, 900, 3600], help="height step (s)"
+    )
+    parser.add_argument(
+        "--variant", nargs="+", default=list(VARIANTS), choices=list(VARIANTS)
+    )
+    parser.add_argument("--output", help="JSON file of results (default stdout)")
+    parser.add_argument("--baseline", help="JSON file of previous results")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="allowed slowdown (ratio)"
+    )
+    args = parser.parse_args()
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": int(time.time()),
+        "results": [
+            run_scenario(days, step, variant)
+            for days in args.days
+            for step in args.step
+            for variant in args.variant
+        ],
+    }
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=1)
+    else:
+        print(json.dumps(results))
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare_results(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(json.dumps(regression), file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
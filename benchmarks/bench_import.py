@@ -0,0 +1,113 @@
+"""Time the import of the package modules in fresh interpreters.
+
+Run from the repository root :
+python -m benchmarks.bench_import --repeat 10
+python -m benchmarks.bench_import --output new.json --baseline old.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess  # nosec
+import sys
+import time
+
+MODULES = [
+    "pyworldtidesinfo",
+    "pyworldtidesinfo.tide_decoder",
+    "pyworldtidesinfo.worldtidesinfo_server",
+    "pyworldtidesinfo.__main__",
+]
+# heavy modules reported when imported as a side effect
+WATCHED_MODULES = ["requests", "urllib3", "httpx", "http.client", "ssl", "numpy"]
+
+_IMPORT_SCRIPT = """
+import sys, time
+start_time = time.perf_counter()
+import {module}
+duration = time.perf_counter() - start_time
+print(duration, " ".join(sorted(sys.modules)))
+"""
+
+
+def measure_import(module):
+    """Give the import duration (s) of module and the modules it loaded."""
+    output = subprocess.run(  # nosec
+        [sys.executable, "-c", _IMPORT_SCRIPT.format(module=module)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.split()
+    return float(output[0]), output[1:]
+
+
+def run_module(module, repeat):
+    """Give the import durations of module over fresh interpreters."""
+    durations = []
+    for _ in range(repeat):
+        duration, loaded_modules = measure_import(module)
+        durations.append(duration)
+    return {
+        "module": module,
+        "median": statistics.median(durations),
+        "min": min(durations),
+        "watched_modules": [name for name in WATCHED_MODULES if name in loaded_modules],
+        "module_count": len(loaded_modules),
+    }
+
+
+def compare_results(results, baseline, tolerance):
+    """Give the imports slower than the baseline by more than tolerance."""
+    baseline_results = {result["module"]: result for result in baseline["results"]}
+    regressions = []
+    for result in results["results"]:
+        baseline_result = baseline_results.get(result["module"])
+        if baseline_result and result["median"] > baseline_result["median"] * (
+            1 + tolerance
+        ):
+            regressions.append(
+                {
+                    "module": result["module"],
+                    "baseline": baseline_result["median"],
+                    "duration": result["median"],
+                }
+            )
+    return regressions
+
+
+def main():
+    """Define the main function."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", nargs="+", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=5, help="interpreters")
+    parser.add_argument("--output", help="JSON file of results (default stdout)")
+    parser.add_argument("--baseline", help="JSON file of previous results")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="allowed slowdown (ratio)"
+    )
+    args = parser.parse_args()
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": int(time.time()),
+        "results": [run_module(module, args.repeat) for module in args.module],
+    }
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=1)
+    else:
+        print(json.dumps(results))
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare_results(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(json.dumps(regression), file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""Compare the memory held by raw JSON data and by compact columns.
+
+Run from the repository root : python -m benchmarks.bench_memory
+"""
+import argparse
+import gc
+import json
+import sys
+import tracemalloc
+
+from pyworldtidesinfo._synthetic_response import give_synthetic_tide_response
+from pyworldtidesinfo.tide_columns import Compact_Tide_Data
+
+
+def measure_retained_memory(build):
+    """Give the memory (bytes) still allocated by the object built."""
+    gc.collect()
+    tracemalloc.start()
+    kept_object = build()
+    gc.collect()
+    retained_memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept_object
+    return retained_memory
+
+
+def main():
+    """Define the main function."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=7, help="prediction days")
+    parser.add_argument("--step", type=int, default=900, help="height step (s)")
+    args = parser.parse_args()
+
+    text = json.dumps(
+        give_synthetic_tide_response(days=args.days, step=args.step, plot=False)
+    )
+
+    raw_memory = measure_retained_memory(lambda: json.loads(text))
+    compact_memory = measure_retained_memory(
+        lambda: Compact_Tide_Data.from_raw_data(json.loads(text))
+    )
+    result = {
+        "days": args.days,
+        "step": args.step,
+        "raw_json_bytes": raw_memory,
+        "compact_bytes": compact_memory,
+        "ratio": round(raw_memory / compact_memory, 1),
+    }
+    print(json.dumps(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
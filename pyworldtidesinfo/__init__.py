@@ -1,2 +1,10 @@
 """Init package for pyworldtidesinfo."""
-from .worldtidesinfo_server import WorldTidesInfo_server
+
+
+def __getattr__(name):
+    """Import the server on first use : the decoders import alone, fast."""
+    if name == "WorldTidesInfo_server":
+        from .worldtidesinfo_server import WorldTidesInfo_server
+
+        return WorldTidesInfo_server
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -1,12 +1,21 @@
 """Main to use the atome library."""
 import argparse
+import json
 import sys
 import time
 from datetime import datetime, timedelta
 
 
+from pyworldtidesinfo.worldtidesinfo_batch import (
+    BATCH_FORMAT_AUTO,
+    BATCH_FORMAT_LIST,
+    BATCH_WORKERS,
+    read_locations,
+    run_batch,
+)
 from pyworldtidesinfo.worldtidesinfo_server import (
     PLOT_CURVE_UNIT_FT,
+    SERVER_URL,
     WorldTidesInfo_server,
     give_info_from_raw_data,
 )
@@ -25,14 +34,59 @@ def next_tide_state(tide_info, current_time):
         return None
 
 
-def main():
+def batch_main(args):
+    """Fetch the locations of the batch file, one NDJSON line per location."""
+    if args.batch == "-":
+        input_file = sys.stdin
+    else:
+        input_file = open(args.batch, encoding="utf-8")
+    try:
+        summary = run_batch(
+            read_locations(input_file, args.format),
+            args.key,
+            sys.stdout,
+            workers=args.workers,
+            server_url=args.server_url,
+        )
+    except ValueError as err:
+        print("batch error :", err, file=sys.stderr)
+        return 2
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+    print(json.dumps(summary), file=sys.stderr)
+    return 1 if summary["failed"] else 0
+
+
+def main(argv=None):
     """Define the main function."""
     parser = argparse.ArgumentParser()
     parser.add_argument("-k", "--key", required=True, help="WorldidesInfo Key")
-    parser.add_argument("-l", "--lat", required=True, help="latitude")
-    parser.add_argument("-L", "--long", required=True, help="longitude")
+    parser.add_argument("-l", "--lat", help="latitude")
+    parser.add_argument("-L", "--long", help="longitude")
+    parser.add_argument(
+        "-b", "--batch", help="file of locations (CSV or NDJSON), - for stdin"
+    )
+    parser.add_argument(
+        "--format",
+        choices=BATCH_FORMAT_LIST,
+        default=BATCH_FORMAT_AUTO,
+        help="format of the batch file",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=BATCH_WORKERS,
+        help="locations fetched concurrently in batch mode",
+    )
+    parser.add_argument("--server-url", default=SERVER_URL, help="server URL")
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    if args.batch is not None:
+        return batch_main(args)
+    if args.lat is None or args.long is None:
+        parser.error("--lat and --long are required without --batch")
 
     # Least Astronomic Tide
     vertical_ref = "LAT"
@@ -54,10 +108,12 @@ def main():
         plot_color,
         plot_background,
         unit_curve_picture,
+        server_url=args.server_url,
     )
     # example to retrieve applied parameter:
     # worldtidesinfo_server_parameter = worldtidesinfo_server.give_parameter()
 
+    init_data = data = datum_content = None
     if worldtidesinfo_server.retrieve_tide_station():
         init_data = worldtidesinfo_server.retrieve_tide_station_raw_data()
 
@@ -0,0 +1,135 @@
+"""Generate synthetic Word Tides Info v3 responses (stand-in, tests, benchmarks)."""
+# Python library
+import base64
+import logging
+import math
+import random
+
+from .tide_columns import give_date_from_epoch
+
+_LOGGER = logging.getLogger(__name__)
+
+# Component library
+# 2021-09-05T00:00+0000
+SYNTHETIC_START_EPOCH = 1630800000
+# (amplitude in meters, period in hours, phase in radians)
+SYNTHETIC_CONSTITUENTS = [
+    (1.8, 12.4206012, 0.3),
+    (0.6, 12.0, 1.1),
+    (0.35, 12.65834751, 2.0),
+    (0.25, 23.93447213, 0.7),
+    (0.18, 25.81933871, 2.4),
+]
+SYNTHETIC_MEAN_HEIGHT = 3.0
+SYNTHETIC_PLOT_SIZE = 40000
+
+
+def give_synthetic_height(epoch):
+    """Give the synthetic height at epoch."""
+    height = SYNTHETIC_MEAN_HEIGHT
+    for amplitude, period, phase in SYNTHETIC_CONSTITUENTS:
+        height += amplitude * math.cos(
+            2 * math.pi * (epoch - SYNTHETIC_START_EPOCH) / (period * 3600) + phase
+        )
+    return height
+
+
+def _give_extremes(start_epoch, end_epoch):
+    """Give the extremes by sampling the curve every minute."""
+    extremes = []
+    previous_height = give_synthetic_height(start_epoch - 60)
+    height = give_synthetic_height(start_epoch)
+    for epoch in range(start_epoch, end_epoch, 60):
+        next_height = give_synthetic_height(epoch + 60)
+        if height >= previous_height and height > next_height:
+            tide_type = "High"
+        elif height <= previous_height and height < next_height:
+            tide_type = "Low"
+        else:
+            tide_type = None
+        if tide_type is not None:
+            extremes.append(
+                {
+                    "dt": epoch,
+                    "date": give_date_from_epoch(epoch),
+                    "height": round(height, 3),
+                    "type": tide_type,
+                }
+            )
+        previous_height, height = height, next_height
+    return extremes
+
+
+def give_synthetic_stations(lat, lon, number=5):
+    """Give a list of stations around lat/lon."""
+    generator = random.Random(int(lat * 1000) ^ int(lon * 1000))  # nosec
+    return [
+        {
+            "id": "synthetic:{}:{}:{}".format(lat, lon, index),
+            "name": "Synthetic station {}".format(index),
+            "lat": lat + generator.uniform(-0.1, 0.1),
+            "lon": lon + generator.uniform(-0.1, 0.1),
+            "timezone": "UTC",
+        }
+        for index in range(number)
+    ]
+
+
+def give_synthetic_tide_response(
+    days=2,
+    step=900,
+    start_epoch=SYNTHETIC_START_EPOCH,
+    heights=True,
+    extremes=True,
+    plot=True,
+    datums=True,
+    stations=False,
+    lat=48.0,
+    lon=-4.5,
+    plot_size=SYNTHETIC_PLOT_SIZE,
+):
+    """Give a synthetic ?extremes&heights response."""
+    end_epoch = start_epoch + int(days * 24 * 3600)
+    response = {
+        "status": 200,
+        "callCount": max(1, math.ceil(days / 7)),
+        "copyright": "synthetic",
+        "requestLat": lat,
+        "requestLon": lon,
+        "responseLat": lat,
+        "responseLon": lon,
+        "atlas": "synthetic",
+        "station": "Synthetic station 0",
+        "requestDatum": "LAT",
+        "responseDatum": "LAT",
+    }
+    if heights:
+        response["heights"] = [
+            {
+                "dt": epoch,
+                "date": give_date_from_epoch(epoch),
+                "height": round(give_synthetic_height(epoch), 3),
+            }
+            for epoch in range(start_epoch, end_epoch, step)
+        ]
+    if extremes:
+        response["extremes"] = _give_extremes(start_epoch, end_epoch)
+    if datums:
+        response["datums"] = [
+            {"name": "LAT", "height": 0.0},
+            {"name": "MLWS", "height": 0.6},
+            {"name": "MLWN", "height": 1.5},
+            {"name": "MSL", "height": SYNTHETIC_MEAN_HEIGHT},
+            {"name": "MHWN", "height": 4.4},
+            {"name": "MHWS", "height": 5.4},
+            {"name": "HAT", "height": 6.2},
+        ]
+    if plot:
+        generator = random.Random(start_epoch)  # nosec
+        picture = bytes(generator.getrandbits(8) for _ in range(plot_size))
+        response["plot"] = "data:image/png;base64," + base64.b64encode(picture).decode(
+            "ascii"
+        )
+    if stations:
+        response["stations"] = give_synthetic_stations(lat, lon)
+    return response
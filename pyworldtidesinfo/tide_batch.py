@@ -0,0 +1,112 @@
+"""Vectorized (NumPy) queries of tide data at many epochs at once."""
+# Python library
+import logging
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+from .tide_timeline import Tide_Timeline
+
+_LOGGER = logging.getLogger(__name__)
+
+# Component library
+# height of the last sample before the epoch (same as give_current_height_in_UTC)
+INTERPOLATION_STEP = "step"
+INTERPOLATION_LINEAR = "linear"
+INTERPOLATION_CUBIC = "cubic"
+INTERPOLATION_LIST = [INTERPOLATION_STEP, INTERPOLATION_LINEAR, INTERPOLATION_CUBIC]
+
+
+class give_batch_info_from_raw_data:
+    """Give a set of vectorized function to decode retrieved data."""
+
+    def __init__(self, data):
+        """Set data and build the numpy columns."""
+        if np is None:
+            raise ImportError(
+                "numpy is required for batch queries: pip install pyworldtidesinfo[numpy]"
+            )
+        self._data = data
+        timeline = Tide_Timeline(data)
+        self._heights_epoch = np.asarray(timeline.heights_epoch, dtype=np.int64)
+        self._heights_value = np.asarray(timeline.heights_value, dtype=np.float64)
+        self._extremes_epoch = np.asarray(timeline.extremes_epoch, dtype=np.int64)
+        self._extremes_height = np.asarray(timeline.extremes_height, dtype=np.float64)
+        self._extremes_type = np.asarray(
+            [str(tide_type) for tide_type in timeline.extremes_type], dtype=object
+        )
+
+    def give_extremes_arrays(self):
+        """Give the extremes as numpy arrays."""
+        if self._data is None:
+            return {"error": "no data"}
+        return {
+            "extrema_value": self._extremes_height,
+            "extrema_epoch": self._extremes_epoch,
+            "extrema_type": self._extremes_type,
+        }
+
+    def give_extreme_index_at_epochs(self, epochs):
+        """Give previous/next extreme index for each epoch (-1 if none).
+
+        next is the first extreme at or after the epoch, previous the last
+        extreme strictly before it.
+        """
+        if self._data is None:
+            return {"error": "no data"}
+        current_time = np.asarray(epochs, dtype=np.float64).astype(np.int64)
+        next_index = np.searchsorted(self._extremes_epoch, current_time, side="left")
+        previous_index = next_index - 1
+        next_index = np.where(next_index >= len(self._extremes_epoch), -1, next_index)
+        return {
+            "previous_extreme_index": previous_index,
+            "next_extreme_index": next_index,
+        }
+
+    def give_height_at_epochs(self, epochs, interpolation=INTERPOLATION_STEP):
+        """Give heights and previous/next extreme index for each epoch."""
+        if self._data is None:
+            return {"error": "no data"}
+        if interpolation not in INTERPOLATION_LIST:
+            return {"error": "unknown interpolation"}
+        if len(self._heights_epoch) == 0:
+            return {"error": "no heights"}
+
+        epochs = np.asarray(epochs, dtype=np.float64)
+        if interpolation == INTERPOLATION_LINEAR:
+            height_value = np.interp(epochs, self._heights_epoch, self._heights_value)
+        elif interpolation == INTERPOLATION_CUBIC and len(self._heights_epoch) > 1:
+            height_value = self._cubic_interpolation(epochs)
+        else:
+            height_value = self._step_interpolation(epochs)
+
+        result = {"height_value": height_value}
+        result.update(self.give_extreme_index_at_epochs(epochs))
+        return result
+
+    def _step_interpolation(self, epochs):
+        """Give the last height before each epoch (first one if none)."""
+        current_time = epochs.astype(np.int64)
+        index = np.searchsorted(self._heights_epoch, current_time, side="left") - 1
+        return self._heights_value[np.clip(index, 0, None)]
+
+    def _cubic_interpolation(self, epochs):
+        """Give cubic Hermite interpolation of heights (clamped at edges)."""
+        x = self._heights_epoch.astype(np.float64)
+        y = self._heights_value
+        slope = np.gradient(y, x)
+
+        epochs = np.clip(epochs, x[0], x[-1])
+        index = np.clip(np.searchsorted(x, epochs, side="right") - 1, 0, len(x) - 2)
+        step = x[index + 1] - x[index]
+        s = (epochs - x[index]) / step
+        s2 = s * s
+        s3 = s2 * s
+        return (
+            (2 * s3 - 3 * s2 + 1) * y[index]
+            + (s3 - 2 * s2 + s) * step * slope[index]
+            + (-2 * s3 + 3 * s2) * y[index + 1]
+            + (s3 - s2) * step * slope[index + 1]
+        )
@@ -0,0 +1,175 @@
+"""Compact columnar storage of heights/extremes (typed arrays)."""
+# Python library
+from array import array
+from collections.abc import Mapping, Sequence
+import json
+import logging
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+# Component library
+EXTREME_TYPE_LOW = -1
+EXTREME_TYPE_NONE = 0
+EXTREME_TYPE_HIGH = 1
+# date format of the server (UTC)
+DATE_FORMAT = "%Y-%m-%dT%H:%M+0000"
+
+
+def give_date_from_epoch(epoch):
+    """Give the server date string of an epoch."""
+    return time.strftime(DATE_FORMAT, time.gmtime(epoch))
+
+
+def give_extreme_type_code(tide_type):
+    """Give the code of an extreme type."""
+    if "High" in str(tide_type):
+        return EXTREME_TYPE_HIGH
+    if "Low" in str(tide_type):
+        return EXTREME_TYPE_LOW
+    return EXTREME_TYPE_NONE
+
+
+def give_extreme_type_name(tide_type_code):
+    """Give the name of an extreme type code."""
+    if tide_type_code == EXTREME_TYPE_HIGH:
+        return "High"
+    if tide_type_code == EXTREME_TYPE_LOW:
+        return "Low"
+    return "None"
+
+
+class Epoch_Date_Column(Sequence):
+    """Give the dates of an epoch column, computed on access."""
+
+    def __init__(self, epochs):
+        """Set the epoch column."""
+        self._epochs = epochs
+
+    def __len__(self):
+        """Give the number of dates."""
+        return len(self._epochs)
+
+    def __getitem__(self, index):
+        """Give the date(s) at index."""
+        if isinstance(index, slice):
+            return [give_date_from_epoch(epoch) for epoch in self._epochs[index]]
+        return give_date_from_epoch(self._epochs[index])
+
+
+class Compact_Tide_Data(Mapping):
+    """Raw data with heights/extremes stored as typed columns.
+
+    It reads as the raw data dict ; heights/extremes lists are only built
+    when they are asked for by key.
+    """
+
+    def __init__(
+        self,
+        fields,
+        heights_epoch=None,
+        heights_value=None,
+        extremes_epoch=None,
+        extremes_height=None,
+        extremes_type=None,
+        raw_fields=None,
+    ):
+        """Set the columns (None : section absent) and other fields.
+
+        raw_fields are JSON string contents kept as bytes, decoded on access.
+        """
+        self._fields = fields
+        self._raw_fields = raw_fields or {}
+        self.heights_epoch = heights_epoch
+        self.heights_value = heights_value
+        self.extremes_epoch = extremes_epoch
+        self.extremes_height = extremes_height
+        self.extremes_type = extremes_type
+
+    @classmethod
+    def from_raw_data(cls, data):
+        """Build the compact storage from raw data (sorted by epoch)."""
+        if data is None:
+            return None
+        fields = {
+            key: value
+            for key, value in data.items()
+            if key not in ("heights", "extremes")
+        }
+        compact_data = cls(fields)
+        if data.get("heights") is not None:
+            heights = sorted(data["heights"], key=lambda height: height["dt"])
+            compact_data.heights_epoch = array("q", [h["dt"] for h in heights])
+            compact_data.heights_value = array("d", [h["height"] for h in heights])
+        if data.get("extremes") is not None:
+            extremes = sorted(data["extremes"], key=lambda extreme: extreme["dt"])
+            compact_data.extremes_epoch = array("q", [e["dt"] for e in extremes])
+            compact_data.extremes_height = array("d", [e["height"] for e in extremes])
+            compact_data.extremes_type = array(
+                "b", [give_extreme_type_code(e.get("type")) for e in extremes]
+            )
+        return compact_data
+
+    def has_heights(self):
+        """Tell if the heights section is present."""
+        return self.heights_epoch is not None
+
+    def has_extremes(self):
+        """Tell if the extremes section is present."""
+        return self.extremes_epoch is not None
+
+    def _give_keys(self):
+        """Give the keys of the raw data."""
+        keys = list(self._fields) + list(self._raw_fields)
+        if self.has_heights():
+            keys.append("heights")
+        if self.has_extremes():
+            keys.append("extremes")
+        return keys
+
+    def __getitem__(self, key):
+        """Give a field, heights/extremes are built as lists of dict."""
+        if key == "heights" and self.has_heights():
+            return [
+                {
+                    "dt": epoch,
+                    "date": give_date_from_epoch(epoch),
+                    "height": height,
+                }
+                for epoch, height in zip(self.heights_epoch, self.heights_value)
+            ]
+        if key == "extremes" and self.has_extremes():
+            return [
+                {
+                    "dt": epoch,
+                    "date": give_date_from_epoch(epoch),
+                    "height": height,
+                    "type": give_extreme_type_name(tide_type),
+                }
+                for epoch, height, tide_type in zip(
+                    self.extremes_epoch, self.extremes_height, self.extremes_type
+                )
+            ]
+        if key in self._raw_fields:
+            return json.loads(b'"' + self._raw_fields[key] + b'"')
+        return self._fields[key]
+
+    def give_raw_field(self, key):
+        """Give a field kept raw as bytes (None if not raw)."""
+        return self._raw_fields.get(key)
+
+    def __contains__(self, key):
+        """Tell if key is present without building heights/extremes."""
+        return key in self._give_keys()
+
+    def __iter__(self):
+        """Iterate over the keys."""
+        return iter(self._give_keys())
+
+    def __len__(self):
+        """Give the number of keys."""
+        return len(self._give_keys())
+
+    def to_raw_data(self):
+        """Give the raw data dict."""
+        return {key: self[key] for key in self}
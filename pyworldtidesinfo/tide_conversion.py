@@ -0,0 +1,110 @@
+"""Convert heights between datums and units with the datums of a response."""
+# Python library
+from array import array
+import logging
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+from .tide_columns import Compact_Tide_Data
+from .tide_decoder import PLOT_CURVE_UNIT_FT, PLOT_CURVE_UNIT_M
+
+_LOGGER = logging.getLogger(__name__)
+
+# Component library
+METER_IN_FEET = 1 / 0.3048
+# unit of the heights of a converted response (meters if missing)
+HEIGHT_UNIT_KEY = "heightUnit"
+_UNIT_IN_METER = {PLOT_CURVE_UNIT_M: 1.0, PLOT_CURVE_UNIT_FT: METER_IN_FEET}
+
+
+def give_datum_offset(datums, from_datum, to_datum):
+    """Give the offset to add to a height to change its datum.
+
+    datums is the datums block of the response : height of each datum in
+    the response datum.
+    """
+    if from_datum == to_datum:
+        return 0.0
+    datum_heights = {datum["name"]: datum["height"] for datum in datums or []}
+    for datum in (from_datum, to_datum):
+        if datum not in datum_heights:
+            raise ValueError("unknown datum : {}".format(datum))
+    return datum_heights[from_datum] - datum_heights[to_datum]
+
+
+def give_unit_factor(from_unit, to_unit):
+    """Give the factor to change the unit of a height."""
+    for unit in (from_unit, to_unit):
+        if unit not in _UNIT_IN_METER:
+            raise ValueError("unknown unit : {}".format(unit))
+    return _UNIT_IN_METER[to_unit] / _UNIT_IN_METER[from_unit]
+
+
+def convert_heights(heights, offset=0.0, factor=1.0):
+    """Give (heights + offset) * factor for a whole series.
+
+    numpy arrays and typed arrays keep their type.
+    """
+    if np is not None and isinstance(heights, np.ndarray):
+        return (heights + offset) * factor
+    if isinstance(heights, array):
+        return array(heights.typecode, [(h + offset) * factor for h in heights])
+    return [(height + offset) * factor for height in heights]
+
+
+def _convert_entries(entries, offset, factor):
+    """Give heights/extremes entries with the height converted."""
+    return [
+        dict(entry, height=(entry["height"] + offset) * factor) for entry in entries
+    ]
+
+
+def convert_raw_data(data, to_datum=None, to_unit=None):
+    """Give a copy of raw data with heights in another datum and/or unit.
+
+    The datums block of the data is needed to change the datum.
+    """
+    if data is None:
+        return None
+    from_datum = data.get("responseDatum")
+    from_unit = data.get(HEIGHT_UNIT_KEY, PLOT_CURVE_UNIT_M)
+    if to_datum is None:
+        to_datum = from_datum
+    if to_unit is None:
+        to_unit = from_unit
+    offset = give_datum_offset(data.get("datums"), from_datum, to_datum)
+    factor = give_unit_factor(from_unit, to_unit)
+
+    fields = {}
+    for key in data:
+        if key in ("heights", "extremes"):
+            continue
+        fields[key] = data[key]
+    if "datums" in fields:
+        # the datums are heights too
+        fields["datums"] = _convert_entries(fields["datums"], offset, factor)
+    fields["responseDatum"] = to_datum
+    fields[HEIGHT_UNIT_KEY] = to_unit
+
+    if isinstance(data, Compact_Tide_Data):
+        converted_data = Compact_Tide_Data(fields)
+        if data.has_heights():
+            converted_data.heights_epoch = data.heights_epoch
+            converted_data.heights_value = convert_heights(
+                data.heights_value, offset, factor
+            )
+        if data.has_extremes():
+            converted_data.extremes_epoch = data.extremes_epoch
+            converted_data.extremes_height = convert_heights(
+                data.extremes_height, offset, factor
+            )
+            converted_data.extremes_type = data.extremes_type
+        return converted_data
+
+    for key in ("heights", "extremes"):
+        if data.get(key) is not None:
+            fields[key] = _convert_entries(data[key], offset, factor)
+    return fields
@@ -0,0 +1,471 @@
+"""Decoders of the World Tides Info responses (standard library only)."""
+# Python library
+import base64
+import logging
+import math
+
+from .tide_plot import (
+    PLOT_DEFAULT_BACKGROUND,
+    PLOT_DEFAULT_COLOR,
+    PLOT_HEIGHT,
+    PLOT_WIDTH,
+    render_tide_curve,
+)
+from .tide_timeline import Tide_Timeline, merge_tide_raw_data
+from .worldtidesinfo_metrics import instrument_queries
+
+_LOGGER = logging.getLogger(__name__)
+
+# Component library
+# units of the heights (units parameter of the requests)
+PLOT_CURVE_UNIT_FT = "feet"
+PLOT_CURVE_UNIT_M = "meters"
+
+
+class give_info_from_raw_data:
+    """Give a set of function to decode retrieved data."""
+
+    def __init__(self, data, instrumentation=None):
+        """Set data (queries are timed only with instrumentation)."""
+        self.load_raw_data(data)
+        if instrumentation is not None:
+            instrument_queries(self, instrumentation)
+
+    def load_raw_data(self, data):
+        """Set new data (forget the timeline and the memoized answers)."""
+        self._data = data
+        self._timeline = None
+        self._station_name_index = None
+        # (query, next_tide_flag) : (low, high, answer) valid for low < time <= high
+        self._memo = {}
+
+    def _give_timeline(self):
+        """Give the compiled timeline (built on first query)."""
+        if self._timeline is None:
+            self._timeline = Tide_Timeline(self._data)
+        return self._timeline
+
+    def _give_memoized(self, memo_key, current_time):
+        """Give the memoized answer valid at current_time (None if none)."""
+        memo_entry = self._memo.get(memo_key)
+        if memo_entry is not None and memo_entry[0] < current_time <= memo_entry[1]:
+            return dict(memo_entry[2])
+        return None
+
+    def _store_memoized(self, memo_key, current_time, next_tide_flag, answer):
+        """Memoize an answer with the time interval it stays valid for.
+
+        The answers only depend on the extremes around current_time.
+        """
+        timeline = self._give_timeline()
+        low, high = timeline.next_extreme_interval(current_time)
+        if not next_tide_flag and low == -math.inf and high != math.inf:
+            # before the first extreme : no previous tide, except at it
+            if current_time < high:
+                high -= 1
+            else:
+                low = high - 1
+        self._memo[memo_key] = (low, high, dict(answer))
+        return answer
+
+    def give_tide_in_epoch(self, current_epoch_time, next_tide_flag):
+        """Give Tide info from X seconds from epoch."""
+        if self._data is None:
+            return {"error": "no data"}
+        if "extremes" not in self._data:
+            return {"error": "no extremes"}
+
+        current_time = int(current_epoch_time)
+        memo_key = ("tide", bool(next_tide_flag))
+        answer = self._give_memoized(memo_key, current_time)
+        if answer is None:
+            answer = self._store_memoized(
+                memo_key,
+                current_time,
+                next_tide_flag,
+                self._give_tide_in_epoch(current_time, next_tide_flag),
+            )
+        return answer
+
+    def _give_tide_in_epoch(self, current_time, next_tide_flag):
+        """Give Tide info at current time (not memoized)."""
+        timeline = self._give_timeline()
+        if next_tide_flag:
+            next_tide = timeline.next_extreme_index(current_time)
+        else:
+            next_tide = timeline.previous_extreme_index(current_time)
+        if next_tide >= timeline.extremes_count():
+            return {"error": "no date in future"}
+        if next_tide_flag is False:
+            if timeline.extremes_epoch[next_tide] > current_time:
+                return {"error": "no date in past"}
+
+        tide_time = timeline.extremes_epoch[next_tide]
+
+        tide_type = "None"
+        if "High" in str(timeline.extremes_type[next_tide]):
+            tide_type = "High"
+        elif "Low" in str(timeline.extremes_type[next_tide]):
+            tide_type = "Low"
+        else:
+            tide_type = "None"
+
+        return {"tide_type": tide_type, "tide_time": tide_time}
+
+    def give_next_tide_in_epoch(self, current_epoch_time):
+        """Give Next Tide info from X seconds from epoch."""
+        next_tide_flag = True
+        return self.give_tide_in_epoch(current_epoch_time, next_tide_flag)
+
+    def give_previous_tide_in_epoch(self, current_epoch_time):
+        """Give Previous Tide info from X seconds from epoch."""
+        next_tide_flag = False
+        return self.give_tide_in_epoch(current_epoch_time, next_tide_flag)
+
+    def give_vertical_ref(self):
+        """Give Vertical Ref (LAT,...)."""
+        if self._data is None:
+            return {"error": "no data"}
+        elif "responseDatum" in self._data:
+            return {"vertical_ref": self._data["responseDatum"]}
+        else:
+            return {"error": "no vertical ref"}
+
+    def give_tidal_station_used(self):
+        """Give Tidal Station."""
+        if self._data is None:
+            return {"error": "no data"}
+        elif "station" in self._data:
+            return {"station": self._data["station"]}
+        else:
+            return {"error": "no reference station used"}
+
+    def give_high_low_tide_in_UTC(self, current_epoch_time, next_tide_flag):
+        """Give High/Low Tide info from X seconds from epoch."""
+        if self._data is None:
+            return {"error": "no data"}
+        if "extremes" not in self._data:
+            return {"error": "no extremes"}
+
+        current_time = int(current_epoch_time)
+        memo_key = ("high_low_tide", bool(next_tide_flag))
+        answer = self._give_memoized(memo_key, current_time)
+        if answer is None:
+            answer = self._store_memoized(
+                memo_key,
+                current_time,
+                next_tide_flag,
+                self._give_high_low_tide_in_UTC(current_time, next_tide_flag),
+            )
+        return answer
+
+    def _give_high_low_tide_in_UTC(self, current_time, next_tide_flag):
+        """Give High/Low Tide info at current time (not memoized)."""
+        timeline = self._give_timeline()
+
+        # Next tide : first extreme not before current time
+        if next_tide_flag:
+            next_tide = timeline.next_extreme_index(current_time)
+        else:
+            next_tide = timeline.previous_extreme_index(current_time)
+
+        if next_tide >= timeline.extremes_count():
+            return {"error": "no date in future"}
+
+        # As we are looking also for next one
+        if (next_tide + 1) >= timeline.extremes_count():
+            return {"error": "no date in future for next one"}
+
+        if not next_tide_flag:
+            if timeline.extremes_epoch[next_tide] > current_time:
+                return {"error": "no date in past"}
+
+        if "High" in str(timeline.extremes_type[next_tide]):
+            high_tide = next_tide
+            low_tide = next_tide + 1
+        elif "Low" in str(timeline.extremes_type[next_tide]):
+            high_tide = next_tide + 1
+            low_tide = next_tide
+        else:
+            return {"error": "no tide type"}
+
+        return {
+            "high_tide_time_utc": timeline.extremes_date[high_tide],
+            "high_tide_time_epoch": timeline.extremes_epoch[high_tide],
+            "high_tide_height": timeline.extremes_height[high_tide],
+            "low_tide_time_utc": timeline.extremes_date[low_tide],
+            "low_tide_time_epoch": timeline.extremes_epoch[low_tide],
+            "low_tide_height": timeline.extremes_height[low_tide],
+        }
+
+    def give_tide_extrema_within_time_frame(self, epoch_frame_min, epoch_frame_max):
+        """Retrieve data extrema from frame_min to frame_max."""
+        if self._data is None:
+            return {"error": "no data"}
+        if "extremes" not in self._data:
+            return {"error": "no extremes"}
+
+        timeline = self._give_timeline()
+        extrema_range = timeline.extremes_within_time_frame(
+            epoch_frame_min, epoch_frame_max
+        )
+        return {
+            "extrema_value": list(
+                timeline.extremes_height[extrema_range.start : extrema_range.stop]
+            ),
+            "extrema_epoch": list(
+                timeline.extremes_epoch[extrema_range.start : extrema_range.stop]
+            ),
+            "extrema_type": list(
+                timeline.extremes_type[extrema_range.start : extrema_range.stop]
+            ),
+        }
+
+    def give_next_high_low_tide_in_UTC(self, current_epoch_time):
+        """Give Next High/Low Tide info from X seconds from epoch."""
+        next_tide_flag = True
+        return self.give_high_low_tide_in_UTC(current_epoch_time, next_tide_flag)
+
+    def give_current_high_low_tide_in_UTC(self, current_epoch_time):
+        """Give Previous High/Low Tide info from X seconds from epoch."""
+        next_tide_flag = False
+        return self.give_high_low_tide_in_UTC(current_epoch_time, next_tide_flag)
+
+    def give_current_height_in_UTC(self, current_epoch_time):
+        """Give current height at X seconds from epoch."""
+        current_time = int(current_epoch_time)
+
+        if self._data is None:
+            return {"error": "no data"}
+
+        timeline = self._give_timeline()
+        if "heights" not in self._data or timeline.heights_count() == 0:
+            return {"error": "no heights"}
+
+        # The height
+        current_height_index = timeline.current_height_index(current_time)
+
+        return {
+            "current_height": timeline.heights_value[current_height_index],
+            "current_height_utc": timeline.heights_date[current_height_index],
+            "current_height_epoch": timeline.heights_epoch[current_height_index],
+        }
+
+    def give_tide_prediction_within_time_frame(self, epoch_frame_min, epoch_frame_max):
+        """Retrieve data from frame_min to frame_max."""
+        if self._data is None:
+            return {"error": "no data"}
+        if "heights" not in self._data:
+            return {"error": "no heights"}
+
+        timeline = self._give_timeline()
+        height_range = timeline.heights_within_time_frame(
+            epoch_frame_min, epoch_frame_max
+        )
+        return {
+            "height_value": list(
+                timeline.heights_value[height_range.start : height_range.stop]
+            ),
+            "height_epoch": list(
+                timeline.heights_epoch[height_range.start : height_range.stop]
+            ),
+        }
+
+    def give_station_list_info(self):
+        """Give Tide Station List."""
+        if self._data is None:
+            return None
+        return self._data["stations"]
+
+    def give_used_station_info(self):
+        """Give used tidal station info."""
+        if self._data is None:
+            return {"error": "no_data"}
+
+        if len(self._data["stations"]) > 0:
+            return {
+                "tide_station_used_name": self._data["stations"][0]["name"],
+                "tide_station_lat": self._data["stations"][0]["lat"],
+                "tide_station_long": self._data["stations"][0]["lon"],
+            }
+        return {"error": "used station not found"}
+
+    def _give_station_name_index(self):
+        """Give the index of each station name (last one if repeated)."""
+        if self._station_name_index is None:
+            self._station_name_index = {
+                station["name"]: index
+                for index, station in enumerate(self._data["stations"])
+            }
+        return self._station_name_index
+
+    def give_used_station_info_from_name(self, station_name):
+        """Give used tidal station info."""
+        if station_name is None:
+            return {"error": "no_station_name"}
+
+        if self._data is None:
+            return {"error": "no_data"}
+
+        tide_station_index = self._give_station_name_index().get(station_name)
+        if tide_station_index is not None:
+            station = self._data["stations"][tide_station_index]
+            return {
+                "tide_station_used_name": station["name"],
+                "tide_station_lat": station["lat"],
+                "tide_station_long": station["lon"],
+                "tide_station_timezone": station["timezone"],
+            }
+        return {"error": "used station detailed not found"}
+
+    def give_station_around_info(self):
+        """Give tidal station around info."""
+        if self._data is None:
+            return {"error": "no_data"}
+
+        station_around_nb = len(self._data["stations"])
+        if station_around_nb > 0:
+            station_around_name = "".join(
+                "; " + station["name"] for station in self._data["stations"]
+            )
+        else:
+            station_around_name = "None"
+
+        return {
+            "station_around_nb": station_around_nb,
+            "station_around_name": station_around_name,
+        }
+
+    def give_nearest_station_time_zone(self):
+        """Give the nearest tide station time zone."""
+        if self._data is None:
+            return {"error": "no_data"}
+        if len(self._data["stations"]) > 0:
+            return {"time_zone": self._data["stations"][0]["timezone"]}
+        else:
+            return {"error": "no station around"}
+
+    def give_datum(self):
+        """Give the datum ie different height LAT/CD/MSL/... ."""
+        if self._data is None:
+            return {"error": "no data"}
+        elif "datums" in self._data:
+            return {"datums": self._data["datums"]}
+        else:
+            return {"error": "no_datums"}
+
+    def give_plot_picture_without_header(self):
+        """Give picture in base 64 without the format header."""
+        if self._data is None:
+            return {"error": "no data"}
+        elif "plot" in self._data:
+            std_string = "data:image/png;base64,"
+            str_to_convert = self._data["plot"][
+                len(std_string) : len(self._data["plot"])
+            ]
+            return {"image": str_to_convert}
+        else:
+            return {"error": "no_image"}
+
+    def give_plot_picture_rendered(
+        self,
+        plot_color=PLOT_DEFAULT_COLOR,
+        plot_background=PLOT_DEFAULT_BACKGROUND,
+        epoch_frame_min=None,
+        epoch_frame_max=None,
+        width=PLOT_WIDTH,
+        height=PLOT_HEIGHT,
+    ):
+        """Give picture in base 64 drawn locally from heights (no header)."""
+        if self._data is None:
+            return {"error": "no data"}
+        if "heights" not in self._data:
+            return {"error": "no heights"}
+
+        timeline = self._give_timeline()
+        if epoch_frame_min is None:
+            epoch_frame_min = -math.inf
+        if epoch_frame_max is None:
+            epoch_frame_max = math.inf
+        height_range = timeline.heights_within_time_frame(
+            epoch_frame_min, epoch_frame_max
+        )
+        extrema_range = timeline.extremes_within_time_frame(
+            epoch_frame_min, epoch_frame_max
+        )
+        try:
+            picture = render_tide_curve(
+                timeline.heights_epoch[height_range.start : height_range.stop],
+                timeline.heights_value[height_range.start : height_range.stop],
+                timeline.extremes_epoch[extrema_range.start : extrema_range.stop],
+                timeline.extremes_height[extrema_range.start : extrema_range.stop],
+                plot_color,
+                plot_background,
+                width,
+                height,
+            )
+        except ValueError as err:
+            return {"error": str(err)}
+        return {"image": base64.b64encode(picture).decode("ascii")}
+
+
+class give_info_from_raw_datums_data:
+    """Decode datum information."""
+
+    def __init__(self, datums_data, instrumentation=None):
+        """Set data (queries are timed only with instrumentation)."""
+        self._datums_data = datums_data
+        if instrumentation is not None:
+            instrument_queries(self, instrumentation)
+
+    def give_mean_water_spring_datums_offset(self):
+        """Retrieve MWS mean water spring height ."""
+        if self._datums_data is None:
+            return {"error": "no data"}
+        MHW_index = 0
+        MLW_index = 0
+        for ref_index in range(len(self._datums_data)):
+            if self._datums_data[ref_index]["name"] == "MHWS":
+                MHW_index = ref_index
+            if self._datums_data[ref_index]["name"] == "MLWS":
+                MLW_index = ref_index
+        datum_offset_MHWS = self._datums_data[MHW_index]["height"]
+        datum_offset_MLWS = self._datums_data[MLW_index]["height"]
+
+        return {
+            "datum_offset_MHWS": datum_offset_MHWS,
+            "datum_offset_MLWS": datum_offset_MLWS,
+        }
+
+
+class give_info_from_raw_data_history(give_info_from_raw_data):
+    """Give a set of function to decode info from several data (newest first)."""
+
+    def __init__(self, data_list, instrumentation=None):
+        """Merge the data into one timeline, newer data win over their range."""
+        super().__init__(_merge_data_list(data_list), instrumentation)
+
+    def load_raw_data_list(self, data_list):
+        """Set new data (newest first), forget the memoized answers."""
+        self.load_raw_data(_merge_data_list(data_list))
+
+
+class give_info_from_raw_data_N_and_N_1(give_info_from_raw_data_history):
+    """Give a set of function to decode info from current or previous data."""
+
+    def __init__(self, data, previous_data, instrumentation=None):
+        """Set the flip flop data."""
+        super().__init__([data, previous_data], instrumentation)
+
+    def load_raw_data_N_and_N_1(self, data, previous_data):
+        """Set new flip flop data, forget the memoized answers."""
+        self.load_raw_data_list([data, previous_data])
+
+
+def _merge_data_list(data_list):
+    """Give the data of a list merged (newest first)."""
+    merged_data = None
+    for data in reversed(data_list):
+        if data is not None:
+            merged_data = merge_tide_raw_data(data, merged_data)
+    return merged_data
@@ -0,0 +1,257 @@
+"""Offline tide prediction by harmonic constituents fitted on heights."""
+# Python library
+import logging
+import math
+
+from .tide_columns import give_date_from_epoch
+from .tide_timeline import Tide_Timeline
+
+_LOGGER = logging.getLogger(__name__)
+
+# Component library
+# angular speed (degrees per hour), by decreasing usual importance
+HARMONIC_CONSTITUENTS = [
+    ("M2", 28.9841042),
+    ("K1", 15.0410686),
+    ("S2", 30.0000000),
+    ("O1", 13.9430356),
+    ("N2", 28.4397295),
+    ("M4", 57.9682084),
+    ("K2", 30.0821373),
+    ("P1", 14.9589314),
+    ("Q1", 13.3986609),
+    ("MS4", 58.9841042),
+    ("MN4", 57.4238337),
+    ("M6", 86.9523127),
+]
+# 2 constituents are separated if the data span this number of cycles of
+# their beat (Rayleigh criterion)
+HARMONIC_RAYLEIGH_CRITERION = 1.0
+# step (seconds) of the search of extremes
+HARMONIC_EXTREME_SEARCH_STEP = 600
+HARMONIC_PREDICTION_STEP = 900
+
+
+def select_constituents(
+    span_duration,
+    constituents=HARMONIC_CONSTITUENTS,
+    rayleigh_criterion=HARMONIC_RAYLEIGH_CRITERION,
+):
+    """Give the constituents that can be separated over span_duration (s)."""
+    span_hours = span_duration / 3600
+    selected = []
+    for name, speed in constituents:
+        if all(
+            abs(speed - selected_speed) / 360 * span_hours >= rayleigh_criterion
+            for _, selected_speed in selected
+        ) and (speed / 360 * span_hours >= rayleigh_criterion):
+            selected.append((name, speed))
+    return selected
+
+
+def _solve_linear_system(matrix, vector):
+    """Solve matrix . x = vector (Gaussian elimination, partial pivoting)."""
+    size = len(vector)
+    augmented = [list(matrix[row]) + [vector[row]] for row in range(size)]
+    for column in range(size):
+        pivot = max(range(column, size), key=lambda row: abs(augmented[row][column]))
+        if abs(augmented[pivot][column]) < 1e-12:
+            raise ValueError("harmonic fit is singular")
+        augmented[column], augmented[pivot] = augmented[pivot], augmented[column]
+        pivot_row = augmented[column]
+        for row in range(column + 1, size):
+            factor = augmented[row][column] / pivot_row[column]
+            if factor:
+                current_row = augmented[row]
+                for index in range(column, size + 1):
+                    current_row[index] -= factor * pivot_row[index]
+    solution = [0.0] * size
+    for row in range(size - 1, -1, -1):
+        total = augmented[row][size] - sum(
+            augmented[row][index] * solution[index] for index in range(row + 1, size)
+        )
+        solution[row] = total / augmented[row][row]
+    return solution
+
+
+class Harmonic_Tide_Model:
+    """Tide model fitted by least squares on heights of a response."""
+
+    def __init__(self, reference_epoch, mean_height, constituents, fit_info):
+        """Set the model (constituents : name, speed, cosine, sine)."""
+        self._reference_epoch = reference_epoch
+        self._mean_height = mean_height
+        self._constituents = constituents
+        self._fit_info = fit_info
+
+    @classmethod
+    def fit(
+        cls,
+        data,
+        constituents=HARMONIC_CONSTITUENTS,
+        rayleigh_criterion=HARMONIC_RAYLEIGH_CRITERION,
+    ):
+        """Fit the model on the heights of raw data."""
+        timeline = Tide_Timeline(data)
+        epochs = timeline.heights_epoch
+        heights = timeline.heights_value
+        if len(epochs) < 3:
+            raise ValueError("not enough heights to fit a harmonic model")
+        span_duration = epochs[-1] - epochs[0]
+        selected = select_constituents(span_duration, constituents, rayleigh_criterion)
+        reference_epoch = epochs[0]
+
+        speeds = [math.radians(speed) / 3600 for _, speed in selected]
+        size = 1 + 2 * len(speeds)
+        normal_matrix = [[0.0] * size for _ in range(size)]
+        normal_vector = [0.0] * size
+        for epoch, height in zip(epochs, heights):
+            row = _give_design_row(speeds, epoch - reference_epoch)
+            for line in range(size):
+                value = row[line]
+                normal_vector[line] += value * height
+                matrix_line = normal_matrix[line]
+                for column in range(line, size):
+                    matrix_line[column] += value * row[column]
+        for line in range(size):
+            for column in range(line):
+                normal_matrix[line][column] = normal_matrix[column][line]
+        solution = _solve_linear_system(normal_matrix, normal_vector)
+
+        model_constituents = [
+            (name, speed, solution[1 + 2 * index], solution[2 + 2 * index])
+            for index, (name, speed) in enumerate(
+                zip([name for name, _ in selected], speeds)
+            )
+        ]
+        model = cls(reference_epoch, solution[0], model_constituents, {})
+        squared_residual = sum(
+            (model.predict_height(epoch) - height) ** 2
+            for epoch, height in zip(epochs, heights)
+        )
+        model._fit_info = {
+            "rms_residual": math.sqrt(squared_residual / len(epochs)),
+            "fit_start": epochs[0],
+            "fit_end": epochs[-1],
+            "constituents": [name for name, _ in selected],
+            "vertical_ref": (data or {}).get("responseDatum"),
+        }
+        return model
+
+    def give_fit_info(self):
+        """Give residual, fitted period and constituents of the model."""
+        return dict(self._fit_info)
+
+    def give_amplitude_phase(self):
+        """Give amplitude and phase (degrees) of each constituent."""
+        return {
+            name: {
+                "amplitude": math.hypot(cosine, sine),
+                "phase": math.degrees(math.atan2(sine, cosine)) % 360,
+            }
+            for name, _, cosine, sine in self._constituents
+        }
+
+    def give_error_estimate(self, epoch):
+        """Give an error estimate (same unit as heights) at epoch.
+
+        The fit residual, grown linearly with the distance to the fitted
+        period in number of fitted spans.
+        """
+        fit_start = self._fit_info["fit_start"]
+        fit_end = self._fit_info["fit_end"]
+        span_duration = max(fit_end - fit_start, 1)
+        distance = max(fit_start - epoch, epoch - fit_end, 0)
+        return self._fit_info["rms_residual"] * (1 + distance / span_duration)
+
+    def need_refresh(self, epoch, tolerance):
+        """Tell if the error estimate at epoch exceeds the tolerance."""
+        return self.give_error_estimate(epoch) > tolerance
+
+    def predict_height(self, epoch):
+        """Give the predicted height at epoch."""
+        elapsed = epoch - self._reference_epoch
+        height = self._mean_height
+        for _, speed, cosine, sine in self._constituents:
+            angle = speed * elapsed
+            height += cosine * math.cos(angle) + sine * math.sin(angle)
+        return height
+
+    def predict_heights(self, epochs):
+        """Give the predicted heights at epochs."""
+        return [self.predict_height(epoch) for epoch in epochs]
+
+    def _predict_slope(self, epoch):
+        """Give the derivative of the height at epoch."""
+        elapsed = epoch - self._reference_epoch
+        slope = 0.0
+        for _, speed, cosine, sine in self._constituents:
+            angle = speed * elapsed
+            slope += speed * (sine * math.cos(angle) - cosine * math.sin(angle))
+        return slope
+
+    def predict_extremes(self, start_epoch, end_epoch):
+        """Give the predicted extremes (dt, height, type) within the period."""
+        extremes = []
+        epoch = start_epoch
+        slope = self._predict_slope(epoch)
+        while epoch < end_epoch:
+            next_epoch = min(epoch + HARMONIC_EXTREME_SEARCH_STEP, end_epoch)
+            next_slope = self._predict_slope(next_epoch)
+            if slope > 0 >= next_slope or slope < 0 <= next_slope:
+                extreme_epoch = self._give_zero_slope(epoch, next_epoch, slope)
+                extremes.append(
+                    {
+                        "dt": extreme_epoch,
+                        "height": self.predict_height(extreme_epoch),
+                        "type": "High" if slope > 0 else "Low",
+                    }
+                )
+            epoch, slope = next_epoch, next_slope
+        return extremes
+
+    def _give_zero_slope(self, low_epoch, high_epoch, low_slope):
+        """Give the epoch (second) of zero slope between 2 epochs."""
+        while high_epoch - low_epoch > 1:
+            middle_epoch = (low_epoch + high_epoch) / 2
+            middle_slope = self._predict_slope(middle_epoch)
+            if (middle_slope > 0) == (low_slope > 0):
+                low_epoch, low_slope = middle_epoch, middle_slope
+            else:
+                high_epoch = middle_epoch
+        return int(round(low_epoch))
+
+    def give_raw_data(self, start_epoch, end_epoch, step=HARMONIC_PREDICTION_STEP):
+        """Give predicted raw data, to decode with give_info_from_raw_data."""
+        start_epoch = int(start_epoch)
+        heights = [
+            {
+                "dt": epoch,
+                "date": give_date_from_epoch(epoch),
+                "height": self.predict_height(epoch),
+            }
+            for epoch in range(start_epoch, int(end_epoch) + 1, step)
+        ]
+        extremes = self.predict_extremes(start_epoch, end_epoch)
+        for extreme in extremes:
+            extreme["date"] = give_date_from_epoch(extreme["dt"])
+        raw_data = {
+            "status": 200,
+            "callCount": 0,
+            "heights": heights,
+            "extremes": extremes,
+            "harmonic": self.give_fit_info(),
+        }
+        if self._fit_info.get("vertical_ref") is not None:
+            raw_data["responseDatum"] = self._fit_info["vertical_ref"]
+        return raw_data
+
+
+def _give_design_row(speeds, elapsed):
+    """Give the least squares row of the elapsed seconds."""
+    row = [1.0]
+    for speed in speeds:
+        angle = speed * elapsed
+        row.append(math.cos(angle))
+        row.append(math.sin(angle))
+    return row
@@ -0,0 +1,134 @@
+"""Render the tide curve as a PNG locally (stdlib zlib encoder)."""
+# Python library
+from bisect import bisect_right
+import logging
+import struct
+import zlib
+
+_LOGGER = logging.getLogger(__name__)
+
+# Component library
+PLOT_WIDTH = 640
+PLOT_HEIGHT = 240
+PLOT_MARGIN = 8
+PLOT_DEFAULT_COLOR = "2,102,255"
+PLOT_DEFAULT_BACKGROUND = "255,255,255"
+# curve and extreme markers are drawn with the color darkened by this factor
+PLOT_LINE_SHADE = 0.6
+PLOT_MARKER_SIZE = 2
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def give_rgb_from_color(color):
+    """Give the RGB bytes of a "R,G,B" color string."""
+    try:
+        red, green, blue = [int(value) for value in str(color).split(",")]
+    except ValueError:
+        raise ValueError("color must be R,G,B : {}".format(color)) from None
+    return bytes(max(0, min(255, value)) for value in (red, green, blue))
+
+
+def _png_chunk(chunk_type, content):
+    """Give a PNG chunk."""
+    return (
+        struct.pack(">I", len(content))
+        + chunk_type
+        + content
+        + struct.pack(">I", zlib.crc32(chunk_type + content) & 0xFFFFFFFF)
+    )
+
+
+def encode_png(width, height, rows):
+    """Encode RGB rows (bytes of 3 * width) into a PNG."""
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    # filter type 0 (None) in front of each row
+    raw_picture = b"".join(b"\x00" + bytes(row) for row in rows)
+    return (
+        _PNG_SIGNATURE
+        + _png_chunk(b"IHDR", header)
+        + _png_chunk(b"IDAT", zlib.compress(raw_picture, 9))
+        + _png_chunk(b"IEND", b"")
+    )
+
+
+def _give_interpolated_height(epochs, heights, epoch):
+    """Give the height at epoch by linear interpolation."""
+    index = bisect_right(epochs, epoch)
+    if index <= 0:
+        return heights[0]
+    if index >= len(epochs):
+        return heights[-1]
+    ratio = (epoch - epochs[index - 1]) / (epochs[index] - epochs[index - 1])
+    return heights[index - 1] + ratio * (heights[index] - heights[index - 1])
+
+
+def render_tide_curve(
+    heights_epoch,
+    heights_value,
+    extremes_epoch=(),
+    extremes_height=(),
+    plot_color=PLOT_DEFAULT_COLOR,
+    plot_background=PLOT_DEFAULT_BACKGROUND,
+    width=PLOT_WIDTH,
+    height=PLOT_HEIGHT,
+):
+    """Give the PNG of the filled tide curve with extremes markers."""
+    if len(heights_epoch) < 2:
+        raise ValueError("at least 2 heights are needed to draw the curve")
+    color = give_rgb_from_color(plot_color)
+    background = give_rgb_from_color(plot_background)
+    line_color = bytes(int(value * PLOT_LINE_SHADE) for value in color)
+
+    first_epoch = heights_epoch[0]
+    epoch_span = max(heights_epoch[-1] - first_epoch, 1)
+    height_min = min(min(heights_value), min(extremes_height, default=heights_value[0]))
+    height_max = max(max(heights_value), max(extremes_height, default=heights_value[0]))
+    height_span = max(height_max - height_min, 1e-6)
+    drawing_height = height - 2 * PLOT_MARGIN
+
+    def give_row(value):
+        """Give the picture row of a height."""
+        return PLOT_MARGIN + int(
+            round((height_max - value) / height_span * (drawing_height - 1))
+        )
+
+    # top row of the filled area for each column
+    column_top = [
+        give_row(
+            _give_interpolated_height(
+                heights_epoch,
+                heights_value,
+                first_epoch + column * epoch_span / max(width - 1, 1),
+            )
+        )
+        for column in range(width)
+    ]
+
+    rows = []
+    for row in range(height):
+        pixels = bytearray(background * width)
+        for column in range(width):
+            top = column_top[column]
+            if top <= row:
+                pixel_color = line_color if row - top < 2 else color
+                pixels[3 * column : 3 * column + 3] = pixel_color
+        rows.append(pixels)
+
+    for epoch, value in zip(extremes_epoch, extremes_height):
+        if not first_epoch <= epoch <= first_epoch + epoch_span:
+            continue
+        center_column = int(round((epoch - first_epoch) / epoch_span * (width - 1)))
+        center_row = give_row(value)
+        for row in range(
+            center_row - PLOT_MARKER_SIZE, center_row + PLOT_MARKER_SIZE + 1
+        ):
+            if not 0 <= row < height:
+                continue
+            for column in range(
+                center_column - PLOT_MARKER_SIZE, center_column + PLOT_MARKER_SIZE + 1
+            ):
+                if 0 <= column < width:
+                    rows[row][3 * column : 3 * column + 3] = line_color
+
+    return encode_png(width, height, rows)
@@ -0,0 +1,242 @@
+"""Binary snapshot of decoded tide data, memory-mapped read-only by workers.
+
+Layout : header, fixed-width columns (8 bytes aligned), fixed-width index.
+header : magic, version, byte order, entry count, index offset
+index record : name, fields (JSON), heights (epoch q, value d) and extremes
+(epoch q, height d, type b) offsets and counts.
+The columns are read in place (memoryview of the mapping) : no copy.
+"""
+# Python library
+from array import array
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+
+from .tide_columns import Compact_Tide_Data
+from .tide_decoder import give_info_from_raw_data
+from .worldtidesinfo_cache import atomic_write
+
+_LOGGER = logging.getLogger(__name__)
+
+# Component library
+SNAPSHOT_MAGIC = b"WTISNAP\x00"
+SNAPSHOT_VERSION = 1
+# magic, version, byte order (0 little, 1 big), entry count, index offset
+_HEADER = struct.Struct("<8sHHIQ")
+# name offset/size, fields offset/size, heights offset/count,
+# extremes offset/count (count SNAPSHOT_ABSENT : section absent)
+_INDEX_RECORD = struct.Struct("<QIQIQIQI")
+SNAPSHOT_ABSENT = 0xFFFFFFFF
+# fields not kept : the queries do not need them (plot : large)
+SNAPSHOT_SKIPPED_FIELDS = ("heights", "extremes", "plot")
+_BYTE_ORDER = 0 if sys.byteorder == "little" else 1
+
+
+def _give_columns(data, section):
+    """Give the typed columns of a section (None if absent)."""
+    if not isinstance(data, Compact_Tide_Data):
+        data = Compact_Tide_Data.from_raw_data(data)
+    if section == "heights":
+        if not data.has_heights():
+            return None
+        return (array("q", data.heights_epoch), array("d", data.heights_value))
+    if not data.has_extremes():
+        return None
+    return (
+        array("q", data.extremes_epoch),
+        array("d", data.extremes_height),
+        array("b", data.extremes_type),
+    )
+
+
+class _Snapshot_Builder:
+    """Append 8 bytes aligned blocks."""
+
+    def __init__(self):
+        """Start after the header."""
+        self.blocks = [bytes(_HEADER.size)]
+        self.size = _HEADER.size
+
+    def append(self, content):
+        """Append content, give its offset."""
+        padding = -self.size % 8
+        if padding:
+            self.blocks.append(bytes(padding))
+            self.size += padding
+        offset = self.size
+        self.blocks.append(content)
+        self.size += len(content)
+        return offset
+
+
+def give_snapshot_content(entries):
+    """Give the snapshot bytes of entries (name : raw or compact data)."""
+    builder = _Snapshot_Builder()
+    records = []
+    for name, data in entries.items():
+        name_content = name.encode("utf-8")
+        fields = {key: data[key] for key in data if key not in SNAPSHOT_SKIPPED_FIELDS}
+        fields_content = json.dumps(fields).encode("utf-8")
+        record = [
+            builder.append(name_content),
+            len(name_content),
+            builder.append(fields_content),
+            len(fields_content),
+        ]
+        for section in ("heights", "extremes"):
+            columns = _give_columns(data, section)
+            if columns is None:
+                record.extend((0, SNAPSHOT_ABSENT))
+                continue
+            offset = builder.append(columns[0].tobytes())
+            for column in columns[1:]:
+                builder.append(column.tobytes())
+            record.extend((offset, len(columns[0])))
+        records.append(record)
+
+    index_offset = builder.append(
+        b"".join(_INDEX_RECORD.pack(*record) for record in records)
+    )
+    builder.blocks[0] = _HEADER.pack(
+        SNAPSHOT_MAGIC, SNAPSHOT_VERSION, _BYTE_ORDER, len(records), index_offset
+    )
+    return b"".join(builder.blocks)
+
+
+def write_snapshot(path, entries):
+    """Write the snapshot of entries atomically (readers keep the old one)."""
+    atomic_write(path, give_snapshot_content(entries))
+
+
+class Tide_Snapshot:
+    """Read a snapshot through a read-only memory mapping.
+
+    The data given are Compact_Tide_Data whose columns are memoryviews of
+    the mapping : the pages are shared by all the processes reading it.
+    """
+
+    def __init__(self, path):
+        """Map the snapshot."""
+        self._path = path
+        self._open()
+
+    def _open(self):
+        """Map the file and read its index."""
+        with open(self._path, "rb") as snapshot_file:
+            self._file_id = _give_file_id(os.fstat(snapshot_file.fileno()))
+            self._mmap = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        magic, version, byte_order, entry_count, index_offset = _HEADER.unpack_from(
+            self._view
+        )
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError("not a snapshot version {}".format(SNAPSHOT_VERSION))
+        if byte_order != _BYTE_ORDER:
+            raise ValueError("snapshot of another byte order")
+        self._index = {}
+        for index in range(entry_count):
+            record = _INDEX_RECORD.unpack_from(
+                self._view, index_offset + index * _INDEX_RECORD.size
+            )
+            name = bytes(self._view[record[0] : record[0] + record[1]]).decode("utf-8")
+            self._index[name] = record[2:]
+        self._data = {}
+        self._infos = {}
+
+    def give_names(self):
+        """Give the names of the entries."""
+        return list(self._index)
+
+    def __contains__(self, name):
+        """Tell if name has an entry."""
+        return name in self._index
+
+    def _give_column(self, offset, count, typecode):
+        """Give a column of the mapping without copy, and the next offset."""
+        size = count * struct.calcsize(typecode)
+        column = self._view[offset : offset + size].cast(typecode)
+        return column, offset + size
+
+    def give_data(self, name):
+        """Give the Compact_Tide_Data of name (KeyError if missing)."""
+        data = self._data.get(name)
+        if data is not None:
+            return data
+        (
+            fields_offset,
+            fields_size,
+            heights_offset,
+            heights_count,
+            extremes_offset,
+            extremes_count,
+        ) = self._index[name]
+        data = Compact_Tide_Data(
+            json.loads(bytes(self._view[fields_offset : fields_offset + fields_size]))
+        )
+        if heights_count != SNAPSHOT_ABSENT:
+            data.heights_epoch, offset = self._give_column(
+                heights_offset, heights_count, "q"
+            )
+            data.heights_value, _ = self._give_column(offset, heights_count, "d")
+        if extremes_count != SNAPSHOT_ABSENT:
+            data.extremes_epoch, offset = self._give_column(
+                extremes_offset, extremes_count, "q"
+            )
+            data.extremes_height, offset = self._give_column(
+                offset, extremes_count, "d"
+            )
+            data.extremes_type, _ = self._give_column(offset, extremes_count, "b")
+        self._data[name] = data
+        return data
+
+    def give_info(self, name):
+        """Give the give_info_from_raw_data decoder of name (kept)."""
+        info = self._infos.get(name)
+        if info is None:
+            info = give_info_from_raw_data(self.give_data(name))
+            self._infos[name] = info
+        return info
+
+    def is_changed(self):
+        """Tell if the file was replaced since mapped."""
+        try:
+            return _give_file_id(os.stat(self._path)) != self._file_id
+        except OSError:
+            return False
+
+    def reload_if_changed(self):
+        """Map the new snapshot if replaced, tell if reloaded.
+
+        The data given before stay valid : they keep the old mapping.
+        """
+        if not self.is_changed():
+            return False
+        self._open()
+        return True
+
+    def close(self):
+        """Release the mapping (kept while data given are referenced)."""
+        self._data = {}
+        self._infos = {}
+        self._index = {}
+        self._view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            _LOGGER.debug("Snapshot data still referenced, mapping kept")
+
+    def __enter__(self):
+        """Give the snapshot."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Release the mapping."""
+        self.close()
+
+
+def _give_file_id(file_stat):
+    """Give what changes when a file is replaced."""
+    return (file_stat.st_ino, file_stat.st_mtime_ns, file_stat.st_size)
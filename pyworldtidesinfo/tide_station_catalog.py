@@ -0,0 +1,223 @@
+"""Catalog of the tide stations received, with a spatial grid index."""
+# Python library
+import json
+import logging
+import math
+import os
+import threading
+
+from .worldtidesinfo_cache import atomic_write
+
+_LOGGER = logging.getLogger(__name__)
+
+# Component library
+EARTH_RADIUS_KM = 6371.0
+# km along a meridian for one degree of latitude
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# size (degrees) of the cells of the grid index
+CATALOG_CELL_SIZE = 1.0
+CATALOG_VERSION = 1
+
+
+def give_distance_km(lat1, lon1, lat2, lon2):
+    """Give the great circle distance (km) between 2 points (haversine)."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    delta_phi = phi2 - phi1
+    delta_lambda = math.radians(lon2 - lon1)
+    haversine = (
+        math.sin(delta_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(haversine)))
+
+
+class Station_Catalog:
+    """Stations of all the ?stations responses and the areas they cover.
+
+    An area (center, distance) is covered once a ?stations request has been
+    sent for an area containing it : its stations are all known.
+    """
+
+    def __init__(self, path=None, cell_size=CATALOG_CELL_SIZE):
+        """Initialize the catalog, loaded from path if it exists."""
+        self._path = path
+        self._cell_size = cell_size
+        self._lon_cell_count = max(1, int(round(360 / cell_size)))
+        self._lock = threading.RLock()
+        self._stations = {}
+        self._grid = {}
+        self._names = {}
+        # (lat, lon, distance km) of the ?stations requests
+        self._coverage = []
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def _give_cell(self, lat, lon):
+        """Give the grid cell of a point."""
+        lat_cell = math.floor(lat / self._cell_size)
+        lon_cell = math.floor(lon / self._cell_size) % self._lon_cell_count
+        return lat_cell, lon_cell
+
+    def _give_cells_around(self, lat, lon, distance):
+        """Give the grid cells that may hold points within distance (km)."""
+        delta_lat = distance / KM_PER_DEGREE
+        lat_cells = range(
+            math.floor((lat - delta_lat) / self._cell_size),
+            math.floor((lat + delta_lat) / self._cell_size) + 1,
+        )
+        # the longitude degree shrinks toward the poles
+        cos_lat = min(
+            math.cos(math.radians(min(abs(lat) + delta_lat, 90.0))),
+            math.cos(math.radians(abs(lat))),
+        )
+        if cos_lat <= 1e-9 or distance / (KM_PER_DEGREE * cos_lat) >= 180:
+            lon_cells = range(self._lon_cell_count)
+        else:
+            delta_lon = distance / (KM_PER_DEGREE * cos_lat)
+            lon_cells = sorted(
+                {
+                    lon_cell % self._lon_cell_count
+                    for lon_cell in range(
+                        math.floor((lon - delta_lon) / self._cell_size),
+                        math.floor((lon + delta_lon) / self._cell_size) + 1,
+                    )
+                }
+            )
+        return [
+            (lat_cell, lon_cell) for lat_cell in lat_cells for lon_cell in lon_cells
+        ]
+
+    def add_station(self, station):
+        """Add (or update) a station."""
+        station_id = station.get("id", station.get("name"))
+        with self._lock:
+            previous_station = self._stations.get(station_id)
+            if previous_station is not None:
+                self._remove_from_index(station_id, previous_station)
+            self._stations[station_id] = station
+            self._grid.setdefault(
+                self._give_cell(station["lat"], station["lon"]), set()
+            ).add(station_id)
+            self._names.setdefault(station.get("name"), set()).add(station_id)
+
+    def _remove_from_index(self, station_id, station):
+        """Remove a station from the grid and name indexes."""
+        self._grid.get(self._give_cell(station["lat"], station["lon"]), set()).discard(
+            station_id
+        )
+        self._names.get(station.get("name"), set()).discard(station_id)
+
+    def add_stations_response(self, lat, lon, distance, data):
+        """Add the stations of a ?stations response and the area covered."""
+        if data is None or data.get("stations") is None:
+            return
+        with self._lock:
+            for station in data["stations"]:
+                self.add_station(station)
+            self._add_coverage(lat, lon, distance)
+
+    def _add_coverage(self, lat, lon, distance):
+        """Add an area covered, unless within another one (keeps no duplicate)."""
+        if self.is_covered(lat, lon, distance):
+            return
+        # the areas within the new one are not needed anymore
+        self._coverage = [
+            area
+            for area in self._coverage
+            if give_distance_km(lat, lon, area[0], area[1]) + area[2] > distance
+        ]
+        self._coverage.append((lat, lon, distance))
+
+    def give_coverage(self):
+        """Give the areas covered (lat, lon, distance km)."""
+        with self._lock:
+            return list(self._coverage)
+
+    def is_covered(self, lat, lon, distance):
+        """Tell if all the stations within distance (km) of lat/lon are known."""
+        with self._lock:
+            return any(
+                give_distance_km(lat, lon, covered_lat, covered_lon) + distance
+                <= covered_distance
+                for covered_lat, covered_lon, covered_distance in self._coverage
+            )
+
+    def give_station_count(self):
+        """Give the number of stations."""
+        with self._lock:
+            return len(self._stations)
+
+    def give_stations_within(self, lat, lon, distance):
+        """Give the stations within distance (km) of lat/lon, nearest first."""
+        with self._lock:
+            found_stations = []
+            for cell in self._give_cells_around(lat, lon, distance):
+                for station_id in self._grid.get(cell, ()):
+                    station = self._stations[station_id]
+                    station_distance = give_distance_km(
+                        lat, lon, station["lat"], station["lon"]
+                    )
+                    if station_distance <= distance:
+                        found_stations.append((station_distance, station_id))
+            return [
+                self._stations[station_id] for _, station_id in sorted(found_stations)
+            ]
+
+    def give_nearest_station(self, lat, lon, max_distance=math.pi * EARTH_RADIUS_KM):
+        """Give the nearest station within max_distance (km), None if none."""
+        with self._lock:
+            if not self._stations:
+                return None
+            # rings of increasing distance : stop at the first one with a station
+            distance = self._cell_size * KM_PER_DEGREE
+            while True:
+                distance = min(distance, max_distance)
+                stations = self.give_stations_within(lat, lon, distance)
+                if stations or distance >= max_distance:
+                    return stations[0] if stations else None
+                distance *= 2
+
+    def give_stations_by_name(self, name):
+        """Give the stations of a name."""
+        with self._lock:
+            return [
+                self._stations[station_id] for station_id in self._names.get(name, ())
+            ]
+
+    def give_stations_response(self, lat, lon, distance):
+        """Give a ?stations like response from the catalog (no credit)."""
+        return {
+            "status": 200,
+            "callCount": 0,
+            "requestLat": lat,
+            "requestLon": lon,
+            "stations": self.give_stations_within(lat, lon, distance),
+        }
+
+    def save(self, path=None):
+        """Write the catalog (JSON, atomic)."""
+        path = path or self._path
+        with self._lock:
+            content = json.dumps(
+                {
+                    "version": CATALOG_VERSION,
+                    "stations": list(self._stations.values()),
+                    "coverage": self._coverage,
+                }
+            )
+        atomic_write(path, content.encode("utf-8"))
+
+    def load(self, path=None):
+        """Add the stations and coverage of a catalog file."""
+        path = path or self._path
+        with open(path, "rb") as catalog_file:
+            content = json.loads(catalog_file.read())
+        if content.get("version") != CATALOG_VERSION:
+            _LOGGER.warning("Station catalog %s version not supported", path)
+            return
+        with self._lock:
+            for station in content["stations"]:
+                self.add_station(station)
+            for area in content["coverage"]:
+                self._add_coverage(*area)
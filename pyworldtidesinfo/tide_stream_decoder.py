@@ -0,0 +1,348 @@
+"""Decode a tide response while it is received, straight into columns."""
+# Python library
+from array import array
+import codecs
+import json
+import logging
+import re
+
+from .tide_columns import Compact_Tide_Data, give_extreme_type_code
+
+_LOGGER = logging.getLogger(__name__)
+
+# Component library
+STREAM_CHUNK_SIZE = 65536
+_WHITESPACE = " \t\n\r"
+_ARRAY_SEPARATOR = re.compile(r"[ \t\n\r,]*")
+# tokens that change the nesting of an object/array value
+_CONTAINER_TOKEN = re.compile(r'["\[\]{}]')
+_STRING_TOKEN = re.compile(r'["\\]')
+
+_STATE_START = "start"
+_STATE_KEY = "key"
+_STATE_VALUE = "value"
+_STATE_ARRAY = "array"
+_STATE_RAW_STRING = "raw_string"
+_STATE_CONTAINER = "container"
+_STATE_END = "end"
+
+# key whose string value is kept raw (not decoded)
+_RAW_STRING_KEYS = ("plot",)
+
+
+class Tide_Stream_Decoder:
+    """Incremental decoder of a tide response (JSON object).
+
+    heights/extremes elements are decoded one by one into typed columns,
+    the plot is kept as raw (still JSON escaped) bytes and the other fields
+    are decoded as usual (objects/arrays such as stations once complete).
+    """
+
+    def __init__(self):
+        """Initialize the decoder."""
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json_decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._position = 0
+        self._state = _STATE_START
+        self._key = None
+        self._raw_pieces = []
+        # object/array value in progress : nesting depth, inside a string
+        self._depth = 0
+        self._in_string = False
+        self._fields = {}
+        self._raw_fields = {}
+        self._columns = {}
+
+    def feed(self, chunk):
+        """Decode a chunk of bytes of the body."""
+        if self._state == _STATE_END:
+            return
+        self._buffer = self._buffer[self._position :] + self._text_decoder.decode(chunk)
+        self._position = 0
+        while self._step():
+            pass
+
+    def close(self):
+        """Give the decoded data once the body is complete."""
+        self.feed(b"")
+        self._text_decoder.decode(b"", final=True)
+        if self._state != _STATE_END:
+            raise ValueError("incomplete tide response ({})".format(self._state))
+        return Compact_Tide_Data(
+            self._fields,
+            raw_fields=self._raw_fields,
+            **_give_sorted_columns(self._columns)
+        )
+
+    def _skip(self, characters):
+        """Skip characters, tell if something remains in the buffer."""
+        buffer = self._buffer
+        position = self._position
+        while position < len(buffer) and buffer[position] in characters:
+            position += 1
+        self._position = position
+        return position < len(buffer)
+
+    def _decode_value(self, need_terminator):
+        """Decode the JSON value at position (None, False if incomplete)."""
+        try:
+            value, end = self._json_decoder.raw_decode(self._buffer, self._position)
+        except ValueError:
+            return None, False
+        if need_terminator:
+            # a number may continue in the next chunk : wait for what follows
+            terminator = end
+            while terminator < len(self._buffer) and (
+                self._buffer[terminator] in _WHITESPACE
+            ):
+                terminator += 1
+            if terminator >= len(self._buffer) or (
+                self._buffer[terminator] not in ",}]"
+            ):
+                return None, False
+        self._position = end
+        return value, True
+
+    def _step(self):
+        """Decode one token, tell if progress has been made."""
+        if self._state == _STATE_START:
+            if not self._skip(_WHITESPACE):
+                return False
+            if self._buffer[self._position] != "{":
+                raise ValueError("tide response is not a JSON object")
+            self._position += 1
+            self._state = _STATE_KEY
+            return True
+
+        if self._state == _STATE_KEY:
+            if not self._skip(_WHITESPACE + ","):
+                return False
+            if self._buffer[self._position] == "}":
+                self._position += 1
+                self._state = _STATE_END
+                return False
+            key_position = self._position
+            key, complete = self._decode_value(need_terminator=False)
+            if not complete:
+                return False
+            if not self._skip(_WHITESPACE):
+                # wait for ":" without losing the key
+                self._position = key_position
+                return False
+            if self._buffer[self._position] != ":":
+                raise ValueError("tide response : ':' expected")
+            self._position += 1
+            self._key = key
+            self._state = _STATE_VALUE
+            return True
+
+        if self._state == _STATE_VALUE:
+            if not self._skip(_WHITESPACE):
+                return False
+            character = self._buffer[self._position]
+            if self._key in ("heights", "extremes") and character == "[":
+                self._position += 1
+                self._columns[self._key] = _give_empty_columns(self._key)
+                self._state = _STATE_ARRAY
+                return True
+            if self._key in _RAW_STRING_KEYS and character == '"':
+                self._position += 1
+                self._raw_pieces = []
+                self._state = _STATE_RAW_STRING
+                return True
+            if character in "[{":
+                # decoded once complete : no decode attempt per chunk
+                self._raw_pieces = []
+                self._depth = 0
+                self._in_string = False
+                self._state = _STATE_CONTAINER
+                return True
+            value, complete = self._decode_value(need_terminator=True)
+            if not complete:
+                return False
+            self._fields[self._key] = value
+            self._state = _STATE_KEY
+            return True
+
+        if self._state == _STATE_ARRAY:
+            return self._step_array()
+
+        if self._state == _STATE_RAW_STRING:
+            return self._step_raw_string()
+
+        if self._state == _STATE_CONTAINER:
+            return self._step_container()
+
+        return False
+
+    def _step_array(self):
+        """Decode the heights/extremes elements available in the buffer."""
+        buffer = self._buffer
+        position = _ARRAY_SEPARATOR.match(buffer, self._position).end()
+        array_end = buffer.find("]", position)
+        if array_end < 0:
+            array_end = len(buffer)
+        # elements are flat objects : decode all the complete ones at once
+        last_element_end = buffer.rfind("}", position, array_end)
+        if last_element_end >= 0:
+            try:
+                elements = json.loads(
+                    "[" + buffer[position : last_element_end + 1] + "]"
+                )
+            except ValueError:
+                elements = None
+            if elements is not None:
+                self._append_elements(elements)
+                position = _ARRAY_SEPARATOR.match(buffer, last_element_end + 1).end()
+            else:
+                position = self._step_array_elements(position)
+
+        self._position = position
+        if position < len(buffer) and buffer[position] == "]":
+            self._position = position + 1
+            self._state = _STATE_KEY
+            return True
+        return False
+
+    def _step_array_elements(self, position):
+        """Decode the elements one by one, give the position reached."""
+        buffer = self._buffer
+        while position < len(buffer) and buffer[position] != "]":
+            try:
+                element, position = self._json_decoder.raw_decode(buffer, position)
+            except ValueError:
+                # element continues in the next chunk
+                break
+            self._append_elements([element])
+            position = _ARRAY_SEPARATOR.match(buffer, position).end()
+        return position
+
+    def _append_elements(self, elements):
+        """Append heights/extremes elements to the columns."""
+        columns = self._columns[self._key]
+        try:
+            epochs = array("q", [element["dt"] for element in elements])
+            heights = array("d", [element["height"] for element in elements])
+            if "type" in columns:
+                types = [
+                    give_extreme_type_code(element.get("type")) for element in elements
+                ]
+        except (KeyError, TypeError, AttributeError, OverflowError) as err:
+            raise ValueError(
+                "tide response : invalid {} element ({!r})".format(self._key, err)
+            ) from err
+        columns["epoch"].extend(epochs)
+        columns["height"].extend(heights)
+        if "type" in columns:
+            columns["type"].extend(types)
+
+    def _step_raw_string(self):
+        """Copy the raw string up to its closing quote."""
+        buffer = self._buffer
+        start = self._position
+        position = start
+        while True:
+            position = buffer.find('"', position)
+            if position < 0:
+                # keep the trailing backslashes : they may escape a next quote
+                end = len(buffer)
+                while end > start and buffer[end - 1] == "\\":
+                    end -= 1
+                self._raw_pieces.append(buffer[start:end])
+                self._position = end
+                return False
+            # count the escaping backslashes before the quote
+            backslash = position
+            while backslash > start and buffer[backslash - 1] == "\\":
+                backslash -= 1
+            if (position - backslash) % 2 == 0:
+                break
+            position += 1
+        self._raw_pieces.append(buffer[start:position])
+        self._raw_fields[self._key] = "".join(self._raw_pieces).encode("utf-8")
+        self._raw_pieces = []
+        self._position = position + 1
+        self._state = _STATE_KEY
+        return True
+
+    def _step_container(self):
+        """Copy an object/array value up to its end, then decode it."""
+        buffer = self._buffer
+        position = self._position
+        complete = False
+        while not complete:
+            if self._in_string:
+                match = _STRING_TOKEN.search(buffer, position)
+                if match is None:
+                    position = len(buffer)
+                    break
+                if match.group() == "\\":
+                    if match.end() >= len(buffer):
+                        # the escaped character is in the next chunk
+                        position = match.start()
+                        break
+                    position = match.end() + 1
+                    continue
+                self._in_string = False
+                position = match.end()
+                continue
+            match = _CONTAINER_TOKEN.search(buffer, position)
+            if match is None:
+                position = len(buffer)
+                break
+            position = match.end()
+            token = match.group()
+            if token == '"':
+                self._in_string = True
+            elif token in "[{":
+                self._depth += 1
+            else:
+                self._depth -= 1
+                complete = self._depth == 0
+        self._raw_pieces.append(buffer[self._position : position])
+        self._position = position
+        if not complete:
+            return False
+        self._fields[self._key] = json.loads("".join(self._raw_pieces))
+        self._raw_pieces = []
+        self._state = _STATE_KEY
+        return True
+
+
+def _give_empty_columns(section):
+    """Give the empty columns of a section."""
+    if section == "heights":
+        return {"epoch": array("q"), "height": array("d")}
+    return {"epoch": array("q"), "height": array("d"), "type": array("b")}
+
+
+def _give_sorted_columns(columns):
+    """Give the Compact_Tide_Data columns, sorted by epoch if needed."""
+    compact_columns = {}
+    for section, prefix in (("heights", "heights"), ("extremes", "extremes")):
+        if section not in columns:
+            continue
+        section_columns = columns[section]
+        epochs = section_columns["epoch"]
+        if any(epochs[index - 1] > epochs[index] for index in range(1, len(epochs))):
+            order = sorted(range(len(epochs)), key=epochs.__getitem__)
+            for name, column in section_columns.items():
+                section_columns[name] = array(
+                    column.typecode, [column[i] for i in order]
+                )
+        compact_columns[prefix + "_epoch"] = section_columns["epoch"]
+        if section == "heights":
+            compact_columns["heights_value"] = section_columns["height"]
+        else:
+            compact_columns["extremes_height"] = section_columns["height"]
+            compact_columns["extremes_type"] = section_columns["type"]
+    return compact_columns
+
+
+def decode_tide_stream(chunks):
+    """Decode an iterable of byte chunks into Compact_Tide_Data."""
+    decoder = Tide_Stream_Decoder()
+    for chunk in chunks:
+        decoder.feed(chunk)
+    return decoder.close()
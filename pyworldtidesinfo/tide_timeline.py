@@ -0,0 +1,179 @@
+"""Compiled tide timeline : sorted epoch columns queried by binary search."""
+# Python library
+from bisect import bisect_left, bisect_right
+import logging
+import math
+
+from .tide_columns import (
+    Compact_Tide_Data,
+    Epoch_Date_Column,
+    give_extreme_type_name,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _sorted_by_epoch(entries):
+    """Give the entries sorted by epoch (no copy if already sorted)."""
+    for index in range(1, len(entries)):
+        if entries[index - 1]["dt"] > entries[index]["dt"]:
+            return sorted(entries, key=lambda entry: entry["dt"])
+    return entries
+
+
+def _frame_range(epochs, epoch_frame_min, epoch_frame_max):
+    """Give the index range of epochs strictly within frame_min/frame_max."""
+    first_index = bisect_right(epochs, epoch_frame_min)
+    last_index = max(first_index, bisect_left(epochs, epoch_frame_max))
+    return range(first_index, last_index)
+
+
+class Tide_Timeline:
+    """Store heights/extremes as sorted columns built once per response."""
+
+    def __init__(self, data):
+        """Compile the timeline from the raw data."""
+        if isinstance(data, Compact_Tide_Data):
+            self._set_compact_columns(data)
+            return
+
+        extremes = []
+        heights = []
+        if data is not None:
+            extremes = _sorted_by_epoch(data.get("extremes") or [])
+            heights = _sorted_by_epoch(data.get("heights") or [])
+
+        self.extremes_epoch = [extreme["dt"] for extreme in extremes]
+        self.extremes_height = [extreme.get("height") for extreme in extremes]
+        self.extremes_type = [extreme.get("type") for extreme in extremes]
+        self.extremes_date = [extreme.get("date") for extreme in extremes]
+
+        self.heights_epoch = [height["dt"] for height in heights]
+        self.heights_value = [height.get("height") for height in heights]
+        self.heights_date = [height.get("date") for height in heights]
+
+    def _set_compact_columns(self, data):
+        """Use the columns of compact data without copy."""
+        if data.has_extremes():
+            self.extremes_epoch = data.extremes_epoch
+            self.extremes_height = data.extremes_height
+            self.extremes_type = [
+                give_extreme_type_name(tide_type) for tide_type in data.extremes_type
+            ]
+        else:
+            self.extremes_epoch = []
+            self.extremes_height = []
+            self.extremes_type = []
+        self.extremes_date = Epoch_Date_Column(self.extremes_epoch)
+
+        if data.has_heights():
+            self.heights_epoch = data.heights_epoch
+            self.heights_value = data.heights_value
+        else:
+            self.heights_epoch = []
+            self.heights_value = []
+        self.heights_date = Epoch_Date_Column(self.heights_epoch)
+
+    def extremes_count(self):
+        """Give the number of extremes."""
+        return len(self.extremes_epoch)
+
+    def heights_count(self):
+        """Give the number of heights."""
+        return len(self.heights_epoch)
+
+    def next_extreme_index(self, current_time):
+        """Give index of first extreme not before current time."""
+        return bisect_left(self.extremes_epoch, current_time)
+
+    def previous_extreme_index(self, current_time):
+        """Give index of last extreme before current time (0 if none)."""
+        index = bisect_left(self.extremes_epoch, current_time)
+        if index > 0:
+            return index - 1
+        return 0
+
+    def next_extreme_interval(self, current_time):
+        """Give (low, high) : next extreme index same for low < time <= high."""
+        index = bisect_left(self.extremes_epoch, current_time)
+        low = self.extremes_epoch[index - 1] if index > 0 else -math.inf
+        if index < len(self.extremes_epoch):
+            high = self.extremes_epoch[index]
+        else:
+            high = math.inf
+        return low, high
+
+    def current_height_index(self, current_time):
+        """Give index of last height before current time (0 if none)."""
+        index = bisect_left(self.heights_epoch, current_time)
+        if index > 0:
+            return index - 1
+        return 0
+
+    def extremes_within_time_frame(self, epoch_frame_min, epoch_frame_max):
+        """Give the range of extremes strictly within frame_min/frame_max."""
+        return _frame_range(self.extremes_epoch, epoch_frame_min, epoch_frame_max)
+
+    def heights_within_time_frame(self, epoch_frame_min, epoch_frame_max):
+        """Give the range of heights strictly within frame_min/frame_max."""
+        return _frame_range(self.heights_epoch, epoch_frame_min, epoch_frame_max)
+
+
+def _merge_entries(entries, previous_entries, retention_epoch):
+    """Merge entries by epoch, entries win over previous ones in their range.
+
+    The previous entries within [first, last] epoch of entries are dropped :
+    a newer prediction may place the same tide at another epoch.
+    """
+    merged = {}
+    if entries:
+        first_epoch = min(entry["dt"] for entry in entries)
+        last_epoch = max(entry["dt"] for entry in entries)
+    for entry in previous_entries or []:
+        if not entries or not first_epoch <= entry["dt"] <= last_epoch:
+            merged[entry["dt"]] = entry
+    for entry in entries or []:
+        merged[entry["dt"]] = entry
+    return [
+        merged[epoch]
+        for epoch in sorted(merged)
+        if retention_epoch is None or epoch >= retention_epoch
+    ]
+
+
+def give_data_horizon(data):
+    """Give the last epoch covered by the data (None if no heights/extremes)."""
+    if data is None:
+        return None
+    if isinstance(data, Compact_Tide_Data):
+        # sorted columns : last epoch, no list of dict built
+        for epochs in (data.heights_epoch, data.extremes_epoch):
+            if epochs:
+                return epochs[-1]
+        return None
+    for section in ("heights", "extremes"):
+        entries = data.get(section)
+        if entries:
+            return max(entry["dt"] for entry in entries)
+    return None
+
+
+def merge_tide_raw_data(data, previous_data, retention_epoch=None):
+    """Give one raw data made of data and previous data (data wins).
+
+    heights/extremes of previous data are kept outside the epoch range of
+    data only, the ones before retention_epoch are dropped ; other fields
+    are taken from data first.
+    """
+    if previous_data is None:
+        previous_data = {}
+    if data is None:
+        data = {}
+    merged = dict(previous_data)
+    merged.update(data)
+    for section in ("heights", "extremes"):
+        if section in data or section in previous_data:
+            merged[section] = _merge_entries(
+                data.get(section), previous_data.get(section), retention_epoch
+            )
+    return merged
@@ -0,0 +1,308 @@
+"""Asyncio client of the Word Tides Info server (requires aiohttp)."""
+# Python library
+import asyncio
+import contextvars
+import json
+import logging
+import time
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - optional dependency
+    aiohttp = None
+
+from .worldtidesinfo_server import (
+    DEFAULT_TIDE_SECTIONS,
+    TIDE_RETENTION_DURATION,
+    SERVER_CONNECT_TIMEOUT,
+    SERVER_POOL_SIZE,
+    SERVER_READ_TIMEOUT,
+    SERVER_URL,
+    TIDE_STEP,
+    Fetch_Result,
+    WorldTidesInfo_server,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Component library
+# number of requests in flight for the fan-out helpers
+SERVER_MAX_CONCURRENCY = 10
+# session shared by the servers of a fan-out without an injected one
+_fan_out_session = contextvars.ContextVar("fan_out_session", default=None)
+
+
+def create_async_session(pool_size=SERVER_POOL_SIZE):
+    """Create an aiohttp session with a connection pool (call it in a loop)."""
+    if aiohttp is None:
+        raise ImportError(
+            "aiohttp is required for the async client: pip install pyworldtidesinfo[async]"
+        )
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=pool_size),
+        headers={"Accept-Encoding": "gzip, deflate"},
+    )
+
+
+class AsyncWorldTidesInfo_server(WorldTidesInfo_server):
+    """Class to manage the Word Tide Info server with asyncio."""
+
+    def __init__(
+        self,
+        key,
+        lat,
+        lon,
+        vertical_ref,
+        tide_station_distance,
+        tide_prediction_duration,
+        plot_color,
+        plot_background,
+        unit_curve_picture,
+        session=None,
+        connect_timeout=SERVER_CONNECT_TIMEOUT,
+        read_timeout=SERVER_READ_TIMEOUT,
+        server_url=SERVER_URL,
+        cache=None,
+        tide_sections=DEFAULT_TIDE_SECTIONS,
+        tide_step=TIDE_STEP,
+        instrumentation=None,
+        single_flight=None,
+        station_catalog=None,
+    ):
+        """Initialize the parameters."""
+        if aiohttp is None:
+            raise ImportError(
+                "aiohttp is required for the async client: pip install pyworldtidesinfo[async]"
+            )
+        super().__init__(
+            key,
+            lat,
+            lon,
+            vertical_ref,
+            tide_station_distance,
+            tide_prediction_duration,
+            plot_color,
+            plot_background,
+            unit_curve_picture,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            cache=cache,
+            tide_sections=tide_sections,
+            tide_step=tide_step,
+            server_url=server_url,
+            instrumentation=instrumentation,
+            single_flight=single_flight,
+            station_catalog=station_catalog,
+        )
+        # aiohttp session : injected (to be shared), the one of a fan-out or
+        # one per request
+        self._session = session
+        self._async_incremental_lock = None
+
+    def give_session(self):
+        """Give the aiohttp session used (None : one per request)."""
+        return self._session
+
+    def _give_transport(self):
+        """Refuse the blocking transport : the requests are awaited here."""
+        raise TypeError(
+            "AsyncWorldTidesInfo_server requests are coroutines : await them"
+        )
+
+    async def _async_request_json(self, resource):
+        """Request resource and give data, error and timing."""
+        session = self._session or _fan_out_session.get()
+        own_session = session is None
+        if own_session:
+            session = create_async_session()
+        timeout = aiohttp.ClientTimeout(
+            sock_connect=self._timeout[0], sock_read=self._timeout[1]
+        )
+        start_time = time.perf_counter()
+        timing = None
+        try:
+            async with session.get(resource, timeout=timeout) as data_get:
+                header_time = time.perf_counter() - start_time
+                body = await data_get.read()
+                total_time = time.perf_counter() - start_time
+                timing = {
+                    "new_connection": None,
+                    "header_time": header_time,
+                    "transfer_time": total_time - header_time,
+                    "total_time": total_time,
+                    "payload_size": len(body),
+                }
+                if data_get.status == 200:
+                    data = json.loads(body)
+                    error_value = None
+                else:
+                    error_value = data_get.status
+                    data = None
+
+        except (ValueError, aiohttp.ClientError, asyncio.TimeoutError) as err:
+            error_value = err.args
+            data = None
+        finally:
+            if own_session:
+                await session.close()
+
+        return data, error_value, timing
+
+    async def _async_shared_request_json(self, flight_key, resource):
+        """Request resource once for the identical requests in flight.
+
+        The single flight is an Async_Single_Flight here.
+        """
+        if self._single_flight is None:
+            return await self._async_request_json(resource) + (False,)
+        result, shared = await self._single_flight.do(
+            flight_key, lambda: self._async_request_json(resource)
+        )
+        return result + (shared,)
+
+    async def retrieve_tide_station(self):
+        """Retrieve information related tide station only."""
+        return (await self.fetch_tide_station()).is_success()
+
+    async def fetch_tide_station(self):
+        """Retrieve information related tide station, give its Fetch_Result."""
+        # one parameter for the whole request : change_ref_point may replace it
+        parameter = self._Server_Parameter
+        current_time = time.time()
+        request_key = parameter.give_cache_key("stations")
+        data = self._give_catalog_stations(parameter)
+        if data is not None:
+            return self._set_tide_station_result(
+                current_time, data, None, None, True, request_key
+            )
+        cache_key = self._give_cache_key(parameter, "stations")
+        data = self._give_cached_data(cache_key, "stations")
+        if data is not None:
+            self._store_catalog_stations(parameter, data)
+            return self._set_tide_station_result(
+                current_time, data, None, None, True, request_key
+            )
+
+        resource = self._tide_station_resource(parameter)
+        data, error_value, timing, shared = await self._async_shared_request_json(
+            cache_key, resource
+        )
+        if not shared:
+            self._report_request("stations", data, error_value, timing)
+            self._store_cached_data(cache_key, data)
+        self._store_catalog_stations(parameter, data)
+        return self._set_tide_station_result(
+            current_time, data, error_value, timing, shared, request_key
+        )
+
+    async def retrieve_tide_height_over_one_day(self, datum_flag):
+        """Retrieve information related to tide."""
+        return (await self.fetch_tide_height_over_one_day(datum_flag)).is_success()
+
+    async def fetch_tide_height_over_one_day(self, datum_flag):
+        """Retrieve information related to tide, give its Fetch_Result."""
+        return await self._async_fetch_tide_height(self._Server_Parameter, datum_flag)
+
+    async def _async_fetch_tide_height(self, parameter, datum_flag):
+        """Retrieve information related to tide with parameter."""
+        current_time = time.time()
+        request_key = parameter.give_cache_key("tide", datum_flag)
+        cache_key = self._give_cache_key(parameter, "tide", datum_flag)
+        data = self._give_cached_data(cache_key, "tide")
+        if data is not None:
+            return self._set_tide_result(
+                current_time, data, None, None, True, request_key
+            )
+
+        resource = self._tide_height_resource(parameter, datum_flag)
+        data, error_value, timing, shared = await self._async_shared_request_json(
+            cache_key, resource
+        )
+        if not shared:
+            self._report_request("tide", data, error_value, timing)
+            self._store_cached_data(cache_key, data)
+        return self._set_tide_result(
+            current_time, data, error_value, timing, shared, request_key
+        )
+
+    async def retrieve_tide_height_incremental(
+        self, datum_flag, retention_duration=TIDE_RETENTION_DURATION
+    ):
+        """Retrieve only the tide information not already held."""
+        return (
+            await self.fetch_tide_height_incremental(datum_flag, retention_duration)
+        ).is_success()
+
+    async def fetch_tide_height_incremental(
+        self, datum_flag, retention_duration=TIDE_RETENTION_DURATION
+    ):
+        """Retrieve only the tide information not already held, give its result."""
+        if self._async_incremental_lock is None:
+            self._async_incremental_lock = asyncio.Lock()
+        async with self._async_incremental_lock:
+            parameter = self._Server_Parameter
+            current_time = time.time()
+            request = self._give_incremental_request(
+                parameter, datum_flag, current_time
+            )
+            if request is None:
+                return await self._async_fetch_tide_height(parameter, datum_flag)
+            if isinstance(request, Fetch_Result):
+                return request
+            resource, flight_key, request_key, previous_data = request
+            data, error_value, timing, shared = await self._async_shared_request_json(
+                flight_key, resource
+            )
+            return self._set_incremental_result(
+                current_time,
+                data,
+                error_value,
+                timing,
+                shared,
+                request_key,
+                previous_data,
+                retention_duration,
+            )
+
+
+async def _bounded_gather(coroutine_function, servers, max_concurrency):
+    """Run coroutine_function on each server with at most N in flight.
+
+    The servers without an injected session share one for the fan-out.
+    """
+    servers = list(servers)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_one(server):
+        async with semaphore:
+            return await coroutine_function(server)
+
+    if all(server.give_session() is not None for server in servers):
+        return await asyncio.gather(*[run_one(server) for server in servers])
+    async with create_async_session(max_concurrency) as session:
+        # the tasks created by gather copy the context : they see the session
+        token = _fan_out_session.set(session)
+        try:
+            return await asyncio.gather(*[run_one(server) for server in servers])
+        finally:
+            _fan_out_session.reset(token)
+
+
+async def async_retrieve_tide_station(servers, max_concurrency=SERVER_MAX_CONCURRENCY):
+    """Refresh tide station of servers and give their raw data (None if error)."""
+
+    async def refresh(server):
+        return (await server.fetch_tide_station()).data
+
+    return await _bounded_gather(refresh, servers, max_concurrency)
+
+
+async def async_retrieve_tide_height_over_one_day(
+    servers, datum_flag, max_concurrency=SERVER_MAX_CONCURRENCY
+):
+    """Refresh tide of servers and give their raw data (None if error)."""
+
+    async def refresh(server):
+        return (await server.fetch_tide_height_over_one_day(datum_flag)).data
+
+    return await _bounded_gather(refresh, servers, max_concurrency)
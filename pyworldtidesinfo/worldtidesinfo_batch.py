@@ -0,0 +1,214 @@
+"""Fetch many locations with bounded concurrency, one NDJSON line each."""
+# Python library
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import csv
+import json
+import logging
+import math
+import time
+
+from .worldtidesinfo_server import (
+    PLOT_CURVE_UNIT_FT,
+    SERVER_POOL_SIZE,
+    SERVER_URL,
+    TIDE_SECTION_EXTREMES,
+    TIDE_SECTION_HEIGHTS,
+    WorldTidesInfo_server,
+    create_session,
+    give_info_from_raw_data,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Component library
+BATCH_FORMAT_CSV = "csv"
+BATCH_FORMAT_NDJSON = "ndjson"
+BATCH_FORMAT_AUTO = "auto"
+BATCH_FORMAT_LIST = [BATCH_FORMAT_AUTO, BATCH_FORMAT_CSV, BATCH_FORMAT_NDJSON]
+BATCH_WORKERS = 8
+# same request parameters as the single location mode
+BATCH_VERTICAL_REF = "LAT"
+BATCH_TIDE_STATION_DISTANCE = 20
+BATCH_TIDE_PREDICTION_DURATION = 1
+# the plot is not part of the results : not requested
+BATCH_TIDE_SECTIONS = (TIDE_SECTION_EXTREMES, TIDE_SECTION_HEIGHTS)
+
+
+def _give_location(fields, line_number):
+    """Give the location of a CSV/NDJSON record."""
+    lon = fields.get("lon", fields.get("long"))
+    try:
+        location = {"lat": float(fields["lat"]), "lon": float(lon)}
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("line {} : lat/lon expected".format(line_number)) from None
+    location["id"] = fields.get("id", fields.get("name", line_number))
+    return location
+
+
+def read_locations(lines, input_format=BATCH_FORMAT_AUTO):
+    """Give the locations of CSV (lat,lon[,id] or header) or NDJSON lines.
+
+    An invalid line gives {"id": line number, "error": ...} : the next
+    lines are still read.
+    """
+    lines = iter(lines)
+    csv_header = None
+    # the header can only be the first line that is not blank/comment
+    first_record = True
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        header_allowed = first_record
+        first_record = False
+        line_format = input_format
+        if line_format == BATCH_FORMAT_AUTO:
+            line_format = BATCH_FORMAT_NDJSON if line[0] == "{" else BATCH_FORMAT_CSV
+        try:
+            if line_format == BATCH_FORMAT_NDJSON:
+                fields = json.loads(line)
+                if not isinstance(fields, dict):
+                    raise ValueError("line {} : object expected".format(line_number))
+            else:
+                row = next(csv.reader([line]))
+                if header_allowed and "lat" in row:
+                    csv_header = [name.strip() for name in row]
+                    continue
+                if csv_header is not None:
+                    fields = dict(zip(csv_header, row))
+                else:
+                    fields = dict(zip(("lat", "lon", "id"), row))
+            location = _give_location(fields, line_number)
+        except (ValueError, csv.Error) as err:
+            _LOGGER.warning("Batch input skipped : %s", err)
+            yield {"id": line_number, "error": str(err)}
+            continue
+        yield location
+
+
+def process_location(location, key, session, server_url=SERVER_URL):
+    """Give the result of one location (station, current height, next tide)."""
+    start_time = time.perf_counter()
+    server = WorldTidesInfo_server(
+        key,
+        location["lat"],
+        location["lon"],
+        BATCH_VERTICAL_REF,
+        BATCH_TIDE_STATION_DISTANCE,
+        BATCH_TIDE_PREDICTION_DURATION,
+        "2,102,255",
+        "255,255,255",
+        PLOT_CURVE_UNIT_FT,
+        session=session,
+        tide_sections=BATCH_TIDE_SECTIONS,
+        server_url=server_url,
+    )
+    result = {"id": location["id"], "lat": location["lat"], "lon": location["lon"]}
+    station_result = server.fetch_tide_station()
+    if station_result.is_success():
+        station_info = give_info_from_raw_data(
+            station_result.data
+        ).give_used_station_info()
+        result["station"] = station_info.get("tide_station_used_name")
+    else:
+        result["error"] = str(station_result.error_value)
+    tide_result = server.fetch_tide_height_over_one_day(True)
+    if tide_result.is_success():
+        tide_info = give_info_from_raw_data(tide_result.data)
+        current_time = time.time()
+        result["current_height"] = tide_info.give_current_height_in_UTC(
+            current_time
+        ).get("current_height")
+        result["next_tide"] = tide_info.give_next_tide_in_epoch(current_time)
+    else:
+        # the tide error is reported first
+        result["error"] = str(tide_result.error_value)
+    result["credit"] = station_result.credit + tide_result.credit
+    result["duration"] = time.perf_counter() - start_time
+    return result
+
+
+def _process_location_safely(location, key, session, server_url):
+    """Give the result of one location, an error result if it raised."""
+    start_time = time.perf_counter()
+    try:
+        return process_location(location, key, session, server_url)
+    except Exception as err:
+        # one location must not stop the batch
+        _LOGGER.exception("Batch location %s failed", location["id"])
+        return {
+            "id": location["id"],
+            "lat": location["lat"],
+            "lon": location["lon"],
+            "error": repr(err),
+            "credit": 0,
+            "duration": time.perf_counter() - start_time,
+        }
+
+
+def _give_percentile(sorted_values, ratio):
+    """Give a percentile of sorted values (None if empty)."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, math.ceil(ratio * len(sorted_values)) - 1)
+    return sorted_values[max(index, 0)]
+
+
+def give_summary(results, duration):
+    """Give the throughput/latency summary of the results."""
+    latencies = sorted(result["duration"] for result in results)
+    failed = sum(1 for result in results if "error" in result)
+    return {
+        "locations": len(results),
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "credit": sum(result["credit"] for result in results),
+        "duration": duration,
+        "throughput": len(results) / duration if duration > 0 else None,
+        "latency_p50": _give_percentile(latencies, 0.5),
+        "latency_p95": _give_percentile(latencies, 0.95),
+        "latency_max": latencies[-1] if latencies else None,
+    }
+
+
+def run_batch(
+    locations, key, output, workers=BATCH_WORKERS, server_url=SERVER_URL, session=None
+):
+    """Fetch the locations, write each result as soon as done, give a summary.
+
+    At most 2 x workers locations are read ahead : the input can be a stream.
+    Invalid input lines and failed locations give a line with "error".
+    """
+    if session is None:
+        session = create_session(max(workers, SERVER_POOL_SIZE))
+    start_time = time.perf_counter()
+    results = []
+    in_flight = set()
+
+    def write_result(result):
+        results.append(result)
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+
+    def write_done(done_futures):
+        for future in done_futures:
+            write_result(future.result())
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for location in locations:
+            if "error" in location:
+                # invalid input line : nothing to fetch
+                write_result(dict(location, credit=0, duration=0.0))
+                continue
+            if len(in_flight) >= 2 * workers:
+                done_futures, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                write_done(done_futures)
+            in_flight.add(
+                executor.submit(
+                    _process_location_safely, location, key, session, server_url
+                )
+            )
+        while in_flight:
+            done_futures, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            write_done(done_futures)
+    return give_summary(results, time.perf_counter() - start_time)
@@ -0,0 +1,129 @@
+"""Persistent on-disk cache of server responses (TTL + LRU eviction)."""
+# Python library
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+# Component library
+# tide predictions of the requested days do not change : keep them 6 hours
+CACHE_TTL = 6 * 3600
+CACHE_MAX_ENTRIES = 256
+CACHE_FILE_EXTENSION = ".json"
+
+
+def atomic_write(path, content):
+    """Write bytes content to path atomically (temporary file + rename)."""
+    directory = os.path.dirname(os.path.abspath(path))
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, "wb") as temporary_file:
+            temporary_file.write(content)
+        os.replace(temporary_path, path)
+    except OSError:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+
+class Response_Cache:
+    """Store raw data in one JSON file per key."""
+
+    def __init__(self, directory, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        """Initialize the cache directory."""
+        self._directory = directory
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _give_path(self, key):
+        """Give the file of key."""
+        return os.path.join(self._directory, key + CACHE_FILE_EXTENSION)
+
+    def get(self, key):
+        """Give the raw data stored for key (None if missing or expired)."""
+        path = self._give_path(key)
+        try:
+            with open(path, "rb") as cache_file:
+                file_id = os.fstat(cache_file.fileno()).st_ino
+                entry = json.loads(cache_file.read())
+            stored_time = float(entry.get("stored_time", 0))
+        except (OSError, ValueError, TypeError, AttributeError):
+            # unreadable or not an entry : a miss
+            return None
+
+        if time.time() - stored_time > self._ttl:
+            _LOGGER.debug("Cache entry %s expired", key)
+            with self._lock:
+                # a set since the read replaced the file (new inode) : keep it
+                try:
+                    expired = os.stat(path).st_ino == file_id
+                except OSError:
+                    expired = False
+                if expired:
+                    self._remove(path)
+            return None
+
+        # mark as recently used for the LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry.get("data")
+
+    def set(self, key, data):
+        """Store the raw data for key."""
+        content = json.dumps({"stored_time": time.time(), "data": data})
+        with self._lock:
+            try:
+                atomic_write(self._give_path(key), content.encode())
+            except OSError as err:
+                _LOGGER.warning("Cache entry %s not written : %s", key, err)
+                return
+            self._evict()
+
+    def clear(self):
+        """Remove all the entries."""
+        with self._lock:
+            for path in self._give_entries():
+                self._remove(path)
+
+    def _give_entries(self):
+        """Give the files of the entries."""
+        try:
+            names = os.listdir(self._directory)
+        except OSError:
+            return []
+        return [
+            os.path.join(self._directory, name)
+            for name in names
+            if name.endswith(CACHE_FILE_EXTENSION)
+        ]
+
+    def _evict(self):
+        """Remove the least recently used entries above max entries."""
+        entries = self._give_entries()
+        if len(entries) <= self._max_entries:
+            return
+        access_time = {}
+        for path in entries:
+            try:
+                access_time[path] = os.stat(path).st_mtime
+            except OSError:
+                access_time[path] = 0
+        entries.sort(key=lambda path: access_time[path])
+        for path in entries[: len(entries) - self._max_entries]:
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        """Remove an entry file."""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,422 @@
+"""Local daemon answering the tide queries of many consumers from memory.
+
+Run : python -m pyworldtidesinfo.worldtidesinfo_daemon -k KEY --port 8765
+Query : GET /next_tide?lat=48.4&lon=-4.5 (time=epoch, start/end for frames)
+"""
+# Python library
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+import math
+import os
+import socketserver
+import sys
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from .tide_timeline import give_data_horizon
+from .worldtidesinfo_scheduler import SCHEDULER_REFRESH_MARGIN
+from .worldtidesinfo_server import (
+    PLOT_CURVE_UNIT_M,
+    SERVER_URL,
+    TIDE_SECTION_EXTREMES,
+    TIDE_SECTION_HEIGHTS,
+    WorldTidesInfo_server,
+    give_info_from_raw_data,
+    give_shared_session,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Component library
+DAEMON_PORT = 8765
+DAEMON_VERTICAL_REF = "LAT"
+DAEMON_TIDE_STATION_DISTANCE = 20
+DAEMON_TIDE_PREDICTION_DURATION = 2
+# locations closer than this rounding (decimal degrees) share their data
+DAEMON_LOCATION_PRECISION = 3
+# the plot is not served : not requested
+DAEMON_TIDE_SECTIONS = (TIDE_SECTION_EXTREMES, TIDE_SECTION_HEIGHTS)
+# delay before a new request for a location whose last request failed
+DAEMON_RETRY_DELAY = 60
+# each location held uses credits : bounded
+DAEMON_MAX_LOCATIONS = 1000
+
+
+def _give_tide_answer(method_name, *argument_names):
+    """Give a query calling a method of the tide decoder."""
+
+    def query(daemon, location, parameters):
+        arguments = [parameters[name] for name in argument_names]
+        return getattr(location.give_tide_info(daemon), method_name)(*arguments)
+
+    return query
+
+
+def _give_station_answer(method_name):
+    """Give a query calling a method of the station decoder."""
+
+    def query(daemon, location, parameters):
+        return getattr(location.give_station_info(daemon), method_name)()
+
+    return query
+
+
+DAEMON_QUERIES = {
+    "current_height": _give_tide_answer("give_current_height_in_UTC", "time"),
+    "next_tide": _give_tide_answer("give_next_tide_in_epoch", "time"),
+    "previous_tide": _give_tide_answer("give_previous_tide_in_epoch", "time"),
+    "next_high_low": _give_tide_answer("give_next_high_low_tide_in_UTC", "time"),
+    "current_high_low": _give_tide_answer("give_current_high_low_tide_in_UTC", "time"),
+    "extremes": _give_tide_answer(
+        "give_tide_extrema_within_time_frame", "start", "end"
+    ),
+    "heights": _give_tide_answer(
+        "give_tide_prediction_within_time_frame", "start", "end"
+    ),
+    "datum": _give_tide_answer("give_datum"),
+    "station": _give_station_answer("give_used_station_info"),
+    "stations_around": _give_station_answer("give_station_around_info"),
+    "time_zone": _give_station_answer("give_nearest_station_time_zone"),
+}
+
+
+class Daemon_Error(Exception):
+    """Query that cannot be answered (HTTP status and message)."""
+
+    def __init__(self, status, message):
+        """Initialize the status and message."""
+        super().__init__(message)
+        self.status = status
+
+
+class _Daemon_Location:
+    """Server and compiled decoders of one location."""
+
+    def __init__(self, server):
+        """Initialize the location."""
+        self.server = server
+        self.lock = threading.Lock()
+        self.tide_info = None
+        self.tide_valid_until = 0
+        self.station_info = None
+        self.retry_time = 0
+
+    def give_tide_info(self, daemon):
+        """Give the tide decoder, refreshed once its data run out."""
+        current_time = time.time()
+        if self.tide_info is not None and current_time < self.tide_valid_until:
+            return self.tide_info
+        with self.lock:
+            # another thread may have refreshed while waiting
+            if self.tide_info is None or time.time() >= self.tide_valid_until:
+                self._refresh_tide(daemon)
+        return self.tide_info
+
+    def _refresh_tide(self, daemon):
+        """Request the tide data and compile them."""
+        current_time = time.time()
+        if current_time >= self.retry_time:
+            daemon.count_upstream_request()
+            result = self.server.fetch_tide_height_over_one_day(True)
+            if result.is_success():
+                data = result.data
+                horizon = give_data_horizon(data)
+                if horizon is None:
+                    horizon = current_time
+                # new decoder : the queries in progress keep the old one
+                self.tide_info = give_info_from_raw_data(data)
+                # short data : no request loop
+                self.tide_valid_until = max(
+                    horizon - daemon.refresh_margin, current_time + DAEMON_RETRY_DELAY
+                )
+                return
+            self.retry_time = current_time + DAEMON_RETRY_DELAY
+            _LOGGER.warning("Tide request failed : %s", result.error_value)
+        if self.tide_info is None:
+            raise Daemon_Error(502, "tide request failed")
+        # keep answering from the old data until a request succeeds
+
+    def give_station_info(self, daemon):
+        """Give the station decoder (requested once)."""
+        if self.station_info is not None:
+            return self.station_info
+        with self.lock:
+            if self.station_info is None:
+                daemon.count_upstream_request()
+                result = self.server.fetch_tide_station()
+                if not result.is_success():
+                    raise Daemon_Error(502, "station request failed")
+                self.station_info = give_info_from_raw_data(result.data)
+        return self.station_info
+
+
+class Tide_Daemon:
+    """Fetch the tide of the locations queried, answer from compiled data.
+
+    One server per location (rounded to location_precision) : the upstream
+    server is requested once per location and again when the data held end
+    within refresh_margin. At most max_locations are held, queries of
+    other locations are refused. Serves HTTP on host/port, or on unix_socket.
+    """
+
+    def __init__(
+        self,
+        key,
+        vertical_ref=DAEMON_VERTICAL_REF,
+        tide_station_distance=DAEMON_TIDE_STATION_DISTANCE,
+        tide_prediction_duration=DAEMON_TIDE_PREDICTION_DURATION,
+        host="127.0.0.1",
+        port=DAEMON_PORT,
+        unix_socket=None,
+        refresh_margin=SCHEDULER_REFRESH_MARGIN,
+        location_precision=DAEMON_LOCATION_PRECISION,
+        max_locations=DAEMON_MAX_LOCATIONS,
+        session=None,
+        server_url=SERVER_URL,
+        **server_options
+    ):
+        """Initialize the parameters, server_options go to the servers."""
+        self._key = key
+        self._vertical_ref = vertical_ref
+        self._tide_station_distance = tide_station_distance
+        self._tide_prediction_duration = tide_prediction_duration
+        self.refresh_margin = refresh_margin
+        self._location_precision = location_precision
+        self._max_locations = max_locations
+        self._session = session or give_shared_session()
+        self._server_url = server_url
+        self._server_options = server_options
+        self._lock = threading.Lock()
+        self._locations = {}
+        self.query_count = 0
+        self.upstream_request_count = 0
+        self._unix_socket = unix_socket
+        handler_class = self._give_handler_class()
+        if unix_socket is not None:
+            if os.path.exists(unix_socket):
+                os.unlink(unix_socket)
+            self._httpd = _Unix_HTTP_Server(unix_socket, handler_class)
+        else:
+            self._httpd = ThreadingHTTPServer((host, port), handler_class)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    def give_url(self):
+        """Give the base URL (unix socket path with unix: prefix)."""
+        if self._unix_socket is not None:
+            return "unix:" + self._unix_socket
+        host, port = self._httpd.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    def start(self):
+        """Serve in a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Serve in the current thread."""
+        self._httpd.serve_forever()
+
+    def stop(self):
+        """Stop serving and close the socket."""
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+        if self._unix_socket is not None and os.path.exists(self._unix_socket):
+            os.unlink(self._unix_socket)
+
+    def __enter__(self):
+        """Start serving."""
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        """Stop serving."""
+        self.stop()
+
+    def count_upstream_request(self):
+        """Count a request to the upstream server."""
+        with self._lock:
+            self.upstream_request_count += 1
+
+    def _give_location(self, lat, lon):
+        """Give the location entry of lat/lon (created on first query).
+
+        Raise Daemon_Error if max_locations are already held.
+        """
+        location_key = (
+            round(lat, self._location_precision),
+            round(lon, self._location_precision),
+        )
+        location = self._locations.get(location_key)
+        if location is not None:
+            return location
+        with self._lock:
+            location = self._locations.get(location_key)
+            if location is None:
+                if len(self._locations) >= self._max_locations:
+                    raise Daemon_Error(
+                        503, "too many locations (max {})".format(self._max_locations)
+                    )
+                server = WorldTidesInfo_server(
+                    self._key,
+                    location_key[0],
+                    location_key[1],
+                    self._vertical_ref,
+                    self._tide_station_distance,
+                    self._tide_prediction_duration,
+                    "2,102,255",
+                    "255,255,255",
+                    PLOT_CURVE_UNIT_M,
+                    session=self._session,
+                    tide_sections=DAEMON_TIDE_SECTIONS,
+                    server_url=self._server_url,
+                    **self._server_options
+                )
+                location = _Daemon_Location(server)
+                self._locations[location_key] = location
+        return location
+
+    def give_stats(self):
+        """Give the daemon counters."""
+        with self._lock:
+            return {
+                "locations": len(self._locations),
+                "queries": self.query_count,
+                "upstream_requests": self.upstream_request_count,
+            }
+
+    def give_answer(self, query_name, parameters):
+        """Give the answer of a query (parameters : query string values).
+
+        Raise Daemon_Error if the query cannot be answered.
+        """
+        with self._lock:
+            self.query_count += 1
+        if query_name == "stats":
+            return self.give_stats()
+        query = DAEMON_QUERIES.get(query_name)
+        if query is None:
+            raise Daemon_Error(404, "unknown query : {}".format(query_name))
+        try:
+            lat = float(parameters["lat"])
+            lon = float(parameters["lon"])
+            values = {
+                "time": float(parameters.get("time", time.time())),
+                "start": float(parameters.get("start", 0)),
+                "end": float(parameters.get("end", 0)),
+            }
+        except (KeyError, ValueError):
+            raise Daemon_Error(400, "lat/lon (and numeric time/start/end) expected")
+        if not all(map(math.isfinite, [lat, lon] + list(values.values()))):
+            raise Daemon_Error(400, "finite lat/lon (and time/start/end) expected")
+        return query(self, self._give_location(lat, lon), values)
+
+    def _give_handler_class(self):
+        """Give the request handler bound to this daemon."""
+        daemon = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            """Answer the GET requests (keep-alive)."""
+
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                """Send the answer as JSON."""
+                split_url = urlsplit(self.path)
+                parameters = {
+                    name: values[-1]
+                    for name, values in parse_qs(split_url.query).items()
+                }
+                try:
+                    status = 200
+                    answer = daemon.give_answer(split_url.path.strip("/"), parameters)
+                except Daemon_Error as err:
+                    status = err.status
+                    answer = {"error": str(err)}
+                except Exception:
+                    # the connection is answered, the daemon keeps serving
+                    _LOGGER.exception("Query %s failed", self.path)
+                    status = 500
+                    answer = {"error": "internal error"}
+                body = json.dumps(answer, default=_give_json_value).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                """Log with the module logger."""
+                _LOGGER.debug(format, *args)
+
+        return _Handler
+
+
+class _Unix_HTTP_Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """HTTP server on a unix socket."""
+
+    def get_request(self):
+        """Give the connection with an address usable by the handler."""
+        request, _ = super().get_request()
+        return request, ("unix", 0)
+
+
+def _give_json_value(value):
+    """Give a JSON value of numpy/array values."""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def main():
+    """Define the main function."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-k", "--key", required=True, help="WorldidesInfo Key")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DAEMON_PORT)
+    parser.add_argument("--unix-socket", help="serve on this unix socket path")
+    parser.add_argument("--vertical-ref", default=DAEMON_VERTICAL_REF)
+    parser.add_argument(
+        "--distance", type=int, default=DAEMON_TIDE_STATION_DISTANCE, help="km"
+    )
+    parser.add_argument(
+        "--duration", type=int, default=DAEMON_TIDE_PREDICTION_DURATION, help="days"
+    )
+    parser.add_argument(
+        "--max-locations",
+        type=int,
+        default=DAEMON_MAX_LOCATIONS,
+        help="locations held at most",
+    )
+    parser.add_argument("--server-url", default=SERVER_URL, help="server URL")
+    args = parser.parse_args()
+
+    tide_daemon = Tide_Daemon(
+        args.key,
+        vertical_ref=args.vertical_ref,
+        tide_station_distance=args.distance,
+        tide_prediction_duration=args.duration,
+        host=args.host,
+        port=args.port,
+        unix_socket=args.unix_socket,
+        max_locations=args.max_locations,
+        server_url=args.server_url,
+    )
+    print("serving on {}".format(tide_daemon.give_url()))
+    try:
+        tide_daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        tide_daemon.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""Instrumentation of requests/queries and Prometheus text exporter."""
+# Python library
+import functools
+import logging
+import threading
+import time
+
+from .worldtidesinfo_cache import atomic_write
+
+_LOGGER = logging.getLogger(__name__)
+
+# Component library
+METRIC_PREFIX = "worldtides_"
+METRIC_HELP = {
+    "requests_total": ("counter", "Requests sent to the server."),
+    "request_credits_total": ("counter", "Credits used by the requests."),
+    "request_payload_bytes_total": ("counter", "Bytes of the responses received."),
+    "request_new_connections_total": (
+        "counter",
+        "Requests that opened a new connection (DNS/TCP/TLS in header time).",
+    ),
+    "request_duration_seconds": ("summary", "Duration of the requests by phase."),
+    "cache_hits_total": ("counter", "Requests answered by the cache."),
+    "cache_misses_total": ("counter", "Requests not found in the cache."),
+    "query_duration_seconds": ("summary", "Duration of the decoder queries."),
+}
+# timing key : phase label
+_REQUEST_PHASES = {
+    "header_time": "header",
+    "transfer_time": "transfer",
+    "decode_time": "decode",
+    "total_time": "total",
+}
+
+
+class Instrumentation:
+    """Interface of the instrumentation (methods do nothing).
+
+    Give an object implementing it as instrumentation of the servers and
+    decoders ; nothing is measured when instrumentation is None.
+    """
+
+    def on_request(self, request_name, credit, error_value, timing):
+        """Handle a request sent (timing None if it failed)."""
+
+    def on_cache(self, request_name, hit):
+        """Handle a cache lookup."""
+
+    def on_query(self, query_name, duration):
+        """Handle a decoder query (duration in seconds)."""
+
+
+def instrument_queries(decoder, instrumentation):
+    """Time the give_* methods of a decoder instance.
+
+    Only this instance is changed : decoders without instrumentation keep
+    the plain methods. A query made by another query is not counted.
+    """
+    # per thread : query being measured
+    measuring = threading.local()
+    for name in dir(type(decoder)):
+        if name.startswith("give_") and callable(getattr(decoder, name)):
+            setattr(
+                decoder,
+                name,
+                _give_timed_method(
+                    getattr(decoder, name), name, instrumentation, measuring
+                ),
+            )
+    return decoder
+
+
+def _give_timed_method(method, query_name, instrumentation, measuring):
+    """Give the method reporting its duration (outermost query only)."""
+
+    @functools.wraps(method)
+    def timed_method(*args, **kwargs):
+        if getattr(measuring, "active", False):
+            return method(*args, **kwargs)
+        measuring.active = True
+        start_time = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            measuring.active = False
+            instrumentation.on_query(query_name, time.perf_counter() - start_time)
+
+    return timed_method
+
+
+def _escape_label_value(value):
+    """Give a label value escaped for the Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _give_label_text(labels):
+    """Give the {name="value",...} text of labels."""
+    if not labels:
+        return ""
+    return (
+        "{"
+        + ",".join(
+            '{}="{}"'.format(name, _escape_label_value(value)) for name, value in labels
+        )
+        + "}"
+    )
+
+
+class Metrics_Registry(Instrumentation):
+    """Keep counters/summaries of the instrumentation (thread safe)."""
+
+    def __init__(self):
+        """Initialize the metrics."""
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._summaries = {}
+
+    def _increment(self, name, labels, value=1):
+        """Increment a counter."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def _observe(self, name, labels, value):
+        """Add an observation to a summary."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            count, total = self._summaries.get(key, (0, 0.0))
+            self._summaries[key] = (count + 1, total + value)
+
+    def on_request(self, request_name, credit, error_value, timing):
+        """Count the request, its credit, payload and durations."""
+        labels = {"request": request_name}
+        status = "ok" if error_value is None else "error"
+        self._increment("requests_total", dict(labels, status=status))
+        if credit:
+            self._increment("request_credits_total", labels, credit)
+        if timing is None:
+            return
+        if timing.get("payload_size") is not None:
+            self._increment(
+                "request_payload_bytes_total", labels, timing["payload_size"]
+            )
+        if timing.get("new_connection"):
+            self._increment("request_new_connections_total", labels)
+        for timing_key, phase in _REQUEST_PHASES.items():
+            if timing.get(timing_key) is not None:
+                self._observe(
+                    "request_duration_seconds",
+                    dict(labels, phase=phase),
+                    timing[timing_key],
+                )
+
+    def on_cache(self, request_name, hit):
+        """Count the cache hit/miss."""
+        name = "cache_hits_total" if hit else "cache_misses_total"
+        self._increment(name, {"request": request_name})
+
+    def on_query(self, query_name, duration):
+        """Add the query duration."""
+        self._observe("query_duration_seconds", {"query": query_name}, duration)
+
+    def give_counter(self, name, **labels):
+        """Give the value of a counter (0 if never incremented)."""
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def give_summary(self, name, **labels):
+        """Give count and sum of a summary."""
+        with self._lock:
+            return self._summaries.get((name, tuple(sorted(labels.items()))), (0, 0.0))
+
+    def give_prometheus_text(self):
+        """Give the metrics in the Prometheus text exposition format."""
+        with self._lock:
+            counters = dict(self._counters)
+            summaries = dict(self._summaries)
+        lines = []
+        for name, (metric_type, help_text) in METRIC_HELP.items():
+            metric_name = METRIC_PREFIX + name
+            if metric_type == "counter":
+                samples = sorted(
+                    (labels, value)
+                    for (counter_name, labels), value in counters.items()
+                    if counter_name == name
+                )
+            else:
+                samples = sorted(
+                    (labels, value)
+                    for (summary_name, labels), value in summaries.items()
+                    if summary_name == name
+                )
+            if not samples:
+                continue
+            lines.append("# HELP {} {}".format(metric_name, help_text))
+            lines.append("# TYPE {} {}".format(metric_name, metric_type))
+            for labels, value in samples:
+                label_text = _give_label_text(labels)
+                if metric_type == "counter":
+                    lines.append("{}{} {}".format(metric_name, label_text, value))
+                else:
+                    count, total = value
+                    lines.append("{}_count{} {}".format(metric_name, label_text, count))
+                    lines.append("{}_sum{} {}".format(metric_name, label_text, total))
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus_text(self, path):
+        """Write the metrics file (node exporter textfile collector)."""
+        atomic_write(path, self.give_prometheus_text().encode("utf-8"))
@@ -0,0 +1,242 @@
+"""Refresh many servers before their data run out, within a credit budget."""
+# Python library
+from collections import deque
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+
+from .tide_timeline import give_data_horizon
+from .worldtidesinfo_server import TIDE_DAY_DURATION
+
+_LOGGER = logging.getLogger(__name__)
+
+# Component library
+# refresh when the data held end within this duration (seconds)
+SCHEDULER_REFRESH_MARGIN = TIDE_DAY_DURATION / 2
+# refreshes are advanced by a random duration up to this one (spread)
+SCHEDULER_JITTER = 3600
+# credits allowed per budget period (sliding window)
+SCHEDULER_CREDIT_BUDGET = 100
+SCHEDULER_BUDGET_PERIOD = TIDE_DAY_DURATION
+# delay before a new attempt after an error (doubled up to the max)
+SCHEDULER_RETRY_DELAY = 900
+SCHEDULER_RETRY_DELAY_MAX = 4 * 3600
+# longest wait of run_forever between 2 checks
+SCHEDULER_MAX_WAIT = 60
+
+
+class _Scheduled_Server:
+    """Schedule state of one server."""
+
+    def __init__(self, server, due_time):
+        """Initialize the state."""
+        self.server = server
+        self.due_time = due_time
+        self.credit_estimate = 1
+        self.failure_count = 0
+        self.removed = False
+
+
+class Refresh_Scheduler:
+    """Refresh the tide data of servers closest to expiry first.
+
+    A server is due when its data horizon (last height/extreme) is within
+    the refresh margin, advanced by a random jitter to spread the requests.
+    The credits (callCount) used over the budget period must stay within
+    the budget : the other due servers wait.
+    """
+
+    def __init__(
+        self,
+        datum_flag=False,
+        credit_budget=SCHEDULER_CREDIT_BUDGET,
+        budget_period=SCHEDULER_BUDGET_PERIOD,
+        refresh_margin=SCHEDULER_REFRESH_MARGIN,
+        jitter=SCHEDULER_JITTER,
+        retry_delay=SCHEDULER_RETRY_DELAY,
+        incremental=False,
+        seed=None,
+    ):
+        """Initialize the parameters (durations in seconds)."""
+        self._datum_flag = datum_flag
+        self._credit_budget = credit_budget
+        self._budget_period = budget_period
+        self._refresh_margin = refresh_margin
+        self._jitter = jitter
+        self._retry_delay = retry_delay
+        self._incremental = incremental
+        self._random = random.Random(seed)  # nosec
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._heap = []
+        self._sequence = itertools.count()
+        # (time, credit) of the requests within the budget period
+        self._credits = deque()
+
+    def add_server(self, server, current_time=None):
+        """Add a server, due now if it holds no valid data."""
+        if current_time is None:
+            current_time = time.time()
+        with self._lock:
+            if id(server) in self._entries:
+                return
+            entry = _Scheduled_Server(server, current_time)
+            entry.due_time = self._give_due_time(entry, current_time)
+            self._entries[id(server)] = entry
+            self._push(entry)
+
+    def remove_server(self, server):
+        """Remove a server from the schedule."""
+        with self._lock:
+            entry = self._entries.pop(id(server), None)
+            if entry is not None:
+                entry.removed = True
+
+    def _push(self, entry):
+        """Push the entry on the heap of due times."""
+        heapq.heappush(self._heap, (entry.due_time, next(self._sequence), entry))
+
+    def give_horizon(self, server):
+        """Give the epoch of the last data held by server (None if no data)."""
+        return give_data_horizon(server.retrieve_tide_raw_data())
+
+    def give_remaining_horizon(self, server, current_time=None):
+        """Give the seconds of data left (negative : expired, None : no data)."""
+        if current_time is None:
+            current_time = time.time()
+        horizon = self.give_horizon(server)
+        if horizon is None:
+            return None
+        return horizon - current_time
+
+    def _give_due_time(self, entry, current_time):
+        """Give the time to refresh a server."""
+        horizon = self.give_horizon(entry.server)
+        if horizon is None:
+            return current_time
+        due_time = horizon - self._refresh_margin
+        if self._jitter:
+            due_time -= self._random.uniform(0, self._jitter)
+        return max(due_time, current_time)
+
+    def give_credit_used(self, current_time=None):
+        """Give the credits used within the budget period."""
+        if current_time is None:
+            current_time = time.time()
+        with self._lock:
+            self._forget_old_credits(current_time)
+            return sum(credit for _, credit in self._credits)
+
+    def _forget_old_credits(self, current_time):
+        """Drop the credits older than the budget period."""
+        while self._credits and (
+            self._credits[0][0] <= current_time - self._budget_period
+        ):
+            self._credits.popleft()
+
+    def give_schedule(self):
+        """Give (due time, server) of the servers by due time."""
+        with self._lock:
+            return sorted(
+                ((entry.due_time, entry.server) for entry in self._entries.values()),
+                key=lambda item: item[0],
+            )
+
+    def give_next_run_time(self):
+        """Give the earliest due time (None if no server)."""
+        with self._lock:
+            self._drop_removed()
+            if not self._heap:
+                return None
+            return self._heap[0][0]
+
+    def _drop_removed(self):
+        """Drop the removed servers on top of the heap."""
+        while self._heap and self._heap[0][2].removed:
+            heapq.heappop(self._heap)
+
+    def _pop_due_entries(self, current_time):
+        """Give the due entries, closest to expiry first."""
+        due_entries = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= current_time:
+                _, _, entry = heapq.heappop(self._heap)
+                if not entry.removed:
+                    due_entries.append(entry)
+
+        def give_priority(entry):
+            remaining_horizon = self.give_remaining_horizon(entry.server, current_time)
+            if remaining_horizon is None:
+                return float("-inf")
+            return remaining_horizon
+
+        return sorted(due_entries, key=give_priority)
+
+    def _refresh(self, server):
+        """Refresh the tide of a server, tell if it succeeded."""
+        if self._incremental:
+            return server.retrieve_tide_height_incremental(self._datum_flag)
+        return server.retrieve_tide_height_over_one_day(self._datum_flag)
+
+    def run_pending(self, current_time=None):
+        """Refresh the due servers within the budget, give the ones refreshed."""
+        if current_time is None:
+            current_time = time.time()
+        refreshed_servers = []
+        due_entries = self._pop_due_entries(current_time)
+        for index, entry in enumerate(due_entries):
+            with self._lock:
+                self._forget_old_credits(current_time)
+                credit_used = sum(credit for _, credit in self._credits)
+                if credit_used + entry.credit_estimate > self._credit_budget:
+                    # wait for the oldest credits to leave the budget period
+                    retry_time = current_time + 1
+                    if self._credits:
+                        retry_time = self._credits[0][0] + self._budget_period
+                    _LOGGER.debug(
+                        "Credit budget reached (%s), %s refresh delayed",
+                        credit_used,
+                        len(due_entries) - index,
+                    )
+                    for delayed_entry in due_entries[index:]:
+                        delayed_entry.due_time = retry_time
+                        self._push(delayed_entry)
+                    break
+
+            success = self._refresh(entry.server)
+            credit = entry.server.retrieve_tide_credit()
+            with self._lock:
+                if credit:
+                    self._credits.append((current_time, credit))
+                    entry.credit_estimate = credit
+                if success:
+                    entry.failure_count = 0
+                    entry.due_time = self._give_due_time(entry, current_time)
+                    refreshed_servers.append(entry.server)
+                else:
+                    entry.failure_count += 1
+                    entry.due_time = current_time + min(
+                        self._retry_delay * 2 ** (entry.failure_count - 1),
+                        SCHEDULER_RETRY_DELAY_MAX,
+                    )
+                if not entry.removed:
+                    # horizon still within the margin : avoid a request loop
+                    if entry.due_time <= current_time:
+                        entry.due_time = current_time + self._retry_delay
+                    self._push(entry)
+        return refreshed_servers
+
+    def run_forever(self, stop_event):
+        """Run the refreshes until stop_event (threading.Event) is set."""
+        while not stop_event.is_set():
+            self.run_pending()
+            next_run_time = self.give_next_run_time()
+            wait_duration = SCHEDULER_MAX_WAIT
+            if next_run_time is not None:
+                wait_duration = min(
+                    max(next_run_time - time.time(), 0), SCHEDULER_MAX_WAIT
+                )
+            stop_event.wait(wait_duration)
@@ -1,19 +1,136 @@
 """gather function objects thal allow to manage Word Tides Info server API V2."""
 # python library
 # Python library
+from collections import namedtuple
+import copy
+import hashlib
+import json
 import logging
+import math
+import threading
 import time
 
-import requests
+from .tide_columns import Compact_Tide_Data
+from .tide_decoder import (  # noqa: F401 - decoders were defined here
+    PLOT_CURVE_UNIT_FT,
+    PLOT_CURVE_UNIT_M,
+    give_info_from_raw_data,
+    give_info_from_raw_data_history,
+    give_info_from_raw_data_N_and_N_1,
+    give_info_from_raw_datums_data,
+)
+from .tide_stream_decoder import STREAM_CHUNK_SIZE, Tide_Stream_Decoder
+from .tide_timeline import give_data_horizon, merge_tide_raw_data
+from .worldtidesinfo_transport import (
+    TRANSPORT_STDLIB,
+    Transport_Error,
+    create_transport,
+    give_transport,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
 
 # Component library
-PLOT_CURVE_UNIT_FT = "feet"
-PLOT_CURVE_UNIT_M = "meters"
 # This parameter is directly used in URL
 SERVER_API_VERSION = "v3"
+SERVER_URL = "https://www.worldtides.info"
+TIDE_DAY_DURATION = 24 * 3600
+# seconds between 2 heights (default)
+TIDE_STEP = 900
+# sections of the tide request
+TIDE_SECTION_HEIGHTS = "heights"
+TIDE_SECTION_EXTREMES = "extremes"
+TIDE_SECTION_PLOT = "plot"
+TIDE_SECTION_DATUMS = "datums"
+TIDE_SECTION_LIST = [
+    TIDE_SECTION_EXTREMES,
+    TIDE_SECTION_HEIGHTS,
+    TIDE_SECTION_PLOT,
+    TIDE_SECTION_DATUMS,
+]
+DEFAULT_TIDE_SECTIONS = (
+    TIDE_SECTION_EXTREMES,
+    TIDE_SECTION_HEIGHTS,
+    TIDE_SECTION_PLOT,
+)
+# incremental refresh keeps the data of the last day (previous tide)
+TIDE_RETENTION_DURATION = TIDE_DAY_DURATION
+# timeout (seconds) to establish the connection / to wait for data
+SERVER_CONNECT_TIMEOUT = 5
+SERVER_READ_TIMEOUT = 10
+# number of kept-alive connections per host
+SERVER_POOL_SIZE = 10
+
+# parameter changes : applied to the data held or needing a new request
+PARAMETER_CHANGE_LOCAL = "local"
+PARAMETER_CHANGE_REQUEST = "request"
+# names of Server_Parameter fields (same order as _give_fields)
+PARAMETER_FIELD_NAMES = (
+    "version",
+    "key",
+    "lat",
+    "lon",
+    "vertical_ref",
+    "tide_station_distance",
+    "tide_prediction_duration",
+    "plot_color",
+    "plot_background",
+    "unit_curve_picture",
+    "tide_sections",
+    "tide_step",
+)
+
+_shared_session = None
+_shared_session_lock = threading.Lock()
+
+
+def create_session(pool_size=SERVER_POOL_SIZE, backend=TRANSPORT_STDLIB):
+    """Create a keep-alive transport with a connection pool.
+
+    backend : TRANSPORT_STDLIB (no dependency), TRANSPORT_REQUESTS or
+    TRANSPORT_HTTPX (imported on first use).
+    """
+    return create_transport(backend, pool_size)
+
+
+def give_shared_session():
+    """Give the transport shared by all servers without an injected one."""
+    global _shared_session
+    with _shared_session_lock:
+        if _shared_session is None:
+            _shared_session = create_session()
+        return _shared_session
+
+
+class Fetch_Result(
+    namedtuple(
+        "Fetch_Result",
+        (
+            "data",
+            "request_time",
+            "credit",
+            "error_value",
+            "timing",
+            "from_cache",
+            "request_key",
+        ),
+    )
+):
+    """Outcome of one request (immutable) : data and its credit/error/timing.
+
+    from_cache : data from cache, catalog or another request (credit 0).
+    request_key : key of the parameter and request options of the data.
+    """
+
+    __slots__ = ()
+
+    def is_success(self):
+        """Tell if the request succeeded."""
+        return self.error_value is None
+
+
+NO_FETCH_RESULT = Fetch_Result(None, None, 0, None, None, False, None)
 
 
 class Server_Parameter:
@@ -30,6 +147,8 @@ class Server_Parameter:
         plot_color,
         plot_background,
         unit_curve_picture,
+        tide_sections=DEFAULT_TIDE_SECTIONS,
+        tide_step=TIDE_STEP,
     ):
         """Initialize the parameters."""
         self._version = SERVER_API_VERSION
@@ -42,41 +161,100 @@ class Server_Parameter:
         self._plot_color = plot_color
         self._plot_background = plot_background
         self._unit_curve_picture = unit_curve_picture
+        # requested sections (in TIDE_SECTION_LIST order) and height step
+        self._tide_sections = tuple(
+            section for section in TIDE_SECTION_LIST if section in tide_sections
+        )
+        self._tide_step = tide_step
+
+    def _give_fields(self):
+        """Give the fields that define the requests."""
+        return (
+            self._version,
+            self._key,
+            self._lat,
+            self._lon,
+            self._vertical_ref,
+            self._tide_station_distance,
+            self._tide_prediction_duration,
+            self._plot_color,
+            self._plot_background,
+            self._unit_curve_picture,
+            self._tide_sections,
+            self._tide_step,
+        )
+
+    def __eq__(self, other):
+        """Compare all the fields."""
+        if not isinstance(other, Server_Parameter):
+            return NotImplemented
+        return self._give_fields() == other._give_fields()
+
+    # mutable (change_ref_point) : not hashable, give_cache_key is the key
+    __hash__ = None
+
+    def give_cache_key(self, *request_info):
+        """Give a stable key of the fields and of the request info."""
+        content = json.dumps([self._give_fields(), request_info], default=str)
+        return hashlib.sha256(content.encode()).hexdigest()
 
     def compare_parameter(self, parameter):
         """Compare the parameter given to the stored ones."""
-        result = False
-        try:
-            if (
-                parameter._version == self._version
-                and parameter._key == self._key
-                and parameter._lat == self._lat
-                and parameter._lon == self._lon
-                and parameter._vertical_ref == self._vertical_ref
-                and parameter._tide_station_distance == self._tide_station_distance
-                and parameter._tide_prediction_duration
-                == self._tide_prediction_duration
-                and parameter._plot_color == self._plot_color
-                and parameter._plot_background == self._plot_background
-                and parameter._unit_curve_picture == self._unit_curve_picture
-            ):
-                result = True
-            else:
-                _LOGGER.debug(
-                    "Parameter differ : lat recorded %s vs expected %s",
-                    parameter._lat,
-                    self._lat,
-                )
-                _LOGGER.debug(
-                    "Parameter differ : lon recorded %s vs expected %s",
-                    parameter._lon,
-                    self._lon,
-                )
-                result = False
-        except:
-            result = False
+        result = self == parameter
+        if not result:
+            _LOGGER.debug(
+                "Parameter differ : lat recorded %s vs expected %s",
+                getattr(parameter, "_lat", None),
+                self._lat,
+            )
+            _LOGGER.debug(
+                "Parameter differ : lon recorded %s vs expected %s",
+                getattr(parameter, "_lon", None),
+                self._lon,
+            )
         return result
 
+    def give_parameter_diff(self, parameter, data=None):
+        """Give the fields changed by parameter, local or needing a request.
+
+        Give {"local": {name: (old, new)}, "request": {name: (old, new)}} ;
+        data (last raw data) tells if a datum change can use its datums.
+        """
+        diff = {PARAMETER_CHANGE_LOCAL: {}, PARAMETER_CHANGE_REQUEST: {}}
+        for name, old_value, new_value in zip(
+            PARAMETER_FIELD_NAMES, self._give_fields(), parameter._give_fields()
+        ):
+            if old_value == new_value:
+                continue
+            if self._is_local_change(name, old_value, new_value, parameter, data):
+                change = PARAMETER_CHANGE_LOCAL
+            else:
+                change = PARAMETER_CHANGE_REQUEST
+            diff[change][name] = (old_value, new_value)
+        return diff
+
+    @staticmethod
+    def _is_local_change(name, old_value, new_value, parameter, data):
+        """Tell if a field change can be applied to the data held."""
+        if name == "key":
+            return True
+        if name == "vertical_ref":
+            # converted with the datums (tide_conversion.convert_raw_data)
+            if data is None or not data.get("datums"):
+                return False
+            datum_names = [datum["name"] for datum in data["datums"]]
+            return new_value in datum_names and (
+                data.get("responseDatum") in datum_names
+            )
+        if name == "tide_prediction_duration":
+            return new_value < old_value
+        if name in ("plot_color", "plot_background", "unit_curve_picture"):
+            # only the plot of the server uses them
+            return TIDE_SECTION_PLOT not in parameter._tide_sections
+        if name == "tide_sections":
+            return set(new_value) <= set(old_value)
+        return False
+
     def get_latitude(self):
         """Retrieve the ref latitude."""
         return self._lat
@@ -89,6 +267,14 @@ class Server_Parameter:
         """Retrieve the tide station distance given o fetch tide station."""
         return self._tide_station_distance
 
+    def get_tide_sections(self):
+        """Retrieve the sections requested with tide."""
+        return self._tide_sections
+
+    def get_tide_step(self):
+        """Retrieve the step between 2 heights."""
+        return self._tide_step
+
     def change_ref_point(self, lat, lon):
         """Set a new reference lat/long."""
         self._lat = lat
@@ -109,8 +295,37 @@ class WorldTidesInfo_server:
         plot_color,
         plot_background,
         unit_curve_picture,
+        session=None,
+        connect_timeout=SERVER_CONNECT_TIMEOUT,
+        read_timeout=SERVER_READ_TIMEOUT,
+        cache=None,
+        streaming_decode=False,
+        tide_sections=DEFAULT_TIDE_SECTIONS,
+        tide_step=TIDE_STEP,
+        server_url=SERVER_URL,
+        instrumentation=None,
+        single_flight=None,
+        station_catalog=None,
     ):
         """Initialize the parameters."""
+        # optional Station_Catalog : stations of covered areas without request
+        self._station_catalog = station_catalog
+        # optional Single_Flight (e.g. give_shared_single_flight()) : the
+        # identical requests in flight share one HTTP call
+        self._single_flight = single_flight
+        # optional Instrumentation (e.g. Metrics_Registry) of the requests
+        self._instrumentation = instrumentation
+        # decode tide responses while received, into Compact_Tide_Data
+        self._streaming_decode = streaming_decode
+        # connection : injected transport (or requests like session) or the
+        # one shared by all servers
+        self._session = session
+        self._transport = None
+        # optional Response_Cache : a hit skips the request
+        self._cache = cache
+        self._timeout = (connect_timeout, read_timeout)
+        # base URL : the real server or a local stand-in (load tests)
+        self._server_url = server_url
         # parameter
         self._Server_Parameter = Server_Parameter(
             key,
@@ -122,595 +337,513 @@ class WorldTidesInfo_server:
             plot_color,
             plot_background,
             unit_curve_picture,
+            tide_sections,
+            tide_step,
         )
 
-        # information from server
-        self.last_tide_station_raw_data = None
-        self.last_tide_station_request_time = None
-        self.last_tide_station_request_credit = 0
-        self.last_tide_station_request_error_value = None
-        # information from server
-        self.last_tide_raw_data = None
-        self.last_tide_raw_data_request_time = None
-        self.last_tide_request_credit = 0
-        self.last_tide_request_error_value = None
+        # last results : replaced as a whole, read without lock
+        self._tide_station_result = NO_FETCH_RESULT
+        self._tide_result = NO_FETCH_RESULT
+        self._result_lock = threading.Lock()
+        # incremental refresh : read, merge and store one at a time
+        self._incremental_lock = threading.Lock()
 
     def change_ref_point(self, lat, lon):
-        """Change the reference point."""
-        self._Server_Parameter.change_ref_point(lat, lon)
+        """Change the reference point.
+
+        The parameter is replaced : requests in progress keep the old one.
+        """
+        parameter = copy.copy(self._Server_Parameter)
+        parameter.change_ref_point(lat, lon)
+        self._Server_Parameter = parameter
 
     def give_parameter(self):
         """Give the parameter."""
         return self._Server_Parameter
 
+    def give_session(self):
+        """Give the HTTP session used."""
+        if self._session is None:
+            return give_shared_session()
+        return self._session
+
+    def _give_transport(self):
+        """Give the transport of the session used."""
+        transport = self._transport
+        if transport is None:
+            # threads racing here wrap the same session : either one is fine
+            transport = give_transport(self.give_session())
+            self._transport = transport
+        return transport
+
+    def _store_result(self, result_name, result):
+        """Store a result unless a newer request already stored one."""
+        with self._result_lock:
+            last_result = getattr(self, result_name)
+            if (
+                last_result.request_time is None
+                or result.request_time >= last_result.request_time
+            ):
+                setattr(self, result_name, result)
+        return result
+
+    def give_tide_station_result(self):
+        """Give the Fetch_Result of the last tide station request."""
+        return self._tide_station_result
+
+    def give_tide_result(self):
+        """Give the Fetch_Result of the last tide request."""
+        return self._tide_result
+
+    @staticmethod
+    def _give_cache_key(parameter, request_name, *request_info):
+        """Give the cache key of a request (rotates with the UTC day)."""
+        current_day = time.strftime("%Y-%m-%d", time.gmtime())
+        return parameter.give_cache_key(request_name, current_day, *request_info)
+
+    def _give_cached_data(self, cache_key, request_name):
+        """Give the raw data in cache (None if no cache or miss)."""
+        if self._cache is None:
+            return None
+        data = self._cache.get(cache_key)
+        if self._instrumentation is not None:
+            self._instrumentation.on_cache(request_name, data is not None)
+        return data
+
+    def _report_request(self, request_name, data, error_value, timing):
+        """Give the outcome of a request to the instrumentation."""
+        if self._instrumentation is not None:
+            credit = data["callCount"] if data is not None else 0
+            self._instrumentation.on_request(request_name, credit, error_value, timing)
+
+    def _store_cached_data(self, cache_key, data):
+        """Store the raw data received in cache."""
+        if self._cache is not None and data is not None:
+            if isinstance(data, Compact_Tide_Data):
+                data = data.to_raw_data()
+            self._cache.set(cache_key, data)
+
+    def _request_json(self, resource, streaming=False):
+        """Request resource and give data, error and timing.
+
+        With streaming, the body is decoded while received (Compact_Tide_Data).
+        """
+        transport = self._give_transport()
+        connection_count = transport.give_connection_count(resource)
+        start_time = time.perf_counter()
+        timing = None
+        data_get = None
+        try:
+            data_get = transport.get(resource, timeout=self._timeout, stream=streaming)
+            header_time = data_get.elapsed_time
+            new_connection = None
+            if connection_count is not None:
+                new_connection = (
+                    transport.give_connection_count(resource) != connection_count
+                )
+            if data_get.status_code == 200 and streaming:
+                decoder = Tide_Stream_Decoder()
+                payload_size = 0
+                # time spent decoding while receiving
+                decode_time = 0.0
+                for chunk in data_get.iter_content(STREAM_CHUNK_SIZE):
+                    payload_size += len(chunk)
+                    decode_start_time = time.perf_counter()
+                    decoder.feed(chunk)
+                    decode_time += time.perf_counter() - decode_start_time
+                decode_start_time = time.perf_counter()
+                data = decoder.close()
+                decode_time += time.perf_counter() - decode_start_time
+                total_time = time.perf_counter() - start_time
+                error_value = None
+            elif data_get.status_code == 200:
+                payload_size = len(data_get.content)
+                total_time = time.perf_counter() - start_time
+                data = data_get.json()
+                decode_time = time.perf_counter() - start_time - total_time
+                error_value = None
+            else:
+                payload_size = len(data_get.content)
+                total_time = time.perf_counter() - start_time
+                decode_time = None
+                error_value = data_get.status_code
+                data = None
+            # header time includes the TCP/TLS handshake when new_connection
+            timing = {
+                "new_connection": new_connection,
+                "header_time": header_time,
+                "transfer_time": max(total_time - header_time, 0.0),
+                "total_time": total_time,
+                "decode_time": decode_time,
+                "payload_size": payload_size,
+            }
+
+        except (ValueError, Transport_Error) as err:
+            error_value = err.args
+            data = None
+        finally:
+            if data_get is not None:
+                data_get.close()
+
+        return data, error_value, timing
+
+    def _shared_request_json(self, flight_key, resource, streaming=False):
+        """Request resource once for the identical requests in flight.
+
+        Give data, error, timing and if the result comes from another
+        request (no credit used).
+        """
+        if self._single_flight is None:
+            return self._request_json(resource, streaming) + (False,)
+        # raw data and Compact_Tide_Data : not shared with each other
+        result, shared = self._single_flight.do(
+            (flight_key, streaming), lambda: self._request_json(resource, streaming)
+        )
+        return result + (shared,)
+
     def retrieve_tide_station_credit(self):
         """Give the last credit used (tide station)."""
-        return self.last_tide_station_request_credit
+        return self._tide_station_result.credit
 
     def retrieve_tide_station_err_value(self):
         """Give the last error (tide station)."""
-        return self.last_tide_station_request_error_value
+        return self._tide_station_result.error_value
 
     def retrieve_tide_station_raw_data(self):
         """Give the last raw data (tide station)."""
-        return self.last_tide_station_raw_data
+        return self._tide_station_result.data
 
     def retrieve_tide_station_request_time(self):
         """Give the last request time (tide station)."""
-        return self.last_tide_station_request_time
+        return self._tide_station_result.request_time
+
+    def retrieve_tide_station_timing(self):
+        """Give the last request timing (tide station)."""
+        return self._tide_station_result.timing
+
+    # attributes of the previous versions (read only)
+    last_tide_station_raw_data = property(retrieve_tide_station_raw_data)
+    last_tide_station_request_time = property(retrieve_tide_station_request_time)
+    last_tide_station_request_credit = property(retrieve_tide_station_credit)
+    last_tide_station_request_error_value = property(retrieve_tide_station_err_value)
+    last_tide_station_request_timing = property(retrieve_tide_station_timing)
+
+    def _tide_station_resource(self, parameter):
+        """Give the URL to retrieve tide station."""
+        return ("{}/api/{}?stations&key={}&lat={}&lon={}&stationDistance={}").format(
+            self._server_url,
+            parameter._version,
+            parameter._key,
+            parameter._lat,
+            parameter._lon,
+            parameter._tide_station_distance,
+        )
+
+    def _set_tide_station_result(
+        self,
+        current_time,
+        data,
+        error_value,
+        timing,
+        from_cache=False,
+        request_key=None,
+    ):
+        """Store the outcome of a tide station request, give its result."""
+        credit = data["callCount"] if data is not None and not from_cache else 0
+        return self._store_result(
+            "_tide_station_result",
+            Fetch_Result(
+                data, current_time, credit, error_value, timing, from_cache, request_key
+            ),
+        )
+
+    def _give_catalog_stations(self, parameter):
+        """Give the stations of the catalog (None if area not covered)."""
+        if self._station_catalog is None:
+            return None
+        lat = parameter._lat
+        lon = parameter._lon
+        distance = float(parameter._tide_station_distance)
+        if not self._station_catalog.is_covered(lat, lon, distance):
+            return None
+        return self._station_catalog.give_stations_response(lat, lon, distance)
+
+    def _store_catalog_stations(self, parameter, data):
+        """Add the stations received to the catalog."""
+        if self._station_catalog is not None and data is not None:
+            self._station_catalog.add_stations_response(
+                parameter._lat,
+                parameter._lon,
+                float(parameter._tide_station_distance),
+                data,
+            )
 
     def retrieve_tide_station(self):
         """Retrieve information related tide station only."""
+        return self.fetch_tide_station().is_success()
+
+    def fetch_tide_station(self):
+        """Retrieve information related tide station, give its Fetch_Result."""
+        # one parameter for the whole request : change_ref_point may replace it
+        parameter = self._Server_Parameter
         current_time = time.time()
-        data_has_been_received = False
-        data = None
+        request_key = parameter.give_cache_key("stations")
+        data = self._give_catalog_stations(parameter)
+        if data is not None:
+            return self._set_tide_station_result(
+                current_time, data, None, None, True, request_key
+            )
+        cache_key = self._give_cache_key(parameter, "stations")
+        data = self._give_cached_data(cache_key, "stations")
+        if data is not None:
+            self._store_catalog_stations(parameter, data)
+            return self._set_tide_station_result(
+                current_time, data, None, None, True, request_key
+            )
 
-        resource = (
-            "https://www.worldtides.info/api/{}?stations"
-            "&key={}&lat={}&lon={}&stationDistance={}"
-        ).format(
-            self._Server_Parameter._version,
-            self._Server_Parameter._key,
-            self._Server_Parameter._lat,
-            self._Server_Parameter._lon,
-            self._Server_Parameter._tide_station_distance,
+        resource = self._tide_station_resource(parameter)
+        data, error_value, timing, shared = self._shared_request_json(
+            cache_key, resource
+        )
+        if not shared:
+            self._report_request("stations", data, error_value, timing)
+            self._store_cached_data(cache_key, data)
+        self._store_catalog_stations(parameter, data)
+        return self._set_tide_station_result(
+            current_time, data, error_value, timing, shared, request_key
         )
-        try:
-            data_get = requests.get(resource, timeout=10)
-            if data_get.status_code == 200:
-                data = data_get.json()
-                data_has_been_received = True
-                error_value = None
-            else:
-                error_value = data_get.status_code
-                data_has_been_received = False
-                data = None
-
-        except ValueError as err:
-            error_value = err.args
-            data_has_been_received = False
-            data = None
-
-        # information from server
-        self.last_tide_station_raw_data = data
-        self.last_tide_station_request_time = current_time
-        if data_has_been_received:
-            self.last_tide_station_request_credit = data["callCount"]
-        else:
-            self.last_tide_station_request_credit = 0
-        self.last_tide_station_request_error_value = error_value
-
-        return data_has_been_received
 
     def retrieve_tide_credit(self):
         """Give the last credit used (tide info)."""
-        return self.last_tide_request_credit
+        return self._tide_result.credit
 
     def retrieve_tide_err_value(self):
         """Give the last error (tide info)."""
-        return self.last_tide_request_error_value
+        return self._tide_result.error_value
 
     def retrieve_tide_raw_data(self):
         """Give the last raw data (tide info)."""
-        return self.last_tide_raw_data
+        return self._tide_result.data
 
     def retrieve_tide_request_time(self):
         """Give the last request time (tide info)."""
-        return self.last_tide_request_time
+        return self._tide_result.request_time
+
+    def retrieve_tide_timing(self):
+        """Give the last request timing (tide info)."""
+        return self._tide_result.timing
+
+    # attributes of the previous versions (read only)
+    last_tide_raw_data = property(retrieve_tide_raw_data)
+    last_tide_request_time = property(retrieve_tide_request_time)
+    # name set by __init__ of the previous versions
+    last_tide_raw_data_request_time = property(retrieve_tide_request_time)
+    last_tide_request_credit = property(retrieve_tide_credit)
+    last_tide_request_error_value = property(retrieve_tide_err_value)
+    last_tide_request_timing = property(retrieve_tide_timing)
+
+    def _tide_height_resource(self, parameter, datum_flag, start=None, length=None):
+        """Give the URL to retrieve tide information (from start if given).
+
+        From start, only heights/extremes are requested : the plot and the
+        datums of the data held stay.
+        """
+        sections = list(parameter._tide_sections)
+        if datum_flag and TIDE_SECTION_DATUMS not in sections:
+            sections.append(TIDE_SECTION_DATUMS)
+        if start is not None:
+            sections = [
+                section
+                for section in sections
+                if section in (TIDE_SECTION_EXTREMES, TIDE_SECTION_HEIGHTS)
+            ]
+
+        if start is None:
+            # prediction + 1 day --> to manage midnight
+            tide_prediction_total_duration = parameter._tide_prediction_duration + 1
+            period_string = "days={}&date=today".format(tide_prediction_total_duration)
+        else:
+            period_string = "start={}&length={}".format(int(start), int(length))
+
+        # 3 days --> to manage one day beyond midnight and one before midnight
+        return (
+            "{}/api/{}?{}&{}&timemode=24&step={}"
+            "&key={}&lat={}&lon={}&datum={}&stationDistance={}&color={}&background={}&units={}"
+        ).format(
+            self._server_url,
+            parameter._version,
+            "&".join(sections),
+            period_string,
+            parameter._tide_step,
+            parameter._key,
+            parameter._lat,
+            parameter._lon,
+            parameter._vertical_ref,
+            parameter._tide_station_distance,
+            parameter._plot_color,
+            parameter._plot_background,
+            parameter._unit_curve_picture,
+        )
+
+    def _set_tide_result(
+        self,
+        current_time,
+        data,
+        error_value,
+        timing,
+        from_cache=False,
+        request_key=None,
+    ):
+        """Store the outcome of a tide request, give its result."""
+        credit = data["callCount"] if data is not None and not from_cache else 0
+        return self._store_result(
+            "_tide_result",
+            Fetch_Result(
+                data, current_time, credit, error_value, timing, from_cache, request_key
+            ),
+        )
 
     def retrieve_tide_height_over_one_day(self, datum_flag):
         """Retrieve information related to tide."""
-        current_time = time.time()
-        data_has_been_received = False
-        data = None
+        return self.fetch_tide_height_over_one_day(datum_flag).is_success()
 
-        datums_string = ""
-        if datum_flag:
-            datums_string = "&datums"
+    def fetch_tide_height_over_one_day(self, datum_flag):
+        """Retrieve information related to tide, give its Fetch_Result."""
+        return self._fetch_tide_height(self._Server_Parameter, datum_flag)
+
+    def _fetch_tide_height(self, parameter, datum_flag):
+        """Retrieve information related to tide with parameter."""
+        current_time = time.time()
+        request_key = parameter.give_cache_key("tide", datum_flag)
+        cache_key = self._give_cache_key(parameter, "tide", datum_flag)
+        data = self._give_cached_data(cache_key, "tide")
+        if data is not None:
+            return self._set_tide_result(
+                current_time, data, None, None, True, request_key
+            )
 
-        # prediction + 1 day --> to manage midnight
-        tide_prediction_total_duration = (
-            self._Server_Parameter._tide_prediction_duration + 1
+        resource = self._tide_height_resource(parameter, datum_flag)
+        data, error_value, timing, shared = self._shared_request_json(
+            cache_key, resource, self._streaming_decode
+        )
+        if not shared:
+            self._report_request("tide", data, error_value, timing)
+            self._store_cached_data(cache_key, data)
+        return self._set_tide_result(
+            current_time, data, error_value, timing, shared, request_key
         )
 
-        # 3 days --> to manage one day beyond midnight and one before midnight
-        resource = (
-            "https://www.worldtides.info/api/{}?extremes&days={}&date=today&heights&plot&timemode=24&step=900"
-            "&key={}&lat={}&lon={}&datum={}&stationDistance={}&color={}&background={}&units={}{}"
-        ).format(
-            self._Server_Parameter._version,
-            tide_prediction_total_duration,
-            self._Server_Parameter._key,
-            self._Server_Parameter._lat,
-            self._Server_Parameter._lon,
-            self._Server_Parameter._vertical_ref,
-            self._Server_Parameter._tide_station_distance,
-            self._Server_Parameter._plot_color,
-            self._Server_Parameter._plot_background,
-            self._Server_Parameter._unit_curve_picture,
-            datums_string,
+    def retrieve_tide_height_incremental(
+        self, datum_flag, retention_duration=TIDE_RETENTION_DURATION
+    ):
+        """Retrieve only the tide information not already held.
+
+        The new heights/extremes are merged into the last raw data and the
+        ones older than retention_duration are dropped. The data held are
+        requested again in full if requested with another parameter or
+        datum_flag. Only the full requests use the response cache.
+        """
+        return self.fetch_tide_height_incremental(
+            datum_flag, retention_duration
+        ).is_success()
+
+    def fetch_tide_height_incremental(
+        self, datum_flag, retention_duration=TIDE_RETENTION_DURATION
+    ):
+        """Retrieve only the tide information not already held, give its result.
+
+        On error, the result holds the data already held and the error.
+        """
+        with self._incremental_lock:
+            return self._fetch_tide_height_incremental(datum_flag, retention_duration)
+
+    def _fetch_tide_height_incremental(self, datum_flag, retention_duration):
+        """Retrieve and merge the tide information not already held."""
+        parameter = self._Server_Parameter
+        current_time = time.time()
+        request = self._give_incremental_request(parameter, datum_flag, current_time)
+        if request is None:
+            return self._fetch_tide_height(parameter, datum_flag)
+        if isinstance(request, Fetch_Result):
+            return request
+        resource, flight_key, request_key, previous_data = request
+        data, error_value, timing, shared = self._shared_request_json(
+            flight_key, resource, self._streaming_decode
+        )
+        return self._set_incremental_result(
+            current_time,
+            data,
+            error_value,
+            timing,
+            shared,
+            request_key,
+            previous_data,
+            retention_duration,
         )
-        try:
-            data_get = requests.get(resource, timeout=10)
-            if data_get.status_code == 200:
-                data = data_get.json()
-                data_has_been_received = True
-                error_value = None
-            else:
-                error_value = data_get.status_code
-                data_has_been_received = False
-                data = None
 
-        except ValueError as err:
-            data = None
-            data_has_been_received = False
-            error_value = err.args
-        # information from server
-        self.last_tide_raw_data = data
-        self.last_tide_request_time = current_time
-        if data_has_been_received:
-            self.last_tide_request_credit = data["callCount"]
-        else:
-            self.last_tide_request_credit = 0
-        self.last_tide_request_error_value = error_value
-
-        return data_has_been_received
-
-
-class give_info_from_raw_data:
-    """Give a set of function to decode retrieved data."""
-
-    def __init__(self, data):
-        """Set data."""
-        self._data = data
-
-    def give_tide_in_epoch(self, current_epoch_time, next_tide_flag):
-        """Give Tide info from X seconds from epoch."""
-        if self._data is None:
-            return {"error": "no data"}
-
-        current_time = int(current_epoch_time)
-        next_tide = 0
-        for tide_index in range(len(self._data["extremes"])):
-            if self._data["extremes"][tide_index]["dt"] < current_time:
-                next_tide = tide_index
-        if next_tide_flag:
-            if self._data["extremes"][next_tide]["dt"] < current_time:
-                next_tide = next_tide + 1
-        if next_tide >= len(self._data["extremes"]):
-            return {"error": "no date in future"}
-        if next_tide_flag is False:
-            if self._data["extremes"][next_tide]["dt"] > current_time:
-                return {"error": "no date in past"}
-
-        tide_time = self._data["extremes"][next_tide]["dt"]
-
-        tide_type = "None"
-        if "High" in str(self._data["extremes"][next_tide]["type"]):
-            tide_type = "High"
-        elif "Low" in str(self._data["extremes"][next_tide]["type"]):
-            tide_type = "Low"
-        else:
-            tide_type = "None"
-
-        return {"tide_type": tide_type, "tide_time": tide_time}
-
-    def give_next_tide_in_epoch(self, current_epoch_time):
-        """Give Next Tide info from X seconds from epoch."""
-        next_tide_flag = True
-        return self.give_tide_in_epoch(current_epoch_time, next_tide_flag)
-
-    def give_previous_tide_in_epoch(self, current_epoch_time):
-        """Give Previous Tide info from X seconds from epoch."""
-        next_tide_flag = False
-        return self.give_tide_in_epoch(current_epoch_time, next_tide_flag)
-
-    def give_vertical_ref(self):
-        """Give Vertical Ref (LAT,...)."""
-        if self._data is None:
-            return {"error": "no data"}
-        elif "responseDatum" in self._data:
-            return {"vertical_ref": self._data["responseDatum"]}
-        else:
-            return {"error": "no vertical ref"}
-
-    def give_tidal_station_used(self):
-        """Give Tidal Station."""
-        if self._data is None:
-            return {"error": "no data"}
-        elif "station" in self._data:
-            return {"station": self._data["station"]}
-        else:
-            return {"error": "no reference station used"}
-
-    def give_high_low_tide_in_UTC(self, current_epoch_time, next_tide_flag):
-        """Give High/Low Tide info from X seconds from epoch."""
-        if self._data is None:
-            return {"error": "no data"}
-
-        current_time = int(current_epoch_time)
-
-        # Next tide
-        next_tide = 0
-        for tide_index in range(len(self._data["extremes"])):
-            if self._data["extremes"][tide_index]["dt"] < current_time:
-                next_tide = tide_index
-
-        # Managed the case where next_tide has not been updated : if next_tide=0 perform a check
-        if next_tide_flag:
-            if self._data["extremes"][next_tide]["dt"] < current_time:
-                next_tide = next_tide + 1
-
-        if next_tide >= len(self._data["extremes"]):
-            return {"error": "no date in future"}
-
-        # As we are looking also for next one
-        if (next_tide + 1) >= len(self._data["extremes"]):
-            return {"error": "no date in future for next one"}
-
-        if not next_tide_flag:
-            if self._data["extremes"][next_tide]["dt"] > current_time:
-                return {"error": "no date in past"}
-
-        if "High" in str(self._data["extremes"][next_tide]["type"]):
-            high_tide_time_utc = self._data["extremes"][next_tide]["date"]
-            high_tide_time_epoch = self._data["extremes"][next_tide]["dt"]
-            high_tide_height = self._data["extremes"][next_tide]["height"]
-
-            low_tide_time_utc = self._data["extremes"][next_tide + 1]["date"]
-            low_tide_time_epoch = self._data["extremes"][next_tide + 1]["dt"]
-            low_tide_height = self._data["extremes"][next_tide + 1]["height"]
-
-        elif "Low" in str(self._data["extremes"][next_tide]["type"]):
-            high_tide_time_utc = self._data["extremes"][next_tide + 1]["date"]
-            high_tide_time_epoch = self._data["extremes"][next_tide + 1]["dt"]
-            high_tide_height = self._data["extremes"][next_tide + 1]["height"]
-
-            low_tide_time_utc = self._data["extremes"][next_tide]["date"]
-            low_tide_time_epoch = self._data["extremes"][next_tide]["dt"]
-            low_tide_height = self._data["extremes"][next_tide]["height"]
-
-        return {
-            "high_tide_time_utc": high_tide_time_utc,
-            "high_tide_time_epoch": high_tide_time_epoch,
-            "high_tide_height": high_tide_height,
-            "low_tide_time_utc": low_tide_time_utc,
-            "low_tide_time_epoch": low_tide_time_epoch,
-            "low_tide_height": low_tide_height,
-        }
-
-    def give_tide_extrema_within_time_frame(self, epoch_frame_min, epoch_frame_max):
-        """Retrieve data extrema from frame_min to frame_max."""
-        if self._data is None:
-            return {"error": "no data"}
-
-        extrema_value = []
-        extrema_time = []
-        extrema_type = []
-        for extrema_index in range(len(self._data["extremes"])):
-            extrema_current_value = self._data["extremes"][extrema_index]["height"]
-            extrema_current_time = self._data["extremes"][extrema_index]["dt"]
-            extrema_current_type = self._data["extremes"][extrema_index]["type"]
-            # retrieve height and time
-            if (extrema_current_time > epoch_frame_min) and (
-                extrema_current_time < epoch_frame_max
-            ):
-                extrema_value.append(extrema_current_value)
-                extrema_time.append(extrema_current_time)
-                extrema_type.append(extrema_current_type)
-        return {
-            "extrema_value": extrema_value,
-            "extrema_epoch": extrema_time,
-            "extrema_type": extrema_type,
-        }
-
-    def give_next_high_low_tide_in_UTC(self, current_epoch_time):
-        """Give Next High/Low Tide info from X seconds from epoch."""
-        next_tide_flag = True
-        return self.give_high_low_tide_in_UTC(current_epoch_time, next_tide_flag)
-
-    def give_current_high_low_tide_in_UTC(self, current_epoch_time):
-        """Give Previous High/Low Tide info from X seconds from epoch."""
-        next_tide_flag = False
-        return self.give_high_low_tide_in_UTC(current_epoch_time, next_tide_flag)
-
-    def give_current_height_in_UTC(self, current_epoch_time):
-        """Give current height at X seconds from epoch."""
-        current_time = int(current_epoch_time)
-
-        if self._data is None:
-            return {"error": "no data"}
-
-        # The height
-        current_height_index = 0
-        for height_index in range(len(self._data["heights"])):
-            if self._data["heights"][height_index]["dt"] < current_time:
-                current_height_index = height_index
-        current_height = self._data["heights"][current_height_index]["height"]
-        current_height_utc = self._data["heights"][current_height_index]["date"]
-        current_height_epoch = self._data["heights"][current_height_index]["dt"]
-
-        return {
-            "current_height": current_height,
-            "current_height_utc": current_height_utc,
-            "current_height_epoch": current_height_epoch,
-        }
-
-    def give_tide_prediction_within_time_frame(self, epoch_frame_min, epoch_frame_max):
-        """Retrieve data from frame_min to frame_max."""
-        if self._data is None:
-            return {"error": "no data"}
-
-        height_value = []
-        height_time = []
-        for height_index in range(len(self._data["heights"])):
-            height_current_value = self._data["heights"][height_index]["height"]
-            height_current_time = self._data["heights"][height_index]["dt"]
-            # retrieve height and time
-            if (height_current_time > epoch_frame_min) and (
-                height_current_time < epoch_frame_max
-            ):
-                height_value.append(height_current_value)
-                height_time.append(height_current_time)
-        return {
-            "height_value": height_value,
-            "height_epoch": height_time,
-        }
-
-    def give_station_list_info(self):
-        """Give Tide Station List."""
-        if self._data is None:
+    def _give_incremental_request(self, parameter, datum_flag, current_time):
+        """Give resource, flight key, request key and data held of the request.
+
+        Give None if a full request is needed, or the Fetch_Result stored
+        if all the days are already held.
+        """
+        request_key = parameter.give_cache_key("tide", datum_flag)
+        previous_result = self._tide_result
+        previous_data = previous_result.data
+        horizon = give_data_horizon(previous_data)
+        if (
+            horizon is None
+            or horizon < current_time
+            or previous_result.request_key != request_key
+        ):
+            # nothing held for this parameter : full request
             return None
-        return self._data["stations"]
-
-    def give_used_station_info(self):
-        """Give used tidal station info."""
-        if self._data is None:
-            return {"error": "no_data"}
-
-        if len(self._data["stations"]) > 0:
-            return {
-                "tide_station_used_name": self._data["stations"][0]["name"],
-                "tide_station_lat": self._data["stations"][0]["lat"],
-                "tide_station_long": self._data["stations"][0]["lon"],
-            }
-        return {"error": "used station not found"}
-
-    def give_used_station_info_from_name(self, station_name):
-        """Give used tidal station info."""
-        if station_name is None:
-            return {"error": "no_station_name"}
-
-        if self._data is None:
-            return {"error": "no_data"}
-
-        tide_station_index = 0
-        tide_station_index_found = False
-
-        if len(self._data["stations"]) > 0:
-            for name_index in range(len(self._data["stations"])):
-                if self._data["stations"][name_index]["name"] == station_name:
-                    tide_station_index = name_index
-                    tide_station_index_found = True
-        if tide_station_index_found is True:
-            return {
-                "tide_station_used_name": self._data["stations"][tide_station_index][
-                    "name"
-                ],
-                "tide_station_lat": self._data["stations"][tide_station_index]["lat"],
-                "tide_station_long": self._data["stations"][tide_station_index]["lon"],
-                "tide_station_timezone": self._data["stations"][tide_station_index][
-                    "timezone"
-                ],
-            }
-        return {"error": "used station detailed not found"}
-
-    def give_station_around_info(self):
-        """Give tidal station around info."""
-        if self._data is None:
-            return {"error": "no_data"}
-
-        station_around_nb = len(self._data["stations"])
-        station_around_name = ""
-        if len(self._data["stations"]) > 0:
-            station_around_name = ""
-            for name_index in range(len(self._data["stations"])):
-                station_around_name = (
-                    station_around_name
-                    + "; "
-                    + self._data["stations"][name_index]["name"]
-                )
-        else:
-            station_around_name = "None"
-
-        return {
-            "station_around_nb": station_around_nb,
-            "station_around_name": station_around_name,
-        }
-
-    def give_nearest_station_time_zone(self):
-        """Give the nearest tide station time zone."""
-        if self._data is None:
-            return {"error": "no_data"}
-        if len(self._data["stations"]) > 0:
-            return {"time_zone": self._data["stations"][0]["timezone"]}
-        else:
-            return {"error": "no station around"}
-
-    def give_datum(self):
-        """Give the datum ie different height LAT/CD/MSL/... ."""
-        if self._data is None:
-            return {"error": "no data"}
-        elif "datums" in self._data:
-            return {"datums": self._data["datums"]}
-        else:
-            return {"error": "no_datums"}
-
-    def give_plot_picture_without_header(self):
-        """Give picture in base 64 without the format header."""
-        if self._data is None:
-            return {"error": "no data"}
-        elif "plot" in self._data:
-            std_string = "data:image/png;base64,"
-            str_to_convert = self._data["plot"][
-                len(std_string) : len(self._data["plot"])
-            ]
-            return {"image": str_to_convert}
-        else:
-            return {"error": "no_image"}
-
-
-class give_info_from_raw_datums_data:
-    """Decode datum information."""
-
-    def __init__(self, datums_data):
-        """Set data."""
-        self._datums_data = datums_data
-
-    def give_mean_water_spring_datums_offset(self):
-        """Retrieve MWS mean water spring height ."""
-        if self._datums_data is None:
-            return {"error": "no data"}
-        MHW_index = 0
-        MLW_index = 0
-        for ref_index in range(len(self._datums_data)):
-            if self._datums_data[ref_index]["name"] == "MHWS":
-                MHW_index = ref_index
-            if self._datums_data[ref_index]["name"] == "MLWS":
-                MLW_index = ref_index
-        datum_offset_MHWS = self._datums_data[MHW_index]["height"]
-        datum_offset_MLWS = self._datums_data[MLW_index]["height"]
-
-        return {
-            "datum_offset_MHWS": datum_offset_MHWS,
-            "datum_offset_MLWS": datum_offset_MLWS,
-        }
-
-
-class give_info_from_raw_data_N_and_N_1:
-    """Give a set of function to decode info from current or previous data."""
-
-    def __init__(self, data, previous_data):
-        """Set the flip flop data."""
-        self._info = give_info_from_raw_data(data)
-        self._previous_info = give_info_from_raw_data(previous_data)
-
-    def give_current_height_in_UTC(self, current_epoch_time):
-        """Give current height tide in current or previous data ."""
-        result = self._info.give_current_height_in_UTC(current_epoch_time)
-        if result.get("error") is None:
-            return result
-        else:
-            previous_result = self._previous_info.give_current_height_in_UTC(
-                current_epoch_time
+
+        prediction_duration = TIDE_DAY_DURATION * parameter._tide_prediction_duration
+        if horizon >= current_time + prediction_duration:
+            # all the days are already held
+            return self._set_tide_result(
+                current_time, previous_data, None, None, True, request_key
             )
-            return previous_result
 
-    def give_high_low_tide_in_UTC(self, current_epoch_time, next_tide_flag):
-        """Give high low tide in current or previous data ."""
-        result = self._info.give_high_low_tide_in_UTC(
-            current_epoch_time, next_tide_flag
+        # fill up to prediction + 1 day, as a full request does (one credit
+        # per request : avoid many small requests), the sample at horizon is
+        # requested again to get a continuous seam
+        wanted_horizon = current_time + prediction_duration + TIDE_DAY_DURATION
+        tide_step = parameter._tide_step
+        length = math.ceil((wanted_horizon - horizon) / tide_step) * tide_step
+        resource = self._tide_height_resource(parameter, datum_flag, horizon, length)
+        flight_key = self._give_cache_key(
+            parameter, "tide", datum_flag, horizon, length
         )
-        if result.get("error") is None:
-            return result
-        else:
-            previous_result = self._previous_info.give_high_low_tide_in_UTC(
-                current_epoch_time, next_tide_flag
-            )
-            return previous_result
-
-    def give_next_high_low_tide_in_UTC(self, current_epoch_time):
-        """Give next high low tide in current or previous data ."""
-        next_tide_flag = True
-        return self.give_high_low_tide_in_UTC(current_epoch_time, next_tide_flag)
-
-    def give_current_high_low_tide_in_UTC(self, current_epoch_time):
-        """Give previous high low tide in current or previous data ."""
-        next_tide_flag = False
-        return self.give_high_low_tide_in_UTC(current_epoch_time, next_tide_flag)
-
-    def give_tide_in_epoch(self, current_epoch_time, next_tide_flag):
-        """Give tide in current or previous data ."""
-        result = self._info.give_tide_in_epoch(current_epoch_time, next_tide_flag)
-        if result.get("error") is None:
-            return result
-        else:
-            previous_result = self._previous_info.give_tide_in_epoch(
-                current_epoch_time, next_tide_flag
+        return resource, flight_key, request_key, previous_data
+
+    def _set_incremental_result(
+        self,
+        current_time,
+        data,
+        error_value,
+        timing,
+        shared,
+        request_key,
+        previous_data,
+        retention_duration,
+    ):
+        """Merge the data received into the data held, give the result."""
+        if not shared:
+            self._report_request("tide_incremental", data, error_value, timing)
+        if data is None:
+            # the data already held stay available
+            return self._set_tide_result(
+                current_time, previous_data, error_value, timing, True, request_key
             )
-            return previous_result
-
-    def give_next_tide_in_epoch(self, current_epoch_time):
-        """Give next tide in current or previous data ."""
-        next_tide_flag = True
-        return self.give_tide_in_epoch(current_epoch_time, next_tide_flag)
-
-    def give_previous_tide_in_epoch(self, current_epoch_time):
-        """Give previous tide in current or previous data ."""
-        next_tide_flag = False
-        return self.give_tide_in_epoch(current_epoch_time, next_tide_flag)
-
-    def give_vertical_ref(self):
-        """Give vertical ref in current or previous data ."""
-        result = self._info.give_vertical_ref()
-        if result.get("error") is None:
-            return result
-        else:
-            previous_result = self._previous_info.give_vertical_ref()
-            return previous_result
-
-    def give_tidal_station_used(self):
-        """Give tidal station used in current or previous data ."""
-        result = self._info.give_tidal_station_used()
-        if result.get("error") is None:
-            return result
-        else:
-            previous_result = self._previous_info.give_tidal_station_used()
-            return previous_result
-
-    def give_nearest_station_time_zone(self):
-        """Give tidal station time zone in current or previous data ."""
-        result = self._info.give_nearest_station_time_zone()
-        if result.get("error") is None:
-            return result
-        else:
-            previous_result = self._previous_info.give_nearest_station_time_zone()
-            return previous_result
-
-    def give_datum(self):
-        """Give tidal datum in current or previous data ."""
-        result = self._info.give_datum()
-        if result.get("error") is None:
-            return result
-        else:
-            previous_result = self._previous_info.give_datum()
-            return previous_result
-
-    def give_plot_picture_without_header(self):
-        """Give plot picture in current or previous data ."""
-        result = self._info.give_plot_picture_without_header()
-        if result.get("error") is None:
-            return result
-        else:
-            previous_result = self._previous_info.give_plot_picture_without_header()
-            return previous_result
+
+        # plot/datums not requested : the ones held are kept
+        merged_data = merge_tide_raw_data(
+            data, previous_data, current_time - retention_duration
+        )
+        if self._streaming_decode:
+            merged_data = Compact_Tide_Data.from_raw_data(merged_data)
+        return self._set_tide_result(
+            current_time, merged_data, error_value, timing, shared, request_key
+        )
@@ -0,0 +1,117 @@
+"""Share one in-flight request between identical concurrent requests."""
+# Python library
+import asyncio
+import logging
+import threading
+
+_LOGGER = logging.getLogger(__name__)
+
+# Component library
+_shared_single_flight = None
+_shared_single_flight_lock = threading.Lock()
+
+
+class _Flight_Call:
+    """Outcome of an in-flight call."""
+
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        """Initialize the call."""
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Single_Flight:
+    """Run a function once per key among concurrent threads."""
+
+    def __init__(self):
+        """Initialize the calls in flight."""
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, function):
+        """Give function() result and if it was shared from another caller.
+
+        The first caller of a key runs the function, the callers arriving
+        while it runs wait and receive the same result (or exception).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Flight_Call()
+                self._calls[key] = call
+
+        if not leader:
+            _LOGGER.debug("Join the request in flight %s", key)
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = function()
+        except BaseException as err:
+            call.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result, False
+
+    def in_flight_count(self):
+        """Give the number of calls in flight."""
+        with self._lock:
+            return len(self._calls)
+
+
+class Async_Single_Flight:
+    """Run a coroutine once per key among concurrent tasks (one loop)."""
+
+    def __init__(self):
+        """Initialize the calls in flight."""
+        self._calls = {}
+
+    async def do(self, key, coroutine_function):
+        """Give coroutine_function() result and if it was shared.
+
+        A task cancelled while waiting does not cancel the call in flight.
+        """
+        future = self._calls.get(key)
+        if future is not None:
+            _LOGGER.debug("Join the request in flight %s", key)
+            return await asyncio.shield(future), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await coroutine_function()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as err:
+            future.set_exception(err)
+            # no traceback logged when nobody joined
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            del self._calls[key]
+        return result, False
+
+    def in_flight_count(self):
+        """Give the number of calls in flight."""
+        return len(self._calls)
+
+
+def give_shared_single_flight():
+    """Give the Single_Flight shared by the servers of the process."""
+    global _shared_single_flight
+    with _shared_single_flight_lock:
+        if _shared_single_flight is None:
+            _shared_single_flight = Single_Flight()
+        return _shared_single_flight
@@ -0,0 +1,300 @@
+"""Local stand-in of the World Tides Info server (load tests, record/replay).
+
+Run : python -m pyworldtidesinfo.worldtidesinfo_standin --port 8080
+"""
+# Python library
+import argparse
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from urllib.error import HTTPError, URLError
+from urllib.parse import parse_qs, urlsplit
+from urllib.request import urlopen
+
+from ._synthetic_response import (
+    SYNTHETIC_PLOT_SIZE,
+    give_synthetic_stations,
+    give_synthetic_tide_response,
+)
+from .worldtidesinfo_cache import atomic_write
+from .worldtidesinfo_server import SERVER_URL, TIDE_DAY_DURATION
+
+_LOGGER = logging.getLogger(__name__)
+
+# Component library
+# synthetic responses
+STANDIN_MODE_SYNTHETIC = "synthetic"
+# forward to the upstream server and store the responses
+STANDIN_MODE_RECORD = "record"
+# serve the stored responses only
+STANDIN_MODE_REPLAY = "replay"
+STANDIN_MODE_LIST = [STANDIN_MODE_SYNTHETIC, STANDIN_MODE_RECORD, STANDIN_MODE_REPLAY]
+STANDIN_ERROR_STATUS = 503
+STANDIN_UPSTREAM_TIMEOUT = 30
+# query parameters not part of the record key (credentials)
+_RECORD_IGNORED_PARAMETERS = ("key",)
+
+
+def give_record_key(path, query):
+    """Give the record file name of a request (key parameter left out)."""
+    parameters = [
+        parameter
+        for parameter in query.split("&")
+        if parameter.split("=", 1)[0] not in _RECORD_IGNORED_PARAMETERS
+    ]
+    request_text = path + "?" + "&".join(sorted(parameters))
+    return hashlib.sha256(request_text.encode("utf-8")).hexdigest() + ".json"
+
+
+def _give_float_parameter(parameters, name, default):
+    """Give a float query parameter (default if missing or invalid)."""
+    try:
+        return float(parameters[name][0])
+    except (KeyError, IndexError, ValueError):
+        return default
+
+
+def give_synthetic_body(query, plot_size=SYNTHETIC_PLOT_SIZE, current_time=None):
+    """Give the synthetic response of a query string."""
+    parameters = parse_qs(query, keep_blank_values=True)
+    lat = _give_float_parameter(parameters, "lat", 0.0)
+    lon = _give_float_parameter(parameters, "lon", 0.0)
+    if "stations" in parameters:
+        return {
+            "status": 200,
+            "callCount": 1,
+            "requestLat": lat,
+            "requestLon": lon,
+            "stations": give_synthetic_stations(lat, lon),
+        }
+
+    if current_time is None:
+        current_time = time.time()
+    if "start" in parameters:
+        start_epoch = int(_give_float_parameter(parameters, "start", current_time))
+        days = _give_float_parameter(parameters, "length", TIDE_DAY_DURATION) / (
+            TIDE_DAY_DURATION
+        )
+    else:
+        # date=today : from UTC midnight
+        start_epoch = int(current_time // TIDE_DAY_DURATION * TIDE_DAY_DURATION)
+        days = _give_float_parameter(parameters, "days", 1)
+    response = give_synthetic_tide_response(
+        days=days,
+        step=max(int(_give_float_parameter(parameters, "step", 1800)), 1),
+        start_epoch=start_epoch,
+        heights="heights" in parameters,
+        extremes="extremes" in parameters,
+        plot="plot" in parameters,
+        datums="datums" in parameters,
+        lat=lat,
+        lon=lon,
+        plot_size=plot_size,
+    )
+    datum = parameters.get("datum", [""])[0]
+    if datum:
+        response["requestDatum"] = datum
+        response["responseDatum"] = datum
+    return response
+
+
+class Stand_In_Server:
+    """Serve World Tides Info like responses on a local port."""
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        latency=0.0,
+        latency_jitter=0.0,
+        error_rate=0.0,
+        error_status=STANDIN_ERROR_STATUS,
+        plot_size=SYNTHETIC_PLOT_SIZE,
+        mode=STANDIN_MODE_SYNTHETIC,
+        directory=None,
+        upstream_url=SERVER_URL,
+        seed=None,
+    ):
+        """Initialize the parameters (latency in seconds, error_rate 0..1)."""
+        if mode not in STANDIN_MODE_LIST:
+            raise ValueError("unknown mode : {}".format(mode))
+        if mode != STANDIN_MODE_SYNTHETIC and directory is None:
+            raise ValueError("a directory is needed to record/replay")
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.plot_size = plot_size
+        self.mode = mode
+        self.directory = directory
+        self.upstream_url = upstream_url.rstrip("/")
+        self._random = random.Random(seed)  # nosec
+        self._lock = threading.Lock()
+        self.request_count = 0
+        self.error_count = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        self._httpd = ThreadingHTTPServer((host, port), self._give_handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    def give_url(self):
+        """Give the base URL to use as server_url of the clients."""
+        host, port = self._httpd.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    def start(self):
+        """Serve in a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Serve in the current thread."""
+        self._httpd.serve_forever()
+
+    def stop(self):
+        """Stop serving and close the port."""
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self):
+        """Start serving."""
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        """Stop serving."""
+        self.stop()
+
+    def _draw_request(self):
+        """Count the request, give its latency and if it fails."""
+        with self._lock:
+            self.request_count += 1
+            latency = self.latency
+            if self.latency_jitter:
+                latency += self._random.uniform(0, self.latency_jitter)
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.error_count += 1
+        return latency, failed
+
+    def give_response(self, path, query):
+        """Give status and body of a request."""
+        latency, failed = self._draw_request()
+        if latency > 0:
+            time.sleep(latency)
+        if failed:
+            return self.error_status, _give_json_body(
+                {"status": self.error_status, "error": "stand-in error"}
+            )
+
+        if self.mode == STANDIN_MODE_SYNTHETIC:
+            return 200, _give_json_body(
+                give_synthetic_body(query, plot_size=self.plot_size)
+            )
+
+        record_path = os.path.join(self.directory, give_record_key(path, query))
+        if self.mode == STANDIN_MODE_REPLAY:
+            try:
+                with open(record_path, "rb") as record_file:
+                    return 200, record_file.read()
+            except OSError:
+                return 404, _give_json_body({"status": 404, "error": "not recorded"})
+
+        upstream_resource = self.upstream_url + path + "?" + query
+        try:
+            with urlopen(  # nosec
+                upstream_resource, timeout=STANDIN_UPSTREAM_TIMEOUT
+            ) as upstream_response:
+                body = upstream_response.read()
+        except HTTPError as err:
+            return err.code, err.read()
+        except (URLError, OSError) as err:
+            _LOGGER.error("Upstream request failed : %s", err)
+            return 502, _give_json_body({"status": 502, "error": str(err)})
+        atomic_write(record_path, body)
+        return 200, body
+
+    def _give_handler_class(self):
+        """Give the request handler bound to this server."""
+        stand_in_server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            """Answer the GET requests (keep-alive)."""
+
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                """Send the response."""
+                split_url = urlsplit(self.path)
+                status, body = stand_in_server.give_response(
+                    split_url.path, split_url.query
+                )
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                """Log with the module logger."""
+                _LOGGER.debug(format, *args)
+
+        return _Handler
+
+
+def _give_json_body(data):
+    """Give the JSON bytes of data."""
+    return json.dumps(data).encode("utf-8")
+
+
+def main():
+    """Define the main function."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="0..1")
+    parser.add_argument("--error-status", type=int, default=STANDIN_ERROR_STATUS)
+    parser.add_argument("--plot-size", type=int, default=SYNTHETIC_PLOT_SIZE)
+    parser.add_argument(
+        "--mode", choices=STANDIN_MODE_LIST, default=STANDIN_MODE_SYNTHETIC
+    )
+    parser.add_argument("--directory", help="record/replay directory")
+    parser.add_argument("--upstream", default=SERVER_URL, help="record upstream URL")
+    args = parser.parse_args()
+
+    stand_in_server = Stand_In_Server(
+        args.host,
+        args.port,
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        plot_size=args.plot_size,
+        mode=args.mode,
+        directory=args.directory,
+        upstream_url=args.upstream,
+    )
+    print("serving on {}".format(stand_in_server.give_url()))
+    try:
+        stand_in_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stand_in_server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,424 @@
+"""HTTP transports of the server requests : standard library, requests, httpx.
+
+The HTTP libraries (http.client too) are imported only when a transport is
+created : the import of the package stays fast.
+"""
+# Python library
+import json
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+import zlib
+
+_LOGGER = logging.getLogger(__name__)
+
+# Component library
+TRANSPORT_STDLIB = "stdlib"
+TRANSPORT_REQUESTS = "requests"
+TRANSPORT_HTTPX = "httpx"
+TRANSPORT_LIST = [TRANSPORT_STDLIB, TRANSPORT_REQUESTS, TRANSPORT_HTTPX]
+# number of kept-alive connections per host
+TRANSPORT_POOL_SIZE = 10
+TRANSPORT_HEADERS = {"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"}
+
+
+class Transport_Error(Exception):
+    """Request failed (connection, timeout, protocol)."""
+
+
+class Transport_Response:
+    """Response of a transport (requests like subset)."""
+
+    status_code = None
+    # seconds from sending the request to the headers received
+    elapsed_time = None
+
+    @property
+    def content(self):
+        """Give the whole body (decompressed)."""
+        return b"".join(self.iter_content())
+
+    def iter_content(self, chunk_size=None):
+        """Give the body by chunks (decompressed)."""
+        raise NotImplementedError
+
+    def json(self):
+        """Give the JSON body."""
+        return json.loads(self.content)
+
+    def close(self):
+        """Release the connection."""
+
+
+class Transport:
+    """Send GET requests with kept-alive connections."""
+
+    def get(self, resource, timeout, stream=False):
+        """Give the Transport_Response of resource (headers received).
+
+        timeout is (connect, read) seconds ; raise Transport_Error on failure.
+        """
+        raise NotImplementedError
+
+    def give_connection_count(self, resource):
+        """Give the connections opened so far for resource (None : unknown)."""
+        return None
+
+    def close(self):
+        """Close the kept-alive connections."""
+
+
+class _Stdlib_Response(Transport_Response):
+    """Response of a http.client connection."""
+
+    def __init__(self, transport, origin, connection, response, elapsed_time):
+        """Set the response."""
+        self._transport = transport
+        self._origin = origin
+        self._connection = connection
+        self._response = response
+        self._content = None
+        self.status_code = response.status
+        self.elapsed_time = elapsed_time
+        encoding = response.getheader("Content-Encoding", "").lower()
+        self._decompressor = None
+        if encoding in ("gzip", "deflate"):
+            # gzip or zlib header detected
+            self._decompressor = zlib.decompressobj(zlib.MAX_WBITS | 32)
+
+    @property
+    def content(self):
+        """Give the whole body (decompressed)."""
+        if self._content is None:
+            self._content = super().content
+        return self._content
+
+    def iter_content(self, chunk_size=None):
+        """Give the body by chunks (decompressed), then release the connection."""
+        if self._content is not None:
+            yield self._content
+            return
+        import http.client
+
+        try:
+            while True:
+                chunk = self._response.read(chunk_size) if chunk_size else None
+                if chunk is None:
+                    chunk = self._response.read()
+                    last_chunk = True
+                else:
+                    last_chunk = not chunk
+                if self._decompressor is not None:
+                    chunk = self._decompressor.decompress(chunk)
+                    if last_chunk:
+                        chunk += self._decompressor.flush()
+                if chunk:
+                    yield chunk
+                if last_chunk:
+                    break
+        except (OSError, http.client.HTTPException, zlib.error) as err:
+            self._connection.close()
+            raise Transport_Error(err) from err
+        self.close()
+
+    def close(self):
+        """Give back the connection (closed if the body was not read)."""
+        if self._connection is None:
+            return
+        connection = self._connection
+        self._connection = None
+        if self._response.isclosed() and not self._response.will_close:
+            self._transport._release(self._origin, connection)
+        else:
+            connection.close()
+
+
+class Stdlib_Transport(Transport):
+    """Transport of the standard library (http.client), no dependency."""
+
+    def __init__(self, pool_size=TRANSPORT_POOL_SIZE):
+        """Initialize the pools of idle connections."""
+        import http.client
+
+        self._http_client = http.client
+        # a kept-alive connection closed by the server fails on reuse with these
+        self._stale_connection_errors = (
+            http.client.RemoteDisconnected,
+            ConnectionResetError,
+            BrokenPipeError,
+        )
+        self._pool_size = pool_size
+        self._lock = threading.Lock()
+        # (scheme, host, port) : idle connections
+        self._idle = {}
+        self._connection_count = 0
+        self._ssl_context = None
+
+    def _give_connection(self, origin, connect_timeout):
+        """Give an idle connection of origin or a new one, and if reused."""
+        with self._lock:
+            idle_connections = self._idle.get(origin)
+            if idle_connections:
+                return idle_connections.pop(), True
+            self._connection_count += 1
+        scheme, host, port = origin
+        if scheme == "https":
+            if self._ssl_context is None:
+                import ssl
+
+                self._ssl_context = ssl.create_default_context()
+            connection = self._http_client.HTTPSConnection(
+                host, port, timeout=connect_timeout, context=self._ssl_context
+            )
+        else:
+            connection = self._http_client.HTTPConnection(
+                host, port, timeout=connect_timeout
+            )
+        return connection, False
+
+    def _release(self, origin, connection):
+        """Keep a connection alive (closed if the pool is full)."""
+        with self._lock:
+            idle_connections = self._idle.setdefault(origin, [])
+            if len(idle_connections) < self._pool_size:
+                idle_connections.append(connection)
+                return
+        connection.close()
+
+    def get(self, resource, timeout, stream=False):
+        """Give the Transport_Response of resource (headers received)."""
+        split_url = urlsplit(resource)
+        if split_url.scheme not in ("http", "https"):
+            raise Transport_Error("unsupported URL : {}".format(resource))
+        origin = (split_url.scheme, split_url.hostname, split_url.port)
+        path = split_url.path or "/"
+        if split_url.query:
+            path += "?" + split_url.query
+        if isinstance(timeout, tuple):
+            connect_timeout, read_timeout = timeout
+        else:
+            connect_timeout = read_timeout = timeout
+
+        while True:
+            connection, reused = self._give_connection(origin, connect_timeout)
+            start_time = time.perf_counter()
+            try:
+                if connection.sock is None:
+                    connection.connect()
+                connection.sock.settimeout(read_timeout)
+                connection.request("GET", path, headers=TRANSPORT_HEADERS)
+                response = connection.getresponse()
+            except self._stale_connection_errors as err:
+                connection.close()
+                if reused:
+                    # closed by the server while idle : retry on another one
+                    continue
+                raise Transport_Error(err) from err
+            except (OSError, self._http_client.HTTPException) as err:
+                connection.close()
+                raise Transport_Error(err) from err
+            return _Stdlib_Response(
+                self, origin, connection, response, time.perf_counter() - start_time
+            )
+
+    def give_connection_count(self, resource):
+        """Give the connections opened so far."""
+        with self._lock:
+            return self._connection_count
+
+    def close(self):
+        """Close the kept-alive connections."""
+        with self._lock:
+            idle_connections = [
+                connection
+                for connections in self._idle.values()
+                for connection in connections
+            ]
+            self._idle = {}
+        for connection in idle_connections:
+            connection.close()
+
+
+class _Requests_Response(Transport_Response):
+    """Response of a requests session."""
+
+    def __init__(self, response, error_types):
+        """Set the response."""
+        self._response = response
+        self._error_types = error_types
+        self.status_code = response.status_code
+        self.elapsed_time = response.elapsed.total_seconds()
+
+    @property
+    def content(self):
+        """Give the whole body (decompressed)."""
+        try:
+            return self._response.content
+        except self._error_types as err:
+            raise Transport_Error(*err.args) from err
+
+    def iter_content(self, chunk_size=None):
+        """Give the body by chunks (decompressed)."""
+        try:
+            yield from self._response.iter_content(chunk_size)
+        except self._error_types as err:
+            raise Transport_Error(*err.args) from err
+
+    def json(self):
+        """Give the JSON body."""
+        return self._response.json()
+
+    def close(self):
+        """Release the connection."""
+        close = getattr(self._response, "close", None)
+        if close is not None:
+            close()
+
+
+class Requests_Transport(Transport):
+    """Transport of a requests session (pip install requests)."""
+
+    def __init__(self, pool_size=TRANSPORT_POOL_SIZE, session=None):
+        """Create a pooled session, or use session (requests like)."""
+        try:
+            import requests
+        except ImportError:
+            if session is None:
+                raise ImportError(
+                    "requests is required for this transport: pip install pyworldtidesinfo[requests]"
+                ) from None
+            requests = None
+        self._error_types = ()
+        if requests is not None:
+            self._error_types = (requests.exceptions.RequestException,)
+        if session is None:
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update(TRANSPORT_HEADERS)
+        self.session = session
+
+    def get(self, resource, timeout, stream=False):
+        """Give the Transport_Response of resource (headers received)."""
+        try:
+            response = self.session.get(resource, timeout=timeout, stream=stream)
+        except self._error_types as err:
+            raise Transport_Error(*err.args) from err
+        return _Requests_Response(response, self._error_types)
+
+    def give_connection_count(self, resource):
+        """Give the connections opened so far by the adapter of resource.
+
+        Best effort : other threads sharing the session may open connections too.
+        """
+        try:
+            pools = self.session.get_adapter(resource).poolmanager.pools
+            return sum(pools[pool_key].num_connections for pool_key in pools.keys())
+        except (AttributeError, KeyError, ValueError):
+            return None
+
+    def close(self):
+        """Close the kept-alive connections."""
+        close = getattr(self.session, "close", None)
+        if close is not None:
+            close()
+
+
+class _Httpx_Response(Transport_Response):
+    """Response of a httpx client."""
+
+    def __init__(self, response, elapsed_time, error_types):
+        """Set the response."""
+        self._response = response
+        self._error_types = error_types
+        self.status_code = response.status_code
+        self.elapsed_time = elapsed_time
+
+    @property
+    def content(self):
+        """Give the whole body (decompressed)."""
+        try:
+            return self._response.read()
+        except self._error_types as err:
+            raise Transport_Error(err) from err
+
+    def iter_content(self, chunk_size=None):
+        """Give the body by chunks (decompressed)."""
+        try:
+            yield from self._response.iter_bytes(chunk_size)
+        except self._error_types as err:
+            raise Transport_Error(err) from err
+
+    def close(self):
+        """Release the connection."""
+        self._response.close()
+
+
+class Httpx_Transport(Transport):
+    """Transport of a httpx client (pip install httpx)."""
+
+    def __init__(self, pool_size=TRANSPORT_POOL_SIZE):
+        """Create a pooled client."""
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError(
+                "httpx is required for this transport: pip install pyworldtidesinfo[httpx]"
+            ) from None
+        self._httpx = httpx
+        self._error_types = (httpx.HTTPError, httpx.InvalidURL)
+        self.client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=pool_size, max_keepalive_connections=pool_size
+            ),
+            headers=TRANSPORT_HEADERS,
+        )
+
+    def get(self, resource, timeout, stream=False):
+        """Give the Transport_Response of resource (headers received)."""
+        if isinstance(timeout, tuple):
+            connect_timeout, read_timeout = timeout
+        else:
+            connect_timeout = read_timeout = timeout
+        start_time = time.perf_counter()
+        try:
+            request = self.client.build_request(
+                "GET",
+                resource,
+                timeout=self._httpx.Timeout(read_timeout, connect=connect_timeout),
+            )
+            response = self.client.send(request, stream=True)
+        except self._error_types as err:
+            raise Transport_Error(err) from err
+        return _Httpx_Response(
+            response, time.perf_counter() - start_time, self._error_types
+        )
+
+    def close(self):
+        """Close the kept-alive connections."""
+        self.client.close()
+
+
+TRANSPORT_BACKENDS = {
+    TRANSPORT_STDLIB: Stdlib_Transport,
+    TRANSPORT_REQUESTS: Requests_Transport,
+    TRANSPORT_HTTPX: Httpx_Transport,
+}
+
+
+def create_transport(backend=TRANSPORT_STDLIB, pool_size=TRANSPORT_POOL_SIZE):
+    """Create a transport of a backend (TRANSPORT_LIST)."""
+    if backend not in TRANSPORT_BACKENDS:
+        raise ValueError("unknown transport : {}".format(backend))
+    return TRANSPORT_BACKENDS[backend](pool_size)
+
+
+def give_transport(session):
+    """Give the transport of session : itself or a requests like session wrapped."""
+    if isinstance(session, Transport):
+        return session
+    return Requests_Transport(session=session)
@@ -14,9 +14,18 @@ setuptools.setup(
     long_description=long_description,
     url="http://github.com/jugla/pyWorldtidesinfo/",
     packages=setuptools.find_packages(include=["pyworldtidesinfo"]),
-    setup_requires=["requests", "setuptools"],
-    install_requires=["requests"],
+    setup_requires=["setuptools"],
+    install_requires=[],
+    extras_require={
+        "numpy": ["numpy"],
+        "async": ["aiohttp"],
+        "requests": ["requests"],
+        "httpx": ["httpx"],
+    },
     entry_points={
-        "console_scripts": ["pyworldtidesinfo = pyworldtidesinfo.__main__:main"]
+        "console_scripts": [
+            "pyworldtidesinfo = pyworldtidesinfo.__main__:main",
+            "pyworldtidesinfo-daemon = pyworldtidesinfo.worldtidesinfo_daemon:main",
+        ]
     },
 )
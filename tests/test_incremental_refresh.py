@@ -0,0 +1,175 @@
+"""Test the incremental sliding-window refresh."""
+import datetime
+import time
+import unittest
+from urllib.parse import parse_qs, urlparse
+
+from pyworldtidesinfo.tide_timeline import merge_tide_raw_data
+from pyworldtidesinfo.worldtidesinfo_server import (
+    PLOT_CURVE_UNIT_M,
+    TIDE_DAY_DURATION,
+    WorldTidesInfo_server,
+    create_session,
+)
+from pyworldtidesinfo.worldtidesinfo_standin import Stand_In_Server
+
+
+class _Response:
+    """Minimal requests response."""
+
+    def __init__(self, data):
+        """Set the JSON content."""
+        self.status_code = 200
+        self.elapsed = datetime.timedelta(0)
+        self.content = b"{}"
+        self._data = data
+
+    def json(self):
+        """Give the JSON content."""
+        return self._data
+
+
+class _Session:
+    """Session answering heights every 900s over the requested period."""
+
+    def __init__(self):
+        """Record the requests."""
+        self.queries = []
+
+    def get(self, resource, timeout, stream=False):
+        """Answer the request."""
+        query = parse_qs(urlparse(resource).query, keep_blank_values=True)
+        self.queries.append(query)
+        if "start" in query:
+            start = int(query["start"][0])
+            end = start + int(query["length"][0])
+        else:
+            start = int(time.time()) // 900 * 900
+            end = start + int(query["days"][0]) * TIDE_DAY_DURATION
+        heights = [
+            {"dt": epoch, "date": str(epoch), "height": 1.0}
+            for epoch in range(start, end + 1, 900)
+        ]
+        return _Response({"callCount": 1, "heights": heights, "extremes": []})
+
+
+class IncrementalRefreshTestCase(unittest.TestCase):
+    """Class used to test the incremental refresh."""
+
+    def test_merge(self):
+        """Test newer data wins at the seam and retention drops old data."""
+        previous_data = {
+            "station": "A",
+            "heights": [{"dt": 0, "height": 1}, {"dt": 900, "height": 2}],
+        }
+        data = {"heights": [{"dt": 900, "height": 3}, {"dt": 1800, "height": 4}]}
+        merged = merge_tide_raw_data(data, previous_data, retention_epoch=900)
+        self.assertEqual(merged["station"], "A")
+        self.assertEqual(
+            merged["heights"], [{"dt": 900, "height": 3}, {"dt": 1800, "height": 4}]
+        )
+
+    def test_incremental_refresh(self):
+        """Test only the uncovered period is requested."""
+        session = _Session()
+        server = WorldTidesInfo_server(
+            "key",
+            1,
+            2,
+            "LAT",
+            50,
+            1,
+            "2,102,255",
+            "255,255,255",
+            PLOT_CURVE_UNIT_M,
+            session=session,
+        )
+        self.assertTrue(server.retrieve_tide_height_incremental(False))
+        self.assertIn("days", session.queries[-1])
+        first_data = server.retrieve_tide_raw_data()
+
+        # nothing missing : no request
+        self.assertTrue(server.retrieve_tide_height_incremental(False))
+        self.assertEqual(len(session.queries), 1)
+        self.assertEqual(server.retrieve_tide_credit(), 0)
+
+        # horizon below the prediction duration : the missing period is requested
+        first_data["heights"] = [
+            height
+            for height in first_data["heights"]
+            if height["dt"] < time.time() + 20 * 3600
+        ]
+        horizon = first_data["heights"][-1]["dt"]
+        self.assertTrue(server.retrieve_tide_height_incremental(False))
+        self.assertEqual(int(session.queries[-1]["start"][0]), horizon)
+        epochs = [height["dt"] for height in server.retrieve_tide_raw_data()["heights"]]
+        self.assertEqual(len(epochs), len(set(epochs)))
+        self.assertEqual(epochs, sorted(epochs))
+
+    def test_parameter_change(self):
+        """Test the data held for another parameter are requested again."""
+        session = _Session()
+        server = WorldTidesInfo_server(
+            "key",
+            1,
+            2,
+            "LAT",
+            50,
+            1,
+            "2,102,255",
+            "255,255,255",
+            PLOT_CURVE_UNIT_M,
+            session=session,
+        )
+        self.assertTrue(server.retrieve_tide_height_incremental(False))
+        server.change_ref_point(10.0, 20.0)
+        self.assertTrue(server.retrieve_tide_height_incremental(False))
+        self.assertEqual(len(session.queries), 2)
+        self.assertIn("days", session.queries[-1])
+        self.assertEqual(session.queries[-1]["lat"], ["10.0"])
+        self.assertEqual(server.retrieve_tide_credit(), 1)
+
+        # datum flag changed : another request
+        self.assertTrue(server.retrieve_tide_height_incremental(True))
+        self.assertEqual(len(session.queries), 3)
+        self.assertIn("datums", session.queries[-1])
+        self.assertTrue(server.retrieve_tide_height_incremental(True))
+        self.assertEqual(len(session.queries), 3)
+
+    def test_plot_and_datums_kept(self):
+        """Test the plot/datums of the full request stay after a refresh."""
+        with Stand_In_Server(plot_size=100) as stand_in_server:
+            server = WorldTidesInfo_server(
+                "key",
+                48.0,
+                -4.5,
+                "LAT",
+                50,
+                1,
+                "2,102,255",
+                "255,255,255",
+                PLOT_CURVE_UNIT_M,
+                session=create_session(),
+                server_url=stand_in_server.give_url(),
+            )
+            self.assertTrue(server.retrieve_tide_height_incremental(True))
+            full_data = server.retrieve_tide_raw_data()
+            plot = full_data["plot"]
+            datums = full_data["datums"]
+            # keep less than the prediction : the rest is requested
+            limit = time.time() + 3600
+            for section in ("heights", "extremes"):
+                full_data[section] = [
+                    entry for entry in full_data[section] if entry["dt"] < limit
+                ]
+            self.assertTrue(server.retrieve_tide_height_incremental(True))
+            self.assertEqual(stand_in_server.request_count, 2)
+
+        data = server.retrieve_tide_raw_data()
+        self.assertGreater(data["heights"][-1]["dt"], limit + TIDE_DAY_DURATION)
+        self.assertEqual(data["plot"], plot)
+        self.assertEqual(data["datums"], datums)
+
+
+if __name__ == "__main__":
+    unittest.main()
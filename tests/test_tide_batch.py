@@ -0,0 +1,62 @@
+"""Test the vectorized batch queries."""
+import unittest
+
+from pyworldtidesinfo.worldtidesinfo_server import give_info_from_raw_data
+
+try:
+    import numpy as np
+
+    from pyworldtidesinfo.tide_batch import (
+        INTERPOLATION_CUBIC,
+        INTERPOLATION_LINEAR,
+        give_batch_info_from_raw_data,
+    )
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+DATA = {
+    "extremes": [
+        {"dt": 1000, "date": "d1000", "height": 1.0, "type": "Low"},
+        {"dt": 2000, "date": "d2000", "height": 5.0, "type": "High"},
+    ],
+    "heights": [
+        {"dt": 900 + index * 300, "date": f"h{index}", "height": index * 0.5}
+        for index in range(8)
+    ],
+}
+
+
+@unittest.skipIf(np is None, "numpy not installed")
+class TideBatchTestCase(unittest.TestCase):
+    """Class used to test batch queries."""
+
+    def setUp(self):
+        """Build the decoders."""
+        self.batch = give_batch_info_from_raw_data(DATA)
+        self.info = give_info_from_raw_data(DATA)
+
+    def test_step_matches_single_query(self):
+        """Test step-hold gives the same heights as the single query."""
+        epochs = np.arange(500, 3500, 37.5)
+        result = self.batch.give_height_at_epochs(epochs)
+        expected = [
+            self.info.give_current_height_in_UTC(epoch)["current_height"]
+            for epoch in epochs
+        ]
+        self.assertEqual(result["height_value"].tolist(), expected)
+
+    def test_interpolation(self):
+        """Test linear and cubic interpolation on a linear curve."""
+        for interpolation in (INTERPOLATION_LINEAR, INTERPOLATION_CUBIC):
+            result = self.batch.give_height_at_epochs([1050, 1500], interpolation)
+            np.testing.assert_allclose(result["height_value"], [0.25, 1.0])
+
+    def test_extreme_index(self):
+        """Test previous/next extreme index."""
+        result = self.batch.give_height_at_epochs([500, 1000, 1500, 2500])
+        self.assertEqual(result["previous_extreme_index"].tolist(), [-1, -1, 0, 1])
+        self.assertEqual(result["next_extreme_index"].tolist(), [0, 0, 1, -1])
+
+
+if __name__ == "__main__":
+    unittest.main()
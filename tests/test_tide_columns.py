@@ -0,0 +1,50 @@
+"""Test the compact columnar storage."""
+import unittest
+
+from pyworldtidesinfo._synthetic_response import give_synthetic_tide_response
+from pyworldtidesinfo.tide_columns import Compact_Tide_Data
+from pyworldtidesinfo.worldtidesinfo_server import give_info_from_raw_data
+
+
+class CompactTideDataTestCase(unittest.TestCase):
+    """Class used to test compact data give the same answers."""
+
+    def setUp(self):
+        """Build raw and compact decoders."""
+        self.data = give_synthetic_tide_response(days=2, plot=False)
+        self.compact_data = Compact_Tide_Data.from_raw_data(self.data)
+        self.info = give_info_from_raw_data(self.data)
+        self.compact_info = give_info_from_raw_data(self.compact_data)
+
+    def test_mapping(self):
+        """Test the compact data reads as the raw data."""
+        self.assertEqual(self.compact_data.to_raw_data(), self.data)
+        self.assertIn("heights", self.compact_data)
+        self.assertEqual(self.compact_data["station"], self.data["station"])
+
+    def test_same_answers(self):
+        """Test the queries give the same answers."""
+        start_epoch = self.data["heights"][0]["dt"]
+        for epoch in range(start_epoch, start_epoch + 2 * 86400, 3037):
+            for method in (
+                "give_next_tide_in_epoch",
+                "give_previous_tide_in_epoch",
+                "give_next_high_low_tide_in_UTC",
+                "give_current_high_low_tide_in_UTC",
+                "give_current_height_in_UTC",
+            ):
+                self.assertEqual(
+                    getattr(self.compact_info, method)(epoch),
+                    getattr(self.info, method)(epoch),
+                )
+            self.assertEqual(
+                self.compact_info.give_tide_extrema_within_time_frame(
+                    epoch, epoch + 86400
+                ),
+                self.info.give_tide_extrema_within_time_frame(epoch, epoch + 86400),
+            )
+        self.assertEqual(self.compact_info.give_datum(), self.info.give_datum())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+"""Test the datum/unit conversion and the parameter diff."""
+from array import array
+import unittest
+
+from pyworldtidesinfo._synthetic_response import give_synthetic_tide_response
+from pyworldtidesinfo.tide_columns import Compact_Tide_Data
+from pyworldtidesinfo.tide_conversion import (
+    HEIGHT_UNIT_KEY,
+    convert_heights,
+    convert_raw_data,
+    give_datum_offset,
+    give_unit_factor,
+)
+from pyworldtidesinfo.worldtidesinfo_server import (
+    PLOT_CURVE_UNIT_FT,
+    PLOT_CURVE_UNIT_M,
+    TIDE_SECTION_EXTREMES,
+    TIDE_SECTION_HEIGHTS,
+    Server_Parameter,
+    give_info_from_raw_data,
+)
+
+
+def _give_parameter(**fields):
+    """Give a Server_Parameter with some fields changed."""
+    arguments = {
+        "key": "key",
+        "lat": 48.0,
+        "lon": -4.5,
+        "vertical_ref": "LAT",
+        "tide_station_distance": 50,
+        "tide_prediction_duration": 2,
+        "plot_color": "2,102,255",
+        "plot_background": "255,255,255",
+        "unit_curve_picture": PLOT_CURVE_UNIT_M,
+    }
+    arguments.update(fields)
+    return Server_Parameter(**arguments)
+
+
+class TideConversionTestCase(unittest.TestCase):
+    """Class used to test the conversion."""
+
+    def test_offsets(self):
+        """Test datum offset and unit factor."""
+        datums = [{"name": "LAT", "height": 0.0}, {"name": "MSL", "height": 3.0}]
+        self.assertEqual(give_datum_offset(datums, "LAT", "MSL"), -3.0)
+        self.assertEqual(give_datum_offset(None, "LAT", "LAT"), 0.0)
+        with self.assertRaises(ValueError):
+            give_datum_offset(datums, "LAT", "CD")
+        self.assertAlmostEqual(
+            give_unit_factor(PLOT_CURVE_UNIT_M, PLOT_CURVE_UNIT_FT), 3.28084, places=5
+        )
+        self.assertEqual(convert_heights(array("d", [1.0]), 1.0, 2.0), array("d", [4]))
+        self.assertEqual(convert_heights([1.0, 2.0], -1.0), [0.0, 1.0])
+
+    def test_convert_raw_data(self):
+        """Test the whole series are converted (dict and compact data)."""
+        data = give_synthetic_tide_response(days=1, plot=False)
+        for source in (data, Compact_Tide_Data.from_raw_data(data)):
+            converted = convert_raw_data(source, "MSL", PLOT_CURVE_UNIT_FT)
+            self.assertEqual(converted["responseDatum"], "MSL")
+            self.assertEqual(converted[HEIGHT_UNIT_KEY], PLOT_CURVE_UNIT_FT)
+            for entry, converted_entry in zip(data["heights"], converted["heights"]):
+                self.assertAlmostEqual(
+                    converted_entry["height"], (entry["height"] - 3.0) / 0.3048
+                )
+            info = give_info_from_raw_data(converted)
+            epoch = data["extremes"][0]["dt"]
+            self.assertEqual(
+                info.give_next_tide_in_epoch(epoch),
+                give_info_from_raw_data(data).give_next_tide_in_epoch(epoch),
+            )
+            # back to the original
+            original = convert_raw_data(converted, "LAT", PLOT_CURVE_UNIT_M)
+            self.assertAlmostEqual(
+                original["extremes"][0]["height"], data["extremes"][0]["height"]
+            )
+        self.assertEqual(data["responseDatum"], "LAT")
+
+    def test_parameter_diff(self):
+        """Test the changes applied locally or needing a request."""
+        data = give_synthetic_tide_response(days=1, plot=False)
+        parameter = _give_parameter()
+        diff = parameter.give_parameter_diff(
+            _give_parameter(
+                key="other",
+                vertical_ref="MSL",
+                tide_prediction_duration=1,
+                unit_curve_picture=PLOT_CURVE_UNIT_FT,
+                lat=47.0,
+            ),
+            data,
+        )
+        self.assertEqual(
+            sorted(diff["local"]), ["key", "tide_prediction_duration", "vertical_ref"]
+        )
+        self.assertEqual(sorted(diff["request"]), ["lat", "unit_curve_picture"])
+
+        # without plot, the plot parameters do not matter
+        no_plot = (TIDE_SECTION_EXTREMES, TIDE_SECTION_HEIGHTS)
+        diff = parameter.give_parameter_diff(
+            _give_parameter(
+                tide_sections=no_plot,
+                unit_curve_picture=PLOT_CURVE_UNIT_FT,
+                vertical_ref="MSL",
+            )
+        )
+        self.assertEqual(sorted(diff["local"]), ["tide_sections", "unit_curve_picture"])
+        # no datums held
+        self.assertEqual(list(diff["request"]), ["vertical_ref"])
+        self.assertEqual(
+            parameter.give_parameter_diff(_give_parameter()),
+            {"local": {}, "request": {}},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+"""Test the offline harmonic prediction."""
+import unittest
+
+from pyworldtidesinfo._synthetic_response import (
+    give_synthetic_height,
+    give_synthetic_tide_response,
+)
+from pyworldtidesinfo.tide_columns import Compact_Tide_Data
+from pyworldtidesinfo.tide_harmonic import Harmonic_Tide_Model, select_constituents
+from pyworldtidesinfo.worldtidesinfo_server import give_info_from_raw_data
+
+
+class TideHarmonicTestCase(unittest.TestCase):
+    """Class used to test the harmonic model."""
+
+    def test_select_constituents(self):
+        """Test the Rayleigh criterion."""
+        one_day = [name for name, _ in select_constituents(86400)]
+        self.assertIn("M2", one_day)
+        self.assertNotIn("S2", one_day)
+        one_month = [name for name, _ in select_constituents(30 * 86400)]
+        self.assertIn("S2", one_month)
+        self.assertIn("O1", one_month)
+
+    def test_prediction(self):
+        """Test the prediction after the fitted period."""
+        data = give_synthetic_tide_response(days=30, plot=False)
+        model = Harmonic_Tide_Model.fit(Compact_Tide_Data.from_raw_data(data))
+        fit_info = model.give_fit_info()
+        self.assertLess(fit_info["rms_residual"], 0.01)
+        fit_end = fit_info["fit_end"]
+        for epoch in range(fit_end, fit_end + 3 * 86400, 3600):
+            self.assertAlmostEqual(
+                model.predict_height(epoch), give_synthetic_height(epoch), places=1
+            )
+
+    def test_error_estimate(self):
+        """Test the error estimate grows after the fitted period."""
+        data = give_synthetic_tide_response(days=2, plot=False)
+        model = Harmonic_Tide_Model.fit(data)
+        fit_end = model.give_fit_info()["fit_end"]
+        self.assertGreater(model.give_fit_info()["rms_residual"], 0)
+        self.assertLess(
+            model.give_error_estimate(fit_end),
+            model.give_error_estimate(fit_end + 86400),
+        )
+        self.assertFalse(model.need_refresh(fit_end, 1.0))
+        self.assertTrue(model.need_refresh(fit_end + 100 * 86400, 1.0))
+
+    def test_raw_data(self):
+        """Test the predicted data through give_info_from_raw_data."""
+        data = give_synthetic_tide_response(days=30, plot=False)
+        model = Harmonic_Tide_Model.fit(data)
+        start = model.give_fit_info()["fit_end"]
+        info = give_info_from_raw_data(model.give_raw_data(start, start + 86400))
+        next_tide = info.give_next_tide_in_epoch(start)
+        self.assertIn(next_tide["tide_type"], ("High", "Low"))
+        self.assertGreaterEqual(next_tide["tide_time"], start)
+        reference = give_info_from_raw_data(
+            give_synthetic_tide_response(
+                days=1, start_epoch=start, heights=False, plot=False
+            )
+        ).give_next_tide_in_epoch(start)
+        self.assertEqual(next_tide["tide_type"], reference["tide_type"])
+        self.assertLess(abs(next_tide["tide_time"] - reference["tide_time"]), 600)
+        self.assertIn("current_height", info.give_current_height_in_UTC(start + 3600))
+
+    def test_not_enough_heights(self):
+        """Test the fit without heights."""
+        with self.assertRaises(ValueError):
+            Harmonic_Tide_Model.fit({"extremes": []})
+
+
+if __name__ == "__main__":
+    unittest.main()
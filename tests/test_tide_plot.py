@@ -0,0 +1,59 @@
+"""Test the local tide curve renderer."""
+import base64
+import struct
+import unittest
+import zlib
+
+from pyworldtidesinfo._synthetic_response import give_synthetic_tide_response
+from pyworldtidesinfo.worldtidesinfo_server import give_info_from_raw_data
+
+
+def _decode_png(picture):
+    """Give width, height and RGB rows of a PNG made by the renderer."""
+    assert picture[:8] == b"\x89PNG\r\n\x1a\n"
+    width, height = struct.unpack(">II", picture[16:24])
+    position = 8
+    content = b""
+    while position < len(picture):
+        (length,) = struct.unpack(">I", picture[position : position + 4])
+        chunk_type = picture[position + 4 : position + 8]
+        if chunk_type == b"IDAT":
+            content += picture[position + 8 : position + 8 + length]
+        position += 12 + length
+    raw_picture = zlib.decompress(content)
+    row_size = 1 + 3 * width
+    rows = [
+        raw_picture[row * row_size + 1 : (row + 1) * row_size] for row in range(height)
+    ]
+    return width, height, rows
+
+
+class TidePlotTestCase(unittest.TestCase):
+    """Class used to test the renderer."""
+
+    def test_render(self):
+        """Test size and colors of the picture."""
+        info = give_info_from_raw_data(give_synthetic_tide_response(days=1, plot=False))
+        result = info.give_plot_picture_rendered(
+            "10,20,30", "250,250,250", width=100, height=50
+        )
+        width, height, rows = _decode_png(base64.b64decode(result["image"]))
+        self.assertEqual((width, height), (100, 50))
+        # bottom row is under the curve, top row is background
+        self.assertEqual(rows[-1][:3], bytes([10, 20, 30]))
+        self.assertEqual(rows[0][150:153], bytes([250, 250, 250]))
+
+    def test_no_heights(self):
+        """Test the errors."""
+        self.assertEqual(
+            give_info_from_raw_data({}).give_plot_picture_rendered(),
+            {"error": "no heights"},
+        )
+        self.assertIn(
+            "error",
+            give_info_from_raw_data({"heights": []}).give_plot_picture_rendered(),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+"""Test the memory-mapped snapshot of tide data."""
+import os
+import tempfile
+import unittest
+
+from pyworldtidesinfo._synthetic_response import (
+    SYNTHETIC_START_EPOCH,
+    give_synthetic_stations,
+    give_synthetic_tide_response,
+)
+from pyworldtidesinfo.tide_columns import Compact_Tide_Data
+from pyworldtidesinfo.tide_decoder import give_info_from_raw_data
+from pyworldtidesinfo.tide_snapshot import (
+    SNAPSHOT_MAGIC,
+    Tide_Snapshot,
+    give_snapshot_content,
+    write_snapshot,
+)
+
+
+class TideSnapshotTestCase(unittest.TestCase):
+    """Class used to test the snapshot."""
+
+    def setUp(self):
+        """Create the snapshot directory."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "tide.snapshot")
+
+    def tearDown(self):
+        """Remove the snapshot directory."""
+        self.directory.cleanup()
+
+    def test_same_answers(self):
+        """Test the answers from the snapshot are the ones from raw data."""
+        data = give_synthetic_tide_response(days=3, datums=True)
+        stations = {"status": 200, "stations": give_synthetic_stations(48.0, -4.5)}
+        write_snapshot(
+            self.path,
+            {
+                "raw": data,
+                "compact": Compact_Tide_Data.from_raw_data(data),
+                "stations": stations,
+            },
+        )
+        with Tide_Snapshot(self.path) as snapshot:
+            self.assertEqual(
+                sorted(snapshot.give_names()), ["compact", "raw", "stations"]
+            )
+            expected_info = give_info_from_raw_data(data)
+            for name in ("raw", "compact"):
+                info = snapshot.give_info(name)
+                for epoch in range(
+                    SYNTHETIC_START_EPOCH, SYNTHETIC_START_EPOCH + 2 * 86400, 5000
+                ):
+                    self.assertEqual(
+                        info.give_next_tide_in_epoch(epoch),
+                        expected_info.give_next_tide_in_epoch(epoch),
+                    )
+                    self.assertEqual(
+                        info.give_current_height_in_UTC(epoch),
+                        expected_info.give_current_height_in_UTC(epoch),
+                    )
+                self.assertEqual(
+                    info.give_tide_extrema_within_time_frame(
+                        SYNTHETIC_START_EPOCH, SYNTHETIC_START_EPOCH + 86400
+                    ),
+                    expected_info.give_tide_extrema_within_time_frame(
+                        SYNTHETIC_START_EPOCH, SYNTHETIC_START_EPOCH + 86400
+                    ),
+                )
+                self.assertEqual(info.give_datum(), expected_info.give_datum())
+                self.assertNotIn("plot", snapshot.give_data(name))
+            # columns read in place
+            self.assertIsInstance(snapshot.give_data("raw").heights_epoch, memoryview)
+            station_info = snapshot.give_info("stations").give_used_station_info()
+            self.assertEqual(
+                station_info["tide_station_used_name"], stations["stations"][0]["name"]
+            )
+            self.assertIsNone(snapshot.give_data("stations").heights_epoch)
+            with self.assertRaises(KeyError):
+                snapshot.give_data("missing")
+
+    def test_atomic_update(self):
+        """Test a reader maps the new snapshot, old data stay valid."""
+        write_snapshot(self.path, {"a": give_synthetic_tide_response(days=1)})
+        snapshot = Tide_Snapshot(self.path)
+        old_data = snapshot.give_data("a")
+        self.assertFalse(snapshot.reload_if_changed())
+
+        write_snapshot(
+            self.path,
+            {
+                "a": give_synthetic_tide_response(days=2),
+                "b": give_synthetic_tide_response(days=1),
+            },
+        )
+        self.assertTrue(snapshot.reload_if_changed())
+        self.assertEqual(sorted(snapshot.give_names()), ["a", "b"])
+        self.assertGreater(
+            len(snapshot.give_data("a").heights_epoch), len(old_data.heights_epoch)
+        )
+        self.assertEqual(old_data.heights_epoch[0], SYNTHETIC_START_EPOCH)
+        snapshot.close()
+
+    def test_invalid(self):
+        """Test a file that is not a snapshot."""
+        content = give_snapshot_content({})
+        self.assertTrue(content.startswith(SNAPSHOT_MAGIC))
+        with open(self.path, "wb") as snapshot_file:
+            snapshot_file.write(b"x" * len(content))
+        with self.assertRaises(ValueError):
+            Tide_Snapshot(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+"""Test the tide station catalog."""
+import os
+import random
+import tempfile
+import unittest
+
+from pyworldtidesinfo.tide_station_catalog import Station_Catalog, give_distance_km
+from pyworldtidesinfo.worldtidesinfo_server import (
+    PLOT_CURVE_UNIT_M,
+    WorldTidesInfo_server,
+    create_session,
+    give_info_from_raw_data,
+)
+from pyworldtidesinfo.worldtidesinfo_standin import Stand_In_Server
+
+
+def _give_stations(number, seed=0):
+    """Give stations spread over the earth."""
+    generator = random.Random(seed)
+    return [
+        {
+            "id": "station:{}".format(index),
+            "name": "Station {}".format(index),
+            "lat": generator.uniform(-80, 80),
+            "lon": generator.uniform(-180, 180),
+            "timezone": "UTC",
+        }
+        for index in range(number)
+    ]
+
+
+class StationCatalogTestCase(unittest.TestCase):
+    """Class used to test the catalog."""
+
+    def test_queries(self):
+        """Test the grid index against a linear scan."""
+        stations = _give_stations(500)
+        catalog = Station_Catalog(cell_size=2.0)
+        catalog.add_stations_response(0, 0, 20000, {"stations": stations})
+        generator = random.Random(1)
+        for _ in range(50):
+            lat = generator.uniform(-89, 89)
+            lon = generator.uniform(-180, 180)
+            distance = generator.choice([50, 500, 3000])
+            expected = sorted(
+                (give_distance_km(lat, lon, s["lat"], s["lon"]), s["id"])
+                for s in stations
+            )
+            self.assertEqual(
+                [s["id"] for s in catalog.give_stations_within(lat, lon, distance)],
+                [station_id for d, station_id in expected if d <= distance],
+            )
+            self.assertEqual(
+                catalog.give_nearest_station(lat, lon)["id"], expected[0][1]
+            )
+        self.assertEqual(len(catalog.give_stations_by_name("Station 3")), 1)
+
+    def test_coverage_and_persistence(self):
+        """Test the areas covered and the saved catalog."""
+        path = os.path.join(tempfile.mkdtemp(), "catalog.json")
+        catalog = Station_Catalog(path)
+        catalog.add_stations_response(48.0, -4.5, 50, {"stations": _give_stations(3)})
+        self.assertTrue(catalog.is_covered(48.0, -4.5, 50))
+        self.assertTrue(catalog.is_covered(48.1, -4.5, 20))
+        self.assertFalse(catalog.is_covered(48.1, -4.5, 50))
+        catalog.save()
+
+        loaded_catalog = Station_Catalog(path)
+        self.assertEqual(loaded_catalog.give_station_count(), 3)
+        self.assertTrue(loaded_catalog.is_covered(48.1, -4.5, 20))
+
+    def test_coverage_without_duplicate(self):
+        """Test an area already covered is not added again."""
+        catalog = Station_Catalog()
+        response = {"stations": _give_stations(3)}
+        for _ in range(10):
+            catalog.add_stations_response(48.0, -4.5, 50, response)
+        catalog.add_stations_response(48.1, -4.5, 20, response)
+        self.assertEqual(catalog.give_coverage(), [(48.0, -4.5, 50)])
+        # a larger area replaces the ones it contains
+        catalog.add_stations_response(48.0, -4.5, 100, response)
+        catalog.add_stations_response(10.0, 20.0, 10, response)
+        self.assertEqual(catalog.give_coverage(), [(48.0, -4.5, 100), (10.0, 20.0, 10)])
+
+    def test_server(self):
+        """Test a covered area needs no request."""
+        catalog = Station_Catalog()
+        with Stand_In_Server() as stand_in_server:
+            servers = [
+                WorldTidesInfo_server(
+                    "key",
+                    lat,
+                    -4.5,
+                    "LAT",
+                    distance,
+                    1,
+                    "2,102,255",
+                    "255,255,255",
+                    PLOT_CURVE_UNIT_M,
+                    session=create_session(),
+                    server_url=stand_in_server.give_url(),
+                    station_catalog=catalog,
+                )
+                for lat, distance in ((48.0, 50), (48.05, 20))
+            ]
+            self.assertTrue(servers[0].retrieve_tide_station())
+            received_stations = servers[0].retrieve_tide_station_raw_data()["stations"]
+            server = servers[1]
+            self.assertTrue(server.retrieve_tide_station())
+            self.assertEqual(stand_in_server.request_count, 1)
+            self.assertEqual(server.retrieve_tide_station_credit(), 0)
+
+        data = server.retrieve_tide_station_raw_data()
+        self.assertLessEqual(len(data["stations"]), len(received_stations))
+        self.assertTrue(data["stations"])
+        info = give_info_from_raw_data(data)
+        name = data["stations"][0]["name"]
+        self.assertEqual(
+            info.give_used_station_info_from_name(name)["tide_station_used_name"],
+            name,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
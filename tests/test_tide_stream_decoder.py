@@ -0,0 +1,95 @@
+"""Test the streaming decode of tide responses."""
+import json
+import unittest
+
+from pyworldtidesinfo._synthetic_response import give_synthetic_tide_response
+from pyworldtidesinfo.tide_stream_decoder import decode_tide_stream
+
+
+def _give_chunks(body, chunk_size):
+    """Split body in chunks."""
+    return [
+        body[index : index + chunk_size] for index in range(0, len(body), chunk_size)
+    ]
+
+
+class TideStreamDecoderTestCase(unittest.TestCase):
+    """Class used to test the streaming decode."""
+
+    def test_chunk_sizes(self):
+        """Test any chunk split gives the raw data."""
+        data = give_synthetic_tide_response(days=1, stations=True)
+        body = json.dumps(data, indent=1).encode()
+        for chunk_size in (1, 7, 4096, len(body)):
+            compact_data = decode_tide_stream(_give_chunks(body, chunk_size))
+            self.assertEqual(compact_data.to_raw_data(), data)
+
+    def test_raw_plot(self):
+        """Test the plot is kept raw and decoded on access."""
+        body = b'{"callCount": 12, "plot": "data:image\\/png;base64,AB\\\\\\"C", "heights": []}'
+        for chunk_size in (1, 3, len(body)):
+            compact_data = decode_tide_stream(_give_chunks(body, chunk_size))
+            self.assertEqual(compact_data["callCount"], 12)
+            self.assertEqual(
+                compact_data.give_raw_field("plot"),
+                b'data:image\\/png;base64,AB\\\\\\"C',
+            )
+            self.assertEqual(compact_data["plot"], 'data:image/png;base64,AB\\"C')
+            self.assertEqual(compact_data["heights"], [])
+
+    def test_nested_fields(self):
+        """Test objects/arrays with quotes, escapes and brackets in strings."""
+        data = {
+            "stations": [
+                {"name": 'Le "Conquet" [a]{b}\\', "lat": 48.3, "tags": [[], {}]},
+                {"name": '\u00e9\\"}', "lon": -4.7},
+            ],
+            "copyright": "(c) x",
+            "heights": [{"dt": 1, "date": "d", "height": 1.0}],
+        }
+        body = json.dumps(data).encode()
+        for chunk_size in (1, 2, 5, len(body)):
+            compact_data = decode_tide_stream(_give_chunks(body, chunk_size))
+            self.assertEqual(compact_data["stations"], data["stations"])
+            self.assertEqual(compact_data["copyright"], "(c) x")
+
+    def test_large_field_decoded_once(self):
+        """Test a large object/array field is decoded once complete."""
+        data = {"stations": [{"id": index} for index in range(20000)]}
+        body = json.dumps(data).encode()
+        decode_count = 0
+        raw_decode = json.JSONDecoder.raw_decode
+
+        def counting_raw_decode(decoder, *args, **kwargs):
+            nonlocal decode_count
+            decode_count += 1
+            return raw_decode(decoder, *args, **kwargs)
+
+        json.JSONDecoder.raw_decode = counting_raw_decode
+        try:
+            compact_data = decode_tide_stream(_give_chunks(body, 1000))
+        finally:
+            json.JSONDecoder.raw_decode = raw_decode
+        self.assertEqual(compact_data["stations"], data["stations"])
+        # the key only, not one attempt per chunk
+        self.assertLess(decode_count, 5)
+
+    def test_incomplete(self):
+        """Test an incomplete body is an error."""
+        with self.assertRaises(ValueError):
+            decode_tide_stream([b'{"callCount": 1, "heights": [{"dt": 1'])
+
+    def test_invalid_element(self):
+        """Test an element without dt/height is an error."""
+        for body in (
+            b'{"heights": [{"date": "d", "height": 1.0}]}',
+            b'{"extremes": [{"dt": 1, "type": "High"}]}',
+            b'{"heights": [1, 2]}',
+        ):
+            for chunk_size in (1, len(body)):
+                with self.assertRaises(ValueError):
+                    decode_tide_stream(_give_chunks(body, chunk_size))
+
+
+if __name__ == "__main__":
+    unittest.main()
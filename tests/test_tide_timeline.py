@@ -0,0 +1,187 @@
+"""Test the compiled tide timeline."""
+import unittest
+from unittest import mock
+
+from pyworldtidesinfo.tide_columns import Compact_Tide_Data
+from pyworldtidesinfo.tide_timeline import give_data_horizon
+from pyworldtidesinfo.worldtidesinfo_server import (
+    give_info_from_raw_data,
+    give_info_from_raw_data_N_and_N_1,
+)
+
+DATA = {
+    "extremes": [
+        {"dt": 1000, "date": "d1000", "height": 1.0, "type": "Low"},
+        {"dt": 2000, "date": "d2000", "height": 5.0, "type": "High"},
+        {"dt": 3000, "date": "d3000", "height": 1.5, "type": "Low"},
+    ],
+    "heights": [
+        {"dt": 900 + index * 300, "date": f"h{index}", "height": index * 0.5}
+        for index in range(8)
+    ],
+}
+
+
+class TideTimelineTestCase(unittest.TestCase):
+    """Class used to test the timeline queries."""
+
+    def setUp(self):
+        """Build the decoder."""
+        self.info = give_info_from_raw_data(DATA)
+
+    def test_next_and_previous_tide(self):
+        """Test next/previous tide lookup."""
+        self.assertEqual(
+            self.info.give_next_tide_in_epoch(1500),
+            {"tide_type": "High", "tide_time": 2000},
+        )
+        self.assertEqual(
+            self.info.give_next_tide_in_epoch(2000),
+            {"tide_type": "High", "tide_time": 2000},
+        )
+        self.assertEqual(
+            self.info.give_previous_tide_in_epoch(1500),
+            {"tide_type": "Low", "tide_time": 1000},
+        )
+        self.assertEqual(
+            self.info.give_next_tide_in_epoch(3500), {"error": "no date in future"}
+        )
+        self.assertEqual(
+            self.info.give_previous_tide_in_epoch(500), {"error": "no date in past"}
+        )
+
+    def test_high_low_tide(self):
+        """Test high/low tide lookup."""
+        result = self.info.give_current_high_low_tide_in_UTC(1500)
+        self.assertEqual(result["low_tide_time_epoch"], 1000)
+        self.assertEqual(result["high_tide_time_epoch"], 2000)
+        self.assertEqual(result["high_tide_time_utc"], "d2000")
+        self.assertEqual(
+            self.info.give_next_high_low_tide_in_UTC(2500),
+            {"error": "no date in future for next one"},
+        )
+
+    def test_current_height(self):
+        """Test step-hold height lookup."""
+        result = self.info.give_current_height_in_UTC(1250)
+        self.assertEqual(result["current_height_epoch"], 1200)
+        self.assertEqual(result["current_height"], 0.5)
+
+    def test_time_frame(self):
+        """Test range queries are strict on both bounds."""
+        extrema = self.info.give_tide_extrema_within_time_frame(1000, 3001)
+        self.assertEqual(extrema["extrema_epoch"], [2000, 3000])
+        self.assertEqual(extrema["extrema_type"], ["High", "Low"])
+        heights = self.info.give_tide_prediction_within_time_frame(1200, 1800)
+        self.assertEqual(heights["height_epoch"], [1500])
+
+
+class TideHistoryTestCase(unittest.TestCase):
+    """Class used to test the merged current/previous data."""
+
+    def test_merged_timeline(self):
+        """Test current data win and previous data fill the gaps."""
+        previous_data = {
+            "datums": [{"name": "LAT", "height": 0}],
+            "extremes": DATA["extremes"][:2],
+        }
+        data = {
+            "extremes": [
+                {"dt": 2000, "date": "new", "height": 6.0, "type": "High"},
+                DATA["extremes"][2],
+            ]
+        }
+        info = give_info_from_raw_data_N_and_N_1(data, previous_data)
+        self.assertEqual(info.give_datum(), {"datums": previous_data["datums"]})
+        self.assertEqual(
+            info.give_previous_tide_in_epoch(1500),
+            {"tide_type": "Low", "tide_time": 1000},
+        )
+        result = info.give_next_high_low_tide_in_UTC(1500)
+        self.assertEqual(result["high_tide_time_utc"], "new")
+        self.assertEqual(result["low_tide_time_epoch"], 3000)
+
+    def test_overlap_other_epochs(self):
+        """Test previous tides within the current range are dropped."""
+        previous_data = {
+            "extremes": [
+                {"dt": 1000, "date": "d1000", "height": 1.0, "type": "Low"},
+                {"dt": 2010, "date": "old", "height": 5.0, "type": "High"},
+            ]
+        }
+        data = {
+            "extremes": [
+                {"dt": 2000, "date": "new", "height": 6.0, "type": "High"},
+                {"dt": 3000, "date": "d3000", "height": 1.5, "type": "Low"},
+            ]
+        }
+        info = give_info_from_raw_data_N_and_N_1(data, previous_data)
+        extrema = info.give_tide_extrema_within_time_frame(0, 4000)
+        self.assertEqual(extrema["extrema_epoch"], [1000, 2000, 3000])
+        self.assertEqual(extrema["extrema_type"], ["Low", "High", "Low"])
+        result = info.give_next_high_low_tide_in_UTC(1500)
+        self.assertEqual(result["high_tide_time_epoch"], 2000)
+        self.assertEqual(result["low_tide_time_epoch"], 3000)
+
+    def test_no_data(self):
+        """Test missing data in both."""
+        info = give_info_from_raw_data_N_and_N_1(None, None)
+        self.assertEqual(info.give_next_tide_in_epoch(0), {"error": "no data"})
+
+    def test_data_horizon(self):
+        """Test the horizon of raw and compact data."""
+        extremes_only = {"extremes": DATA["extremes"]}
+        for data, horizon in (
+            (DATA, 3000),
+            (extremes_only, 3000),
+            ({"heights": []}, None),
+            ({}, None),
+        ):
+            self.assertEqual(give_data_horizon(data), horizon)
+            compact_data = Compact_Tide_Data.from_raw_data(data)
+            # the columns are read : no list of dict built
+            with mock.patch.object(
+                Compact_Tide_Data, "__getitem__", side_effect=AssertionError
+            ):
+                self.assertEqual(give_data_horizon(compact_data), horizon)
+
+
+class TideMemoTestCase(unittest.TestCase):
+    """Class used to test the memoized answers."""
+
+    def test_same_as_not_memoized(self):
+        """Test memoized answers against a new decoder at each epoch."""
+        info = give_info_from_raw_data(DATA)
+        methods = [
+            "give_next_tide_in_epoch",
+            "give_previous_tide_in_epoch",
+            "give_next_high_low_tide_in_UTC",
+            "give_current_high_low_tide_in_UTC",
+        ]
+        # around each extreme, in both directions
+        epochs = list(range(900, 3101, 50)) + [999, 1000, 1001, 2999, 3000, 3001]
+        for epoch in epochs + list(reversed(epochs)):
+            for method in methods:
+                self.assertEqual(
+                    getattr(info, method)(epoch),
+                    getattr(give_info_from_raw_data(DATA), method)(epoch),
+                    (method, epoch),
+                )
+
+    def test_load_raw_data(self):
+        """Test new data forget the memoized answers."""
+        info = give_info_from_raw_data_N_and_N_1(None, DATA)
+        self.assertEqual(info.give_next_tide_in_epoch(1500)["tide_time"], 2000)
+        answer = info.give_next_tide_in_epoch(1500)
+        answer["tide_time"] = 0
+        self.assertEqual(info.give_next_tide_in_epoch(1600)["tide_time"], 2000)
+
+        data = {"extremes": [{"dt": 1800, "date": "d", "height": 4.0, "type": "High"}]}
+        info.load_raw_data_N_and_N_1(data, DATA)
+        self.assertEqual(info.give_next_tide_in_epoch(1600)["tide_time"], 1800)
+        info.load_raw_data(None)
+        self.assertEqual(info.give_next_tide_in_epoch(1600), {"error": "no data"})
+
+
+if __name__ == "__main__":
+    unittest.main()
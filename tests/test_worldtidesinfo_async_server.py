@@ -0,0 +1,174 @@
+"""Test the asyncio client against a local HTTP server."""
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+import unittest
+from urllib.parse import parse_qs, urlparse
+
+from pyworldtidesinfo.worldtidesinfo_server import (
+    PLOT_CURVE_UNIT_M,
+    give_info_from_raw_data,
+)
+from pyworldtidesinfo.worldtidesinfo_standin import Stand_In_Server
+
+try:
+    from pyworldtidesinfo.worldtidesinfo_async_server import (
+        AsyncWorldTidesInfo_server,
+        async_retrieve_tide_height_over_one_day,
+        create_async_session,
+    )
+except ImportError:  # pragma: no cover - optional dependency
+    AsyncWorldTidesInfo_server = None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Answer a tide response whose height is the requested latitude."""
+
+    protocol_version = "HTTP/1.1"
+    # client ports : one per connection
+    client_ports = set()
+
+    def do_GET(self):
+        """Send the response."""
+        self.client_ports.add(self.client_address[1])
+        query = parse_qs(urlparse(self.path).query, keep_blank_values=True)
+        if "stations" in query:
+            response = {"status": 200, "callCount": 1, "stations": []}
+        else:
+            lat = float(query["lat"][0])
+            response = {
+                "status": 200,
+                "callCount": 1,
+                "heights": [{"dt": 1000, "date": "d", "height": lat}],
+                "extremes": [],
+            }
+        body = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Keep the test output quiet."""
+
+
+@unittest.skipIf(AsyncWorldTidesInfo_server is None, "aiohttp not installed")
+class AsyncWorldTidesInfoServerTestCase(unittest.TestCase):
+    """Class used to test the asyncio client."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Start the local HTTP server."""
+        cls.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        cls.url = "http://127.0.0.1:{}".format(cls.httpd.server_port)
+        threading.Thread(target=cls.httpd.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the local HTTP server."""
+        cls.httpd.shutdown()
+        cls.httpd.server_close()
+
+    def _server(self, lat, session=None):
+        """Build an async server on the local HTTP server."""
+        return AsyncWorldTidesInfo_server(
+            "key",
+            lat,
+            0,
+            "LAT",
+            50,
+            1,
+            "2,102,255",
+            "255,255,255",
+            PLOT_CURVE_UNIT_M,
+            session=session,
+            server_url=self.url,
+        )
+
+    def test_retrieve_tide_station(self):
+        """Test one awaitable request without injected session."""
+        server = self._server(1)
+        self.assertTrue(asyncio.run(server.retrieve_tide_station()))
+        self.assertEqual(server.retrieve_tide_station_credit(), 1)
+        self.assertEqual(server.retrieve_tide_station_raw_data()["stations"], [])
+
+    def test_fan_out(self):
+        """Test bounded fan-out keeps the order of servers."""
+
+        async def run():
+            async with create_async_session() as session:
+                servers = [self._server(lat, session) for lat in range(20)]
+                return await async_retrieve_tide_height_over_one_day(
+                    servers, False, max_concurrency=4
+                )
+
+        results = asyncio.run(run())
+        heights = [
+            give_info_from_raw_data(data).give_current_height_in_UTC(2000)[
+                "current_height"
+            ]
+            for data in results
+        ]
+        self.assertEqual(heights, [float(lat) for lat in range(20)])
+
+    def test_fan_out_shared_session(self):
+        """Test servers without session share one over the fan-out."""
+        _Handler.client_ports.clear()
+        servers = [self._server(lat) for lat in range(20)]
+        results = asyncio.run(
+            async_retrieve_tide_height_over_one_day(servers, False, max_concurrency=4)
+        )
+        self.assertTrue(all(data is not None for data in results))
+        self.assertLessEqual(len(_Handler.client_ports), 4)
+        self.assertIsNone(servers[0].give_session())
+
+    def test_incremental(self):
+        """Test the incremental refresh is awaited, with or without session."""
+
+        async def run(server_url, shared_session):
+            session = create_async_session() if shared_session else None
+            server = AsyncWorldTidesInfo_server(
+                "key",
+                48.0,
+                -4.5,
+                "LAT",
+                50,
+                1,
+                "2,102,255",
+                "255,255,255",
+                PLOT_CURVE_UNIT_M,
+                session=session,
+                server_url=server_url,
+            )
+            try:
+                result = await server.fetch_tide_height_incremental(False)
+                self.assertTrue(result.is_success())
+                # keep less than the prediction : the rest is requested
+                limit = time.time() + 3600
+                for section in ("heights", "extremes"):
+                    result.data[section] = [
+                        entry for entry in result.data[section] if entry["dt"] < limit
+                    ]
+                self.assertTrue(await server.retrieve_tide_height_incremental(False))
+                return server.retrieve_tide_raw_data()
+            finally:
+                if session is not None:
+                    await session.close()
+
+        for shared_session in (False, True):
+            with Stand_In_Server(plot_size=100) as stand_in_server:
+                data = asyncio.run(run(stand_in_server.give_url(), shared_session))
+                self.assertEqual(stand_in_server.request_count, 2)
+            self.assertGreater(data["heights"][-1]["dt"], time.time() + 86400)
+
+    def test_blocking_transport_refused(self):
+        """Test the blocking transport is not used by the async server."""
+        with self.assertRaises(TypeError):
+            self._server(1)._give_transport()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,211 @@
+"""Test the batch mode of the command line."""
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from pyworldtidesinfo import worldtidesinfo_batch
+from pyworldtidesinfo.__main__ import main
+from pyworldtidesinfo.worldtidesinfo_batch import (
+    BATCH_FORMAT_CSV,
+    give_summary,
+    read_locations,
+    run_batch,
+)
+from pyworldtidesinfo.worldtidesinfo_server import NO_FETCH_RESULT
+from pyworldtidesinfo.worldtidesinfo_standin import Stand_In_Server
+
+
+class ReadLocationsTestCase(unittest.TestCase):
+    """Class used to test the reading of the locations."""
+
+    def test_csv(self):
+        """Test CSV without and with header."""
+        locations = list(read_locations(["48.1,-4.5,brest", "", "# comment", "1,2"]))
+        self.assertEqual(
+            locations,
+            [
+                {"lat": 48.1, "lon": -4.5, "id": "brest"},
+                {"lat": 1.0, "lon": 2.0, "id": 4},
+            ],
+        )
+        locations = list(read_locations(["name,long,lat", "a,3,4"], BATCH_FORMAT_CSV))
+        self.assertEqual(locations, [{"lat": 4.0, "lon": 3.0, "id": "a"}])
+        locations = list(read_locations(["# c", "", "lat,lon,id", "1,2,a"]))
+        self.assertEqual(locations, [{"lat": 1.0, "lon": 2.0, "id": "a"}])
+
+    def test_ndjson(self):
+        """Test NDJSON lines."""
+        locations = list(read_locations(['{"lat": 1, "long": 2, "id": "x"}']))
+        self.assertEqual(locations, [{"lat": 1.0, "lon": 2.0, "id": "x"}])
+
+    def test_invalid(self):
+        """Test a line without location gives an error, next lines are read."""
+        locations = list(read_locations(["1,2", "nolat", "[1]", "{x", "3,4"]))
+        self.assertEqual(locations[0], {"lat": 1.0, "lon": 2.0, "id": 1})
+        for line_number, location in zip((2, 3, 4), locations[1:4]):
+            self.assertEqual(location["id"], line_number)
+            self.assertIn("error", location)
+        self.assertEqual(locations[4], {"lat": 3.0, "lon": 4.0, "id": 5})
+
+
+class RunBatchTestCase(unittest.TestCase):
+    """Class used to test the batch fetch."""
+
+    def test_run_batch(self):
+        """Test one NDJSON line per location and the summary."""
+        locations = [
+            {"lat": 48.0 + index, "lon": -4.5, "id": index} for index in range(5)
+        ]
+        output = io.StringIO()
+        with Stand_In_Server() as stand_in_server:
+            summary = run_batch(
+                iter(locations),
+                "key",
+                output,
+                workers=2,
+                server_url=stand_in_server.give_url(),
+            )
+            self.assertEqual(stand_in_server.request_count, 10)
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(sorted(result["id"] for result in results), list(range(5)))
+        for result in results:
+            self.assertNotIn("error", result)
+            self.assertIsNotNone(result["current_height"])
+            self.assertIn(result["next_tide"]["tide_type"], ("High", "Low"))
+        self.assertEqual(summary["locations"], 5)
+        self.assertEqual(summary["failed"], 0)
+        self.assertLessEqual(summary["latency_p50"], summary["latency_max"])
+
+    def test_errors(self):
+        """Test the errors are reported per location."""
+        output = io.StringIO()
+        with Stand_In_Server(error_rate=1.0) as stand_in_server:
+            summary = run_batch(
+                [{"lat": 1.0, "lon": 2.0, "id": "a"}],
+                "key",
+                output,
+                server_url=stand_in_server.give_url(),
+            )
+        self.assertEqual(json.loads(output.getvalue())["error"], "503")
+        self.assertEqual(summary["failed"], 1)
+
+    def test_invalid_line(self):
+        """Test an invalid line in the middle does not stop the batch."""
+        output = io.StringIO()
+        with Stand_In_Server() as stand_in_server:
+            summary = run_batch(
+                read_locations(["1,2,a", "nolat", "3,4,b"]),
+                "key",
+                output,
+                workers=1,
+                server_url=stand_in_server.give_url(),
+            )
+        results = {
+            result["id"]: result
+            for result in map(json.loads, output.getvalue().splitlines())
+        }
+        self.assertEqual(sorted(results, key=str), [2, "a", "b"])
+        self.assertIn("error", results[2])
+        self.assertNotIn("error", results["a"])
+        self.assertNotIn("error", results["b"])
+        self.assertEqual(summary["locations"], 3)
+        self.assertEqual(summary["failed"], 1)
+
+    def test_worker_error(self):
+        """Test a location that raises does not stop the batch."""
+        process_location = worldtidesinfo_batch.process_location
+
+        def process_or_raise(location, *args):
+            if location["id"] == "bad":
+                raise RuntimeError("bad location")
+            return process_location(location, *args)
+
+        locations = [
+            {"lat": 1.0, "lon": 2.0, "id": identifier}
+            for identifier in ("a", "bad", "b", "c")
+        ]
+        output = io.StringIO()
+        with Stand_In_Server() as stand_in_server, mock.patch.object(
+            worldtidesinfo_batch, "process_location", process_or_raise
+        ):
+            summary = run_batch(
+                locations,
+                "key",
+                output,
+                workers=2,
+                server_url=stand_in_server.give_url(),
+            )
+        results = {
+            result["id"]: result
+            for result in map(json.loads, output.getvalue().splitlines())
+        }
+        self.assertEqual(sorted(results), ["a", "b", "bad", "c"])
+        self.assertIn("bad location", results["bad"]["error"])
+        self.assertEqual(results["bad"]["credit"], 0)
+        self.assertEqual(summary["succeeded"], 3)
+        self.assertEqual(summary["failed"], 1)
+
+    def test_station_error(self):
+        """Test a failed station request is reported."""
+        output = io.StringIO()
+        with Stand_In_Server() as stand_in_server:
+            with mock.patch(
+                "pyworldtidesinfo.worldtidesinfo_batch.WorldTidesInfo_server"
+                ".fetch_tide_station",
+                return_value=NO_FETCH_RESULT._replace(error_value=("down",)),
+            ):
+                run_batch(
+                    [{"lat": 1.0, "lon": 2.0, "id": "a"}],
+                    "key",
+                    output,
+                    server_url=stand_in_server.give_url(),
+                )
+        result = json.loads(output.getvalue())
+        self.assertEqual(result["error"], str(("down",)))
+        self.assertIsNotNone(result["current_height"])
+
+    def test_empty_summary(self):
+        """Test the summary without result."""
+        summary = give_summary([], 0)
+        self.assertEqual(summary["locations"], 0)
+        self.assertIsNone(summary["latency_p95"])
+
+
+class MainBatchTestCase(unittest.TestCase):
+    """Class used to test the command line batch mode."""
+
+    def test_main_batch_file(self):
+        """Test the batch mode on a file."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "locations.csv")
+            with open(path, "w", encoding="utf-8") as batch_file:
+                batch_file.write("lat,lon,id\n48,-4.5,a\n47,-3,b\n")
+            with Stand_In_Server() as stand_in_server, mock.patch(
+                "sys.stdout", new_callable=io.StringIO
+            ) as stdout, mock.patch("sys.stderr", new_callable=io.StringIO) as stderr:
+                result = main(
+                    [
+                        "-k",
+                        "key",
+                        "--batch",
+                        path,
+                        "--server-url",
+                        stand_in_server.give_url(),
+                    ]
+                )
+        self.assertEqual(result, 0)
+        self.assertEqual(len(stdout.getvalue().splitlines()), 2)
+        self.assertEqual(json.loads(stderr.getvalue())["succeeded"], 2)
+
+    def test_main_location_required(self):
+        """Test lat/long are required without batch."""
+        with mock.patch("sys.stderr", new_callable=io.StringIO):
+            with self.assertRaises(SystemExit):
+                main(["-k", "key"])
+
+
+if __name__ == "__main__":
+    unittest.main()
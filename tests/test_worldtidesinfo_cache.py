@@ -0,0 +1,119 @@
+"""Test the on-disk response cache."""
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from pyworldtidesinfo.worldtidesinfo_cache import Response_Cache, atomic_write
+from pyworldtidesinfo.worldtidesinfo_server import (
+    PLOT_CURVE_UNIT_M,
+    Server_Parameter,
+    WorldTidesInfo_server,
+)
+
+PARAMETER = ("key", 1, 2, "LAT", 50, 1, "2,102,255", "255,255,255", PLOT_CURVE_UNIT_M)
+
+
+class _NoNetworkSession:
+    """Session failing on any request."""
+
+    def get(self, *args, **kwargs):
+        """Fail the test."""
+        raise AssertionError("network used")
+
+
+class ResponseCacheTestCase(unittest.TestCase):
+    """Class used to test the cache."""
+
+    def setUp(self):
+        """Create the cache directory."""
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Remove the cache directory."""
+        self.directory.cleanup()
+
+    def test_parameter_identity(self):
+        """Test equality and cache key of parameters (not hashable)."""
+        parameter = Server_Parameter(*PARAMETER)
+        same_parameter = Server_Parameter(*PARAMETER)
+        self.assertEqual(parameter, same_parameter)
+        with self.assertRaises(TypeError):
+            hash(parameter)
+        self.assertTrue(parameter.compare_parameter(same_parameter))
+        self.assertFalse(parameter.compare_parameter(None))
+        self.assertEqual(
+            parameter.give_cache_key("tide"), same_parameter.give_cache_key("tide")
+        )
+        same_parameter.change_ref_point(3, 4)
+        self.assertNotEqual(parameter, same_parameter)
+        self.assertNotEqual(
+            parameter.give_cache_key("tide"), same_parameter.give_cache_key("tide")
+        )
+
+    def test_ttl(self):
+        """Test expired entries are not given."""
+        cache = Response_Cache(self.directory.name, ttl=-1)
+        cache.set("key", {"callCount": 1})
+        self.assertIsNone(cache.get("key"))
+
+    def test_expired_entry_replaced(self):
+        """Test an entry stored while removing an expired one is kept."""
+        cache = Response_Cache(self.directory.name, ttl=10)
+        path = os.path.join(self.directory.name, "key.json")
+        atomic_write(path, json.dumps({"stored_time": 0, "data": 1}).encode())
+        lock = cache._lock
+
+        class _Set_While_Waiting:
+            """Store a fresh entry before the lock is taken."""
+
+            def __enter__(self):
+                cache._lock = lock
+                cache.set("key", 2)
+                return lock.__enter__()
+
+            def __exit__(self, *exc_info):
+                return lock.__exit__(*exc_info)
+
+        cache._lock = _Set_While_Waiting()
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(cache.get("key"), 2)
+
+    def test_invalid_entry(self):
+        """Test a file that is not an entry is a miss."""
+        cache = Response_Cache(self.directory.name)
+        for content in (b"[1, 2]", b"3", b'{"stored_time": "x"}', b"{"):
+            with open(os.path.join(self.directory.name, "key.json"), "wb") as file:
+                file.write(content)
+            self.assertIsNone(cache.get("key"))
+
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted."""
+        cache = Response_Cache(self.directory.name, max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        old_time = time.time() - 100
+        os.utime(os.path.join(self.directory.name, "b.json"), (old_time, old_time))
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_server_cache_hit(self):
+        """Test a cache hit skips the request and uses no credit."""
+        cache = Response_Cache(self.directory.name)
+        server = WorldTidesInfo_server(
+            *PARAMETER, session=_NoNetworkSession(), cache=cache
+        )
+        data = {"callCount": 1, "heights": [], "extremes": []}
+        cache.set(server._give_cache_key(server.give_parameter(), "tide", True), data)
+
+        self.assertTrue(server.retrieve_tide_height_over_one_day(True))
+        self.assertEqual(server.retrieve_tide_raw_data(), data)
+        self.assertEqual(server.retrieve_tide_credit(), 0)
+        self.assertIsNone(server.retrieve_tide_err_value())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+"""Test the local tide query daemon."""
+import http.client
+import json
+import os
+import socket
+import tempfile
+import unittest
+from unittest import mock
+
+from pyworldtidesinfo.worldtidesinfo_daemon import (
+    DAEMON_QUERIES,
+    Daemon_Error,
+    Tide_Daemon,
+)
+from pyworldtidesinfo.worldtidesinfo_server import create_session
+from pyworldtidesinfo.worldtidesinfo_standin import Stand_In_Server
+
+
+class _Unix_HTTP_Connection(http.client.HTTPConnection):
+    """HTTP connection on a unix socket."""
+
+    def __init__(self, path):
+        """Initialize the connection."""
+        super().__init__("localhost")
+        self._path = path
+
+    def connect(self):
+        """Connect the unix socket."""
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self._path)
+
+
+def _give_json(connection, path):
+    """Give status and JSON answer of a GET."""
+    connection.request("GET", path)
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+
+class TideDaemonTestCase(unittest.TestCase):
+    """Class used to test the daemon."""
+
+    def setUp(self):
+        """Start the stand-in server."""
+        self.stand_in_server = Stand_In_Server().start()
+
+    def tearDown(self):
+        """Stop the stand-in server."""
+        self.stand_in_server.stop()
+
+    def _give_daemon(self, **options):
+        """Give a daemon using the stand-in server."""
+        return Tide_Daemon(
+            "key",
+            port=0,
+            session=create_session(),
+            server_url=self.stand_in_server.give_url(),
+            **options
+        )
+
+    def test_answers_from_memory(self):
+        """Test the upstream server is requested once per location."""
+        with self._give_daemon() as tide_daemon:
+            host, port = tide_daemon.give_url()[len("http://") :].split(":")
+            connection = http.client.HTTPConnection(host, int(port))
+            status, answer = _give_json(connection, "/next_tide?lat=48&lon=-4.5")
+            self.assertEqual(status, 200)
+            self.assertIn(answer["tide_type"], ("High", "Low"))
+            status, answer = _give_json(
+                connection, "/current_height?lat=48.0001&lon=-4.5"
+            )
+            self.assertEqual(status, 200)
+            self.assertIn("current_height", answer)
+            status, answer = _give_json(connection, "/station?lat=48&lon=-4.5")
+            self.assertIn("tide_station_used_name", answer)
+            _give_json(connection, "/previous_tide?lat=48&lon=-4.5")
+            status, stats = _give_json(connection, "/stats")
+            connection.close()
+        self.assertEqual(stats["locations"], 1)
+        self.assertEqual(stats["upstream_requests"], 2)
+        self.assertEqual(self.stand_in_server.request_count, 2)
+
+    def test_errors(self):
+        """Test unknown query, missing location and upstream error."""
+        tide_daemon = self._give_daemon()
+        try:
+            with self.assertRaises(Daemon_Error) as context:
+                tide_daemon.give_answer("unknown", {"lat": "1", "lon": "2"})
+            self.assertEqual(context.exception.status, 404)
+            with self.assertRaises(Daemon_Error) as context:
+                tide_daemon.give_answer("next_tide", {"lat": "1"})
+            self.assertEqual(context.exception.status, 400)
+            self.stand_in_server.error_rate = 1.0
+            with self.assertRaises(Daemon_Error) as context:
+                tide_daemon.give_answer("next_tide", {"lat": "1", "lon": "2"})
+            self.assertEqual(context.exception.status, 502)
+            # no new request before the retry delay
+            with self.assertRaises(Daemon_Error):
+                tide_daemon.give_answer("next_tide", {"lat": "1", "lon": "2"})
+            self.assertEqual(self.stand_in_server.request_count, 1)
+        finally:
+            tide_daemon.stop()
+
+    def test_invalid_location(self):
+        """Test non-finite values and the number of locations are refused."""
+        tide_daemon = self._give_daemon(max_locations=1)
+        try:
+            for parameters in (
+                {"lat": "nan", "lon": "2"},
+                {"lat": "1", "lon": "inf"},
+                {"lat": "1", "lon": "2", "time": "-inf"},
+            ):
+                with self.assertRaises(Daemon_Error) as context:
+                    tide_daemon.give_answer("next_tide", parameters)
+                self.assertEqual(context.exception.status, 400)
+            tide_daemon.give_answer("datum", {"lat": "1", "lon": "2"})
+            with self.assertRaises(Daemon_Error) as context:
+                tide_daemon.give_answer("datum", {"lat": "3", "lon": "4"})
+            self.assertEqual(context.exception.status, 503)
+            self.assertEqual(tide_daemon.give_stats()["locations"], 1)
+            self.assertEqual(self.stand_in_server.request_count, 1)
+        finally:
+            tide_daemon.stop()
+
+    def test_internal_error(self):
+        """Test an unexpected error is answered and the daemon keeps serving."""
+        with self._give_daemon() as tide_daemon:
+            host, port = tide_daemon.give_url()[len("http://") :].split(":")
+            connection = http.client.HTTPConnection(host, int(port))
+            with mock.patch.dict(
+                DAEMON_QUERIES, {"datum": mock.Mock(side_effect=KeyError("x"))}
+            ), self.assertLogs("pyworldtidesinfo.worldtidesinfo_daemon", "ERROR"):
+                status, answer = _give_json(connection, "/datum?lat=1&lon=2")
+            self.assertEqual(status, 500)
+            self.assertEqual(answer, {"error": "internal error"})
+            status, answer = _give_json(connection, "/datum?lat=1&lon=2")
+            self.assertEqual(status, 200)
+            connection.close()
+
+    def test_extremes_window(self):
+        """Test the extremes within a time frame."""
+        tide_daemon = self._give_daemon()
+        try:
+            heights = tide_daemon.give_answer(
+                "heights", {"lat": "1", "lon": "2", "start": "0", "end": "1e12"}
+            )
+            start = heights["height_epoch"][0]
+            answer = tide_daemon.give_answer(
+                "extremes",
+                {"lat": "1", "lon": "2", "start": start, "end": start + 86400},
+            )
+            self.assertGreater(len(answer["extrema_epoch"]), 0)
+            self.assertTrue(
+                all(
+                    start <= epoch <= start + 86400 for epoch in answer["extrema_epoch"]
+                )
+            )
+        finally:
+            tide_daemon.stop()
+
+    @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "no unix socket")
+    def test_unix_socket(self):
+        """Test the queries over a unix socket."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "tide.sock")
+            with self._give_daemon(unix_socket=path) as tide_daemon:
+                self.assertEqual(tide_daemon.give_url(), "unix:" + path)
+                connection = _Unix_HTTP_Connection(path)
+                status, answer = _give_json(connection, "/datum?lat=1&lon=2")
+                connection.close()
+            self.assertEqual(status, 200)
+            self.assertNotIn("error", answer)
+            self.assertFalse(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+"""Test the immutable results of the server requests."""
+import threading
+import time
+import unittest
+
+from pyworldtidesinfo.tide_station_catalog import Station_Catalog
+from pyworldtidesinfo.worldtidesinfo_server import (
+    PLOT_CURVE_UNIT_M,
+    Fetch_Result,
+    WorldTidesInfo_server,
+    create_session,
+)
+from pyworldtidesinfo.worldtidesinfo_standin import Stand_In_Server
+
+
+def _give_server(server_url, station_catalog=None):
+    """Give a client of the stand-in."""
+    return WorldTidesInfo_server(
+        "key",
+        48.0,
+        -4.5,
+        "LAT",
+        50,
+        2,
+        "2,102,255",
+        "255,255,255",
+        PLOT_CURVE_UNIT_M,
+        session=create_session(),
+        server_url=server_url,
+        station_catalog=station_catalog,
+    )
+
+
+class FetchResultTestCase(unittest.TestCase):
+    """Class used to test the fetch results."""
+
+    def test_result(self):
+        """Test the result and the accessors of the previous versions."""
+        with Stand_In_Server(plot_size=100) as stand_in_server:
+            server = _give_server(stand_in_server.give_url())
+            self.assertIsNone(server.retrieve_tide_request_time())
+            self.assertEqual(server.retrieve_tide_credit(), 0)
+
+            result = server.fetch_tide_height_over_one_day(True)
+            self.assertIsInstance(result, Fetch_Result)
+            self.assertTrue(result.is_success())
+            self.assertFalse(result.from_cache)
+            self.assertEqual(result.credit, result.data["callCount"])
+            self.assertIs(server.give_tide_result(), result)
+            self.assertIs(server.retrieve_tide_raw_data(), result.data)
+            self.assertIs(server.last_tide_raw_data, result.data)
+            self.assertEqual(server.retrieve_tide_credit(), result.credit)
+            self.assertEqual(server.retrieve_tide_request_time(), result.request_time)
+            self.assertEqual(
+                server.last_tide_raw_data_request_time, result.request_time
+            )
+            self.assertEqual(server.retrieve_tide_timing(), result.timing)
+            with self.assertRaises(AttributeError):
+                result.credit = 0
+            with self.assertRaises(AttributeError):
+                server.last_tide_raw_data = None
+
+            station_result = server.fetch_tide_station()
+            self.assertTrue(station_result.is_success())
+            self.assertIs(server.give_tide_station_result(), station_result)
+            self.assertIs(server.last_tide_station_raw_data, station_result.data)
+
+    def test_error(self):
+        """Test the result of a failed request."""
+        with Stand_In_Server(error_rate=1.0, error_status=500) as stand_in_server:
+            server = _give_server(stand_in_server.give_url())
+            result = server.fetch_tide_station()
+            self.assertFalse(result.is_success())
+            self.assertIsNone(result.data)
+            self.assertEqual(result.credit, 0)
+            self.assertIsNotNone(result.error_value)
+            self.assertFalse(server.retrieve_tide_station())
+            self.assertEqual(
+                server.retrieve_tide_station_err_value(),
+                server.give_tide_station_result().error_value,
+            )
+
+    def test_threads(self):
+        """Test each thread gets a consistent result from a shared server."""
+        with Stand_In_Server(
+            error_rate=0.5, latency_jitter=0.01, seed=1
+        ) as stand_in_server:
+            server = _give_server(stand_in_server.give_url())
+            results = []
+
+            def fetch():
+                for _ in range(10):
+                    results.append(server.fetch_tide_height_over_one_day(False))
+
+            threads = [threading.Thread(target=fetch) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(results), 80)
+        self.assertTrue(any(result.is_success() for result in results))
+        self.assertFalse(all(result.is_success() for result in results))
+        for result in results:
+            if result.is_success():
+                self.assertEqual(result.credit, result.data["callCount"])
+            else:
+                self.assertIsNone(result.data)
+                self.assertEqual(result.credit, 0)
+        # the newest request is kept
+        last_result = server.give_tide_result()
+        self.assertIn(last_result, results)
+        self.assertEqual(
+            last_result.request_time, max(result.request_time for result in results)
+        )
+
+    def test_change_ref_point(self):
+        """Test the parameter in use is replaced, not changed."""
+        server = _give_server("http://127.0.0.1:9")
+        parameter = server.give_parameter()
+        server.change_ref_point(10.0, 20.0)
+        self.assertIsNot(server.give_parameter(), parameter)
+        self.assertNotEqual(
+            server.give_parameter().give_cache_key("stations", "day"),
+            parameter.give_cache_key("stations", "day"),
+        )
+
+    def test_change_ref_point_in_flight(self):
+        """Test a request in progress keeps the parameter it started with."""
+        catalog = Station_Catalog()
+        with Stand_In_Server(latency=0.3) as stand_in_server:
+            server = _give_server(stand_in_server.give_url(), catalog)
+            parameter = server.give_parameter()
+            results = []
+            thread = threading.Thread(
+                target=lambda: results.append(server.fetch_tide_station())
+            )
+            thread.start()
+            time.sleep(0.1)
+            server.change_ref_point(10.0, 20.0)
+            thread.join()
+
+        self.assertEqual(results[0].request_key, parameter.give_cache_key("stations"))
+        self.assertEqual(results[0].data["requestLat"], 48.0)
+        self.assertEqual(catalog.give_coverage(), [(48.0, -4.5, 50.0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+"""Test the instrumentation and the Prometheus exporter."""
+import tempfile
+import unittest
+
+from pyworldtidesinfo._synthetic_response import give_synthetic_tide_response
+from pyworldtidesinfo.worldtidesinfo_cache import Response_Cache
+from pyworldtidesinfo.worldtidesinfo_metrics import Metrics_Registry
+from pyworldtidesinfo.worldtidesinfo_server import (
+    PLOT_CURVE_UNIT_M,
+    WorldTidesInfo_server,
+    create_session,
+    give_info_from_raw_data,
+    give_info_from_raw_data_N_and_N_1,
+)
+from pyworldtidesinfo.worldtidesinfo_standin import Stand_In_Server
+
+
+class MetricsTestCase(unittest.TestCase):
+    """Class used to test the metrics."""
+
+    def test_requests(self):
+        """Test requests and cache are counted."""
+        metrics = Metrics_Registry()
+        with Stand_In_Server(plot_size=100) as stand_in_server:
+            server = WorldTidesInfo_server(
+                "key",
+                48.0,
+                -4.5,
+                "LAT",
+                50,
+                1,
+                "2,102,255",
+                "255,255,255",
+                PLOT_CURVE_UNIT_M,
+                session=create_session(),
+                cache=Response_Cache(tempfile.mkdtemp()),
+                server_url=stand_in_server.give_url(),
+                instrumentation=metrics,
+            )
+            self.assertTrue(server.retrieve_tide_height_over_one_day(False))
+            self.assertTrue(server.retrieve_tide_height_over_one_day(False))
+
+        self.assertEqual(
+            metrics.give_counter("requests_total", request="tide", status="ok"), 1
+        )
+        self.assertEqual(metrics.give_counter("cache_misses_total", request="tide"), 1)
+        self.assertEqual(metrics.give_counter("cache_hits_total", request="tide"), 1)
+        self.assertGreater(
+            metrics.give_counter("request_payload_bytes_total", request="tide"), 0
+        )
+        count, total = metrics.give_summary(
+            "request_duration_seconds", request="tide", phase="total"
+        )
+        self.assertEqual(count, 1)
+        self.assertGreater(total, 0)
+
+        text = metrics.give_prometheus_text()
+        self.assertIn("# TYPE worldtides_requests_total counter", text)
+        self.assertIn('worldtides_requests_total{request="tide",status="ok"} 1', text)
+        self.assertIn(
+            'worldtides_request_duration_seconds_count{phase="total",request="tide"} 1',
+            text,
+        )
+
+    def test_queries(self):
+        """Test queries are timed only with instrumentation."""
+        data = give_synthetic_tide_response(days=1, plot=False)
+        info = give_info_from_raw_data(data)
+        self.assertNotIn("give_next_tide_in_epoch", vars(info))
+
+        metrics = Metrics_Registry()
+        info = give_info_from_raw_data_N_and_N_1(data, None, metrics)
+        result = info.give_next_tide_in_epoch(data["heights"][0]["dt"])
+        self.assertIn("tide_type", result)
+        count, _ = metrics.give_summary(
+            "query_duration_seconds", query="give_next_tide_in_epoch"
+        )
+        self.assertEqual(count, 1)
+        self.assertIn('query="give_next_tide_in_epoch"', metrics.give_prometheus_text())
+
+    def test_nested_queries(self):
+        """Test a query made by another query is not counted."""
+        data = give_synthetic_tide_response(days=1, plot=False)
+        metrics = Metrics_Registry()
+        info = give_info_from_raw_data_N_and_N_1(data, None, metrics)
+        epoch = data["heights"][0]["dt"]
+        info.give_next_tide_in_epoch(epoch)
+        info.give_previous_tide_in_epoch(epoch)
+        info.give_tide_in_epoch(epoch, True)
+        for query_name in (
+            "give_next_tide_in_epoch",
+            "give_previous_tide_in_epoch",
+            "give_tide_in_epoch",
+        ):
+            count, _ = metrics.give_summary("query_duration_seconds", query=query_name)
+            self.assertEqual(count, 1)
+
+    def test_label_escape(self):
+        """Test the label values are escaped."""
+        metrics = Metrics_Registry()
+        metrics.on_cache('a"b', True)
+        self.assertIn('request="a\\"b"', metrics.give_prometheus_text())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+"""Test the refresh scheduler."""
+import unittest
+
+from pyworldtidesinfo._synthetic_response import (
+    SYNTHETIC_START_EPOCH,
+    give_synthetic_tide_response,
+)
+from pyworldtidesinfo.worldtidesinfo_scheduler import Refresh_Scheduler
+
+DAY = 24 * 3600
+
+
+class _Fake_Server:
+    """Server whose refresh gives 2 days of data from the current time."""
+
+    def __init__(self, name, start_epoch=None, days=2, credit=1):
+        """Set the data held."""
+        self.name = name
+        self.days = days
+        self.credit = credit
+        self.current_time = SYNTHETIC_START_EPOCH
+        self.refresh_count = 0
+        self.fail = False
+        self.data = None
+        self.last_credit = 0
+        if start_epoch is not None:
+            self.data = self._give_data(start_epoch)
+
+    def _give_data(self, start_epoch):
+        """Give the synthetic data from start_epoch."""
+        return give_synthetic_tide_response(
+            days=self.days, step=3600, start_epoch=start_epoch, plot=False
+        )
+
+    def retrieve_tide_height_over_one_day(self, datum_flag):
+        """Refresh the data."""
+        self.refresh_count += 1
+        if self.fail:
+            self.last_credit = 0
+            return False
+        self.data = self._give_data(self.current_time)
+        self.last_credit = self.credit
+        return True
+
+    def retrieve_tide_raw_data(self):
+        """Give the data."""
+        return self.data
+
+    def retrieve_tide_credit(self):
+        """Give the last credit."""
+        return self.last_credit
+
+
+class RefreshSchedulerTestCase(unittest.TestCase):
+    """Class used to test the scheduler."""
+
+    def test_priority(self):
+        """Test the servers closest to expiry are refreshed first."""
+        now = SYNTHETIC_START_EPOCH
+        scheduler = Refresh_Scheduler(
+            credit_budget=2, refresh_margin=1.8 * DAY, jitter=0
+        )
+        servers = [
+            _Fake_Server("later", start_epoch=now - DAY // 4),
+            _Fake_Server("empty"),
+            _Fake_Server("sooner", start_epoch=now - DAY // 2),
+            _Fake_Server("valid", start_epoch=now),
+        ]
+        for server in servers:
+            server.current_time = now
+            scheduler.add_server(server, now)
+
+        refreshed = scheduler.run_pending(now)
+        # budget of 2 credits : empty then sooner, later waits
+        self.assertEqual([server.name for server in refreshed], ["empty", "sooner"])
+        self.assertEqual(scheduler.give_credit_used(now), 2)
+        self.assertEqual(servers[0].refresh_count, 0)
+        self.assertEqual(servers[3].refresh_count, 0)
+
+        # the budget is available again after the budget period
+        self.assertEqual(scheduler.run_pending(now + 3600), [])
+        refreshed = scheduler.run_pending(now + DAY)
+        self.assertIn(servers[0], refreshed)
+
+    def test_jitter(self):
+        """Test the refreshes are spread before the horizon margin."""
+        now = SYNTHETIC_START_EPOCH
+        scheduler = Refresh_Scheduler(refresh_margin=DAY // 2, jitter=3600, seed=1)
+        servers = [_Fake_Server(index, start_epoch=now) for index in range(20)]
+        for server in servers:
+            scheduler.add_server(server, now)
+        due_times = [due_time for due_time, _ in scheduler.give_schedule()]
+        horizon = scheduler.give_horizon(servers[0])
+        self.assertGreater(len(set(due_times)), 1)
+        for due_time in due_times:
+            self.assertLessEqual(due_time, horizon - DAY // 2)
+            self.assertGreaterEqual(due_time, horizon - DAY // 2 - 3600)
+
+    def test_failure(self):
+        """Test a failed refresh is retried later."""
+        now = SYNTHETIC_START_EPOCH
+        scheduler = Refresh_Scheduler(retry_delay=600, jitter=0)
+        server = _Fake_Server("failing")
+        server.fail = True
+        scheduler.add_server(server, now)
+        self.assertEqual(scheduler.run_pending(now), [])
+        self.assertEqual(scheduler.give_next_run_time(), now + 600)
+        scheduler.run_pending(now + 600)
+        self.assertEqual(scheduler.give_next_run_time(), now + 600 + 1200)
+
+        scheduler.remove_server(server)
+        self.assertIsNone(scheduler.give_next_run_time())
+
+
+if __name__ == "__main__":
+    unittest.main()
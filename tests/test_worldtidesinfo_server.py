@@ -0,0 +1,121 @@
+"""Test the server connection against a local HTTP server."""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import unittest
+from urllib.parse import parse_qs, urlparse
+
+from pyworldtidesinfo.worldtidesinfo_server import (
+    PLOT_CURVE_UNIT_M,
+    TIDE_SECTION_EXTREMES,
+    WorldTidesInfo_server,
+    create_session,
+    give_info_from_raw_data,
+)
+
+RESPONSE = {"status": 200, "callCount": 1, "stations": []}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Answer every GET with the same JSON (keep-alive)."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        """Send the response."""
+        body = json.dumps(RESPONSE).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Keep the test output quiet."""
+
+
+class WorldTidesInfoServerTestCase(unittest.TestCase):
+    """Class used to test the pooled session."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Start the local HTTP server."""
+        cls.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        cls.url = "http://127.0.0.1:{}/api/v3?stations".format(cls.httpd.server_port)
+        threading.Thread(target=cls.httpd.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the local HTTP server."""
+        cls.httpd.shutdown()
+        cls.httpd.server_close()
+
+    def test_connection_reuse(self):
+        """Test the second request reuses the kept-alive connection."""
+        session = create_session()
+        server = WorldTidesInfo_server(
+            "key",
+            1,
+            2,
+            "LAT",
+            50,
+            1,
+            "2,102,255",
+            "255,255,255",
+            PLOT_CURVE_UNIT_M,
+            session=session,
+        )
+        self.assertIs(server.give_session(), session)
+
+        data, error_value, timing = server._request_json(self.url)
+        self.assertEqual(data, RESPONSE)
+        self.assertIsNone(error_value)
+        self.assertTrue(timing["new_connection"])
+
+        data, error_value, timing = server._request_json(self.url)
+        self.assertEqual(data, RESPONSE)
+        self.assertFalse(timing["new_connection"])
+        self.assertGreater(timing["payload_size"], 0)
+
+    def test_tide_sections(self):
+        """Test only the selected sections and step are requested."""
+        server = WorldTidesInfo_server(
+            "key",
+            1,
+            2,
+            "LAT",
+            50,
+            1,
+            "2,102,255",
+            "255,255,255",
+            PLOT_CURVE_UNIT_M,
+            tide_sections=[TIDE_SECTION_EXTREMES],
+            tide_step=3600,
+        )
+        query = parse_qs(
+            urlparse(server._tide_height_resource(server.give_parameter(), True)).query,
+            keep_blank_values=True,
+        )
+        self.assertIn("extremes", query)
+        self.assertIn("datums", query)
+        self.assertNotIn("heights", query)
+        self.assertNotIn("plot", query)
+        self.assertEqual(query["step"], ["3600"])
+
+    def test_missing_sections(self):
+        """Test the decoders without heights/extremes."""
+        info = give_info_from_raw_data({"callCount": 1})
+        self.assertEqual(info.give_next_tide_in_epoch(0), {"error": "no extremes"})
+        self.assertEqual(
+            info.give_current_high_low_tide_in_UTC(0), {"error": "no extremes"}
+        )
+        self.assertEqual(info.give_current_height_in_UTC(0), {"error": "no heights"})
+        self.assertEqual(
+            info.give_tide_prediction_within_time_frame(0, 1),
+            {"error": "no heights"},
+        )
+        self.assertEqual(info.give_plot_picture_without_header(), {"error": "no_image"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,190 @@
+"""Test the single flight of identical requests."""
+import asyncio
+import threading
+import time
+import unittest
+
+from pyworldtidesinfo.tide_columns import Compact_Tide_Data
+from pyworldtidesinfo.worldtidesinfo_server import (
+    PLOT_CURVE_UNIT_M,
+    WorldTidesInfo_server,
+    create_session,
+)
+from pyworldtidesinfo.worldtidesinfo_single_flight import (
+    Async_Single_Flight,
+    Single_Flight,
+)
+from pyworldtidesinfo.worldtidesinfo_standin import Stand_In_Server
+
+try:
+    from pyworldtidesinfo.worldtidesinfo_async_server import (
+        AsyncWorldTidesInfo_server,
+        create_async_session,
+    )
+except ImportError:  # pragma: no cover - optional dependency
+    AsyncWorldTidesInfo_server = None
+
+CALLER_NUMBER = 5
+
+
+def _give_server_arguments():
+    """Give the parameters of the servers."""
+    return (
+        "key",
+        48.0,
+        -4.5,
+        "LAT",
+        50,
+        1,
+        "2,102,255",
+        "255,255,255",
+        PLOT_CURVE_UNIT_M,
+    )
+
+
+class SingleFlightTestCase(unittest.TestCase):
+    """Class used to test the single flight."""
+
+    def test_threads(self):
+        """Test the concurrent calls share one call."""
+        single_flight = Single_Flight()
+        calls = []
+        results = []
+
+        def function():
+            calls.append(1)
+            time.sleep(0.2)
+            return "result"
+
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(single_flight.do("key", function))
+            )
+            for _ in range(CALLER_NUMBER)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([result for result, _ in results], ["result"] * CALLER_NUMBER)
+        self.assertEqual(sum(shared for _, shared in results), CALLER_NUMBER - 1)
+        self.assertEqual(single_flight.in_flight_count(), 0)
+        # a later call runs again
+        self.assertEqual(single_flight.do("key", function), ("result", False))
+
+    def test_async_error(self):
+        """Test the error is given to all the tasks."""
+        single_flight = Async_Single_Flight()
+
+        async def coroutine_function():
+            await asyncio.sleep(0.1)
+            raise ValueError("failed")
+
+        async def run():
+            return await asyncio.gather(
+                *[
+                    single_flight.do("key", coroutine_function)
+                    for _ in range(CALLER_NUMBER)
+                ],
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(run())
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(single_flight.in_flight_count(), 0)
+
+    def test_server(self):
+        """Test the servers of same parameters send one request."""
+        single_flight = Single_Flight()
+        session = create_session()
+        with Stand_In_Server(latency=0.2, plot_size=100) as stand_in_server:
+            servers = [
+                WorldTidesInfo_server(
+                    *_give_server_arguments(),
+                    session=session,
+                    server_url=stand_in_server.give_url(),
+                    single_flight=single_flight,
+                )
+                for _ in range(CALLER_NUMBER)
+            ]
+            threads = [
+                threading.Thread(
+                    target=server.retrieve_tide_height_over_one_day, args=(False,)
+                )
+                for server in servers
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(stand_in_server.request_count, 1)
+        self.assertEqual(
+            sum(server.retrieve_tide_credit() for server in servers),
+            servers[0].retrieve_tide_raw_data()["callCount"],
+        )
+        for server in servers:
+            self.assertIs(
+                server.retrieve_tide_raw_data(), servers[0].retrieve_tide_raw_data()
+            )
+
+    def test_streaming_server(self):
+        """Test a streaming and a raw server do not share their result."""
+        single_flight = Single_Flight()
+        session = create_session()
+        with Stand_In_Server(latency=0.2, plot_size=100) as stand_in_server:
+            servers = [
+                WorldTidesInfo_server(
+                    *_give_server_arguments(),
+                    session=session,
+                    server_url=stand_in_server.give_url(),
+                    single_flight=single_flight,
+                    streaming_decode=streaming_decode,
+                )
+                for streaming_decode in (False, True)
+            ]
+            threads = [
+                threading.Thread(
+                    target=server.retrieve_tide_height_over_one_day, args=(False,)
+                )
+                for server in servers
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(stand_in_server.request_count, 2)
+        self.assertIsInstance(servers[0].retrieve_tide_raw_data(), dict)
+        self.assertIsInstance(servers[1].retrieve_tide_raw_data(), Compact_Tide_Data)
+
+    @unittest.skipIf(AsyncWorldTidesInfo_server is None, "aiohttp not installed")
+    def test_async_server(self):
+        """Test the async servers of same parameters send one request."""
+        single_flight = Async_Single_Flight()
+
+        async def run(server_url):
+            session = create_async_session()
+            try:
+                servers = [
+                    AsyncWorldTidesInfo_server(
+                        *_give_server_arguments(),
+                        session=session,
+                        server_url=server_url,
+                        single_flight=single_flight,
+                    )
+                    for _ in range(CALLER_NUMBER)
+                ]
+                return await asyncio.gather(
+                    *[server.retrieve_tide_station() for server in servers]
+                )
+            finally:
+                await session.close()
+
+        with Stand_In_Server(latency=0.2) as stand_in_server:
+            results = asyncio.run(run(stand_in_server.give_url()))
+            self.assertEqual(results, [True] * CALLER_NUMBER)
+            self.assertEqual(stand_in_server.request_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+"""Test the local stand-in server."""
+import os
+import tempfile
+import unittest
+
+from pyworldtidesinfo.worldtidesinfo_server import (
+    PLOT_CURVE_UNIT_M,
+    WorldTidesInfo_server,
+    create_session,
+    give_info_from_raw_data,
+)
+from pyworldtidesinfo.worldtidesinfo_standin import (
+    STANDIN_MODE_RECORD,
+    STANDIN_MODE_REPLAY,
+    Stand_In_Server,
+    give_record_key,
+)
+
+
+def _give_server(server_url, key="key"):
+    """Give a client of the stand-in."""
+    return WorldTidesInfo_server(
+        key,
+        48.0,
+        -4.5,
+        "LAT",
+        50,
+        2,
+        "2,102,255",
+        "255,255,255",
+        PLOT_CURVE_UNIT_M,
+        session=create_session(),
+        server_url=server_url,
+    )
+
+
+class StandInServerTestCase(unittest.TestCase):
+    """Class used to test the stand-in server."""
+
+    def test_synthetic(self):
+        """Test stations and tide responses."""
+        with Stand_In_Server(plot_size=100) as stand_in_server:
+            server = _give_server(stand_in_server.give_url())
+            self.assertTrue(server.retrieve_tide_station())
+            self.assertEqual(
+                len(server.retrieve_tide_station_raw_data()["stations"]), 5
+            )
+            self.assertTrue(server.retrieve_tide_height_over_one_day(True))
+            data = server.retrieve_tide_raw_data()
+            self.assertIn("datums", data)
+            self.assertIn("plot", data)
+            info = give_info_from_raw_data(data)
+            next_tide = info.give_next_tide_in_epoch(data["heights"][0]["dt"])
+            self.assertIn(next_tide["tide_type"], ("High", "Low"))
+            self.assertEqual(stand_in_server.request_count, 2)
+
+    def test_streaming_decode(self):
+        """Test the streaming decode gives the same data and its decode time."""
+        with Stand_In_Server(plot_size=100) as stand_in_server:
+            server = _give_server(stand_in_server.give_url())
+            self.assertTrue(server.retrieve_tide_height_over_one_day(True))
+            streaming_server = WorldTidesInfo_server(
+                "key",
+                48.0,
+                -4.5,
+                "LAT",
+                50,
+                2,
+                "2,102,255",
+                "255,255,255",
+                PLOT_CURVE_UNIT_M,
+                session=create_session(),
+                server_url=stand_in_server.give_url(),
+                streaming_decode=True,
+            )
+            self.assertTrue(streaming_server.retrieve_tide_height_over_one_day(True))
+        self.assertEqual(
+            streaming_server.retrieve_tide_raw_data().to_raw_data(),
+            server.retrieve_tide_raw_data(),
+        )
+        self.assertGreater(streaming_server.retrieve_tide_timing()["decode_time"], 0)
+
+    def test_errors(self):
+        """Test the error rate."""
+        with Stand_In_Server(error_rate=1.0, error_status=500) as stand_in_server:
+            server = _give_server(stand_in_server.give_url())
+            self.assertFalse(server.retrieve_tide_station())
+            self.assertEqual(server.retrieve_tide_station_err_value(), 500)
+            self.assertEqual(stand_in_server.error_count, 1)
+
+    def test_record_replay(self):
+        """Test the responses recorded are replayed."""
+        directory = tempfile.mkdtemp()
+        with Stand_In_Server() as upstream_server, Stand_In_Server(
+            mode=STANDIN_MODE_RECORD,
+            directory=directory,
+            upstream_url=upstream_server.give_url(),
+        ) as record_server:
+            server = _give_server(record_server.give_url(), key="secret")
+            self.assertTrue(server.retrieve_tide_station())
+            recorded_data = server.retrieve_tide_station_raw_data()
+        self.assertEqual(len(os.listdir(directory)), 1)
+        for file_name in os.listdir(directory):
+            with open(os.path.join(directory, file_name)) as record_file:
+                self.assertNotIn("secret", record_file.read())
+
+        with Stand_In_Server(
+            mode=STANDIN_MODE_REPLAY, directory=directory
+        ) as replay_server:
+            # the key is not part of the record
+            server = _give_server(replay_server.give_url(), key="other")
+            self.assertTrue(server.retrieve_tide_station())
+            self.assertEqual(server.retrieve_tide_station_raw_data(), recorded_data)
+            self.assertFalse(server.retrieve_tide_height_over_one_day(False))
+            self.assertEqual(server.retrieve_tide_err_value(), 404)
+
+    def test_record_key(self):
+        """Test the record key ignores key and parameter order."""
+        self.assertEqual(
+            give_record_key("/api/v3", "stations&key=a&lat=1"),
+            give_record_key("/api/v3", "lat=1&stations&key=b"),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
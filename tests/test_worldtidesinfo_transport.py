@@ -0,0 +1,154 @@
+"""Test the HTTP transports against a local HTTP server."""
+import gzip
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import subprocess  # nosec
+import sys
+import threading
+import unittest
+
+from pyworldtidesinfo.worldtidesinfo_transport import (
+    TRANSPORT_HTTPX,
+    TRANSPORT_REQUESTS,
+    TRANSPORT_STDLIB,
+    Stdlib_Transport,
+    Transport_Error,
+    create_transport,
+)
+
+try:
+    import requests
+except ImportError:  # pragma: no cover - optional dependency
+    requests = None
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - optional dependency
+    httpx = None
+
+RESPONSE = {"status": 200, "callCount": 1, "heights": list(range(2000))}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Answer the GET with JSON, gzip if accepted (keep-alive)."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        """Send the response, /close drops the connection afterwards."""
+        body = json.dumps(RESPONSE).encode()
+        status = 404 if self.path.startswith("/missing") else 200
+        self.send_response(status)
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        if self.path.startswith("/close"):
+            # kept-alive connection closed without notice
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        """Keep the test output quiet."""
+
+
+class TransportTestCase(unittest.TestCase):
+    """Class used to test the transports."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Start the local HTTP server."""
+        cls.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        cls.url = "http://127.0.0.1:{}".format(cls.httpd.server_port)
+        threading.Thread(target=cls.httpd.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the local HTTP server."""
+        cls.httpd.shutdown()
+        cls.httpd.server_close()
+
+    def _check_transport(self, transport):
+        """Check JSON, streaming and error status of a transport."""
+        response = transport.get(self.url + "/api", timeout=(5, 5))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), RESPONSE)
+        self.assertGreaterEqual(response.elapsed_time, 0)
+        response.close()
+
+        response = transport.get(self.url + "/api", timeout=(5, 5), stream=True)
+        body = b"".join(response.iter_content(1000))
+        response.close()
+        self.assertEqual(json.loads(body), RESPONSE)
+
+        response = transport.get(self.url + "/missing", timeout=(5, 5))
+        self.assertEqual(response.status_code, 404)
+        response.close()
+        transport.close()
+
+    def test_stdlib(self):
+        """Test the standard library transport and its connection reuse."""
+        transport = create_transport(TRANSPORT_STDLIB)
+        self._check_transport(create_transport(TRANSPORT_STDLIB))
+        for _ in range(3):
+            response = transport.get(self.url + "/api", timeout=(5, 5))
+            self.assertEqual(response.json(), RESPONSE)
+        self.assertEqual(transport.give_connection_count(self.url), 1)
+
+    def test_stdlib_stale_connection(self):
+        """Test a kept-alive connection closed by the server is replaced."""
+        transport = Stdlib_Transport()
+        transport.get(self.url + "/close", timeout=(5, 5)).json()
+        self.assertEqual(
+            transport.get(self.url + "/api", timeout=(5, 5)).json(), RESPONSE
+        )
+        self.assertEqual(transport.give_connection_count(self.url), 2)
+
+    def test_stdlib_errors(self):
+        """Test the connection errors."""
+        transport = Stdlib_Transport()
+        with self.assertRaises(Transport_Error):
+            transport.get("ftp://127.0.0.1/api", timeout=(5, 5))
+        with self.assertRaises(Transport_Error):
+            # nothing listens on port 9 (discard) of the loopback
+            transport.get("http://127.0.0.1:9/api", timeout=(1, 1))
+
+    @unittest.skipIf(requests is None, "requests not installed")
+    def test_requests(self):
+        """Test the requests transport."""
+        transport = create_transport(TRANSPORT_REQUESTS)
+        self._check_transport(transport)
+        self.assertIsNotNone(transport.give_connection_count(self.url))
+
+    @unittest.skipIf(httpx is None, "httpx not installed")
+    def test_httpx(self):
+        """Test the httpx transport."""
+        self._check_transport(create_transport(TRANSPORT_HTTPX))
+
+    def test_unknown_backend(self):
+        """Test an unknown backend."""
+        with self.assertRaises(ValueError):
+            create_transport("unknown")
+
+    def test_decoders_import(self):
+        """Test the decoders and the server do not import requests."""
+        modules = subprocess.run(  # nosec
+            [
+                sys.executable,
+                "-c",
+                "import sys, pyworldtidesinfo.tide_decoder, "
+                "pyworldtidesinfo.worldtidesinfo_server; "
+                "print(' '.join(sys.modules))",
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.split()
+        self.assertNotIn("requests", modules)
+        self.assertNotIn("http.client", modules)
+
+
+if __name__ == "__main__":
+    unittest.main()